@@ -0,0 +1,194 @@
+import glob
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+# Where parsed grid cells are cached as memory-mappable .npy files
+cache_dir = 'anomaly_cache'
+
+# e.g. Abidjan_anomaly-5.5--4.5-2012-2022.csv -> Abidjan, lat 5.5, lon -4.5, 2012-2022
+file_name_pattern = re.compile(
+    r'(?P<site>[^/\\]*?)_?anomaly-(?P<lat>-?\d+(?:\.\d+)?)-(?P<lon>-?\d+(?:\.\d+)?)'
+    r'-(?P<start>\d{4})-(?P<end>\d{4})\.csv$'
+)
+
+# Column types of the semicolon-separated anomaly CSVs
+csv_dtypes = {
+    'longitude': 'float32',
+    'time': 'float64',
+    'latitude': 'float32',
+    'date': 'str',
+    'month_number': 'int8',
+    'climatology_avg': 'float32',
+    'temperature_avg': 'float32',
+    'calculated_temp_avg': 'float32',
+    'climatology_max': 'float32',
+    'temperature_max': 'float32',
+    'calculated_temp_max': 'float32',
+    'climatology_min': 'float32',
+    'temperature_min': 'float32',
+    'calculated_temp_min': 'float32'
+}
+
+# Per-month values kept in the cache; latitude/longitude are part of the key
+value_columns = [
+    'time', 'month_number',
+    'climatology_avg', 'temperature_avg', 'calculated_temp_avg',
+    'climatology_max', 'temperature_max', 'calculated_temp_max',
+    'climatology_min', 'temperature_min', 'calculated_temp_min'
+]
+cell_dtype = np.dtype([('month', 'datetime64[M]')] + [(c, csv_dtypes[c]) for c in value_columns])
+
+
+def parse_cell_name(file_path):
+    """
+    Site, grid cell and period encoded in an anomaly file name
+
+    Returns:
+    --------
+    dict
+        {'site': str, 'lat': float, 'lon': float, 'start': int, 'end': int}
+    """
+    match = file_name_pattern.search(os.path.basename(file_path))
+    if match is None:
+        raise ValueError(f"Not an anomaly file name: {file_path}")
+    return {
+        'site': match.group('site') or None,
+        'lat': float(match.group('lat')),
+        'lon': float(match.group('lon')),
+        'start': int(match.group('start')),
+        'end': int(match.group('end'))
+    }
+
+
+def read_anomaly_csv(file_path):
+    """
+    Parse one anomaly CSV into a typed, month-indexed DataFrame
+
+    The 'date' column ("2/2012") becomes a DatetimeIndex at the start of
+    each month; all other columns get explicit numeric dtypes.
+    """
+    df = pd.read_csv(file_path, sep=';', dtype=csv_dtypes)
+    df.index = pd.DatetimeIndex(pd.to_datetime(df.pop('date'), format='%m/%Y'), name='month')
+    return df
+
+
+def cell_key(lat, lon):
+    """Cache file stem for a grid cell, e.g. (5.5, -4.5) -> 'cell_5.5_-4.5'"""
+    return f'cell_{float(lat):g}_{float(lon):g}'
+
+
+def _to_records(df):
+    records = np.empty(len(df), dtype=cell_dtype)
+    records['month'] = df.index.to_numpy().astype('datetime64[M]')
+    for column in value_columns:
+        records[column] = df[column].to_numpy()
+    return records
+
+
+def records_to_frame(records):
+    """Month-indexed DataFrame view of cached cell records"""
+    df = pd.DataFrame({column: records[column] for column in value_columns})
+    df.index = pd.DatetimeIndex(records['month'].astype('datetime64[ns]'), name='month')
+    return df
+
+
+class AnomalyCache:
+    """
+    Binary cache of anomaly series keyed by grid cell (lat, lon)
+
+    Each cell is stored once as a structured .npy array plus a small JSON
+    sidecar recording every source file's size and modification time.
+    Files covering the same cell for different periods are merged into one
+    month-sorted series. Reads memory-map the array, so opening hundreds of
+    cells costs a file open each rather than a CSV parse.
+    """
+
+    def __init__(self, path=cache_dir):
+        self.path = path
+        os.makedirs(self.path, exist_ok=True)
+
+    def _paths(self, lat, lon):
+        stem = os.path.join(self.path, cell_key(lat, lon))
+        return stem + '.npy', stem + '.json'
+
+    def _read_meta(self, meta_path):
+        if not os.path.exists(meta_path):
+            return {}
+        with open(meta_path, 'r') as file:
+            return json.load(file)
+
+    def ingest_cell(self, file_paths, force=False):
+        """
+        Cache one cell from every anomaly CSV covering it, unless already up to date
+
+        Where periods overlap, the file with the later period wins the month.
+        """
+        cells = [parse_cell_name(file_path) for file_path in file_paths]
+        if len({(cell['lat'], cell['lon']) for cell in cells}) != 1:
+            raise ValueError(f"Files cover more than one grid cell: {file_paths}")
+        lat, lon = cells[0]['lat'], cells[0]['lon']
+        ordered = [path for _, path in sorted(zip([(c['start'], c['end']) for c in cells], file_paths))]
+        sources = []
+        for file_path in ordered:
+            stat = os.stat(file_path)
+            sources.append({'file': file_path, 'size': stat.st_size, 'mtime': stat.st_mtime})
+
+        array_path, meta_path = self._paths(lat, lon)
+        if not force and os.path.exists(array_path) and self._read_meta(meta_path).get('sources') == sources:
+            return lat, lon
+
+        records = np.concatenate([_to_records(read_anomaly_csv(file_path)) for file_path in ordered])
+        records = records[np.argsort(records['month'], kind='stable')]
+        # Stable sort keeps file order within a month, so the last copy is the later period's
+        last = np.append(records['month'][1:] != records['month'][:-1], True)
+        np.save(array_path, records[last])
+        with open(meta_path, 'w') as file:
+            json.dump({'lat': lat, 'lon': lon, 'sources': sources}, file)
+        return lat, lon
+
+    def ingest(self, file_path, force=False):
+        """Add one anomaly CSV to its cell, re-merging the cell's other (still present) sources"""
+        cell = parse_cell_name(file_path)
+        _, meta_path = self._paths(cell['lat'], cell['lon'])
+        known = [source['file'] for source in self._read_meta(meta_path).get('sources', [])]
+        file_paths = sorted({path for path in known if os.path.exists(path)} | {file_path})
+        return self.ingest_cell(file_paths, force)
+
+    def ingest_all(self, pattern='*anomaly-*.csv'):
+        """Ingest every anomaly CSV matching ``pattern``, grouped by cell; returns the cell keys"""
+        groups = {}
+        for file_path in sorted(glob.glob(pattern)):
+            cell = parse_cell_name(file_path)
+            groups.setdefault((cell['lat'], cell['lon']), []).append(file_path)
+        return [self.ingest_cell(file_paths) for file_paths in groups.values()]
+
+    def cells(self):
+        """(lat, lon) of every cached cell"""
+        keys = []
+        for meta_path in sorted(glob.glob(os.path.join(self.path, 'cell_*.json'))):
+            with open(meta_path, 'r') as file:
+                meta = json.load(file)
+            keys.append((meta['lat'], meta['lon']))
+        return keys
+
+    def records(self, lat, lon):
+        """Memory-mapped structured array for a cell (read-only)"""
+        array_path, _ = self._paths(lat, lon)
+        if not os.path.exists(array_path):
+            raise KeyError(f"Grid cell ({lat}, {lon}) is not cached")
+        return np.load(array_path, mmap_mode='r')
+
+    def frame(self, lat, lon):
+        """Month-indexed DataFrame for a cell"""
+        return records_to_frame(self.records(lat, lon))
+
+
+if __name__ == "__main__":
+    cache = AnomalyCache()
+    for lat, lon in cache.ingest_all():
+        df = cache.frame(lat, lon)
+        print(f"({lat}, {lon}): {len(df)} months {df.index[0]:%b %Y} - {df.index[-1]:%b %Y}")
@@ -0,0 +1,399 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+import generate_updated_visuals
+from anomaly_series import read_anomaly_csv
+from board_replay import BoardReplay
+from generate_interactive_visuals import create_stacked_bar_chart, save_figure
+from progress_store import month_format, wide_to_long
+from stage_taxonomy import stage_names, total_row
+from trello_board import TrelloBoard, organisation_labels
+
+# Size multipliers; 1x is roughly the size of the real inputs
+scales = (1, 10, 100)
+
+# Real input sizes the generators are scaled from
+base_months = 8          # rp1_data.csv: Jul 2024 - Feb 2025
+base_cards = 183         # RP2_Json_0624.json
+base_actions = 1000      # Trello's export cap
+base_lists = 40
+base_cells = 1           # one Abidjan_anomaly-*.csv
+anomaly_months = 126     # Feb 2012 - Jul 2022
+
+results_file = 'benchmark_results.json'
+
+# Committed reference timings; CI can point at its own with HEAT_BENCHMARK_BASELINE
+baseline_file = os.environ.get('HEAT_BENCHMARK_BASELINE', 'benchmark_baseline.json')
+
+# A phase regresses when it is slower than its baseline time plus the largest of:
+# (tolerance - 1) x that time, spread_factor x the range seen across the
+# baseline runs, and noise_floor seconds (matplotlib phases jitter by ~0.1-0.3 s
+# between identical runs on a busy single-CPU machine)
+tolerance = 1.5
+spread_factor = 3
+noise_floor = 0.25
+
+# Full runs recorded by --save-baseline, so each limit reflects the observed spread
+baseline_runs = 5
+
+
+# Synthetic inputs ----------------------------------------------------------
+
+def synthetic_stage_table(months, studies=250, seed=0):
+    """
+    Stage x Month table shaped like rp1_data.csv
+
+    Rows are the canonical stages plus 'Total'; studies drift from the
+    early stages towards the later ones month by month.
+    """
+    rng = np.random.default_rng(seed)
+    labels = pd.date_range('2024-07-01', periods=months, freq='MS').strftime(month_format)
+    weights = rng.dirichlet(np.ones(len(stage_names)), size=months).T
+    drift = np.linspace(0, 1, months)
+    weights *= np.exp(np.outer(np.linspace(-1, 1, len(stage_names)), drift))
+    weights /= weights.sum(axis=0)
+    counts = np.floor(weights * studies).astype('int64')
+    table = pd.DataFrame(counts, index=pd.Index(stage_names, name='Stage'), columns=labels)
+    table.loc[total_row] = table.sum()
+    return table
+
+
+def synthetic_board(cards, actions, lists=base_lists, seed=0):
+    """
+    Trello export dict shaped like RP2_Json_0624.json
+
+    Cards carry an organisation label and a JHB/Abidjan site label; the
+    action log is a series of list moves ending at each card's current list.
+    """
+    rng = np.random.default_rng(seed)
+    list_ids = [f'list{i:05d}' for i in range(lists)]
+    list_records = [{'id': list_id, 'name': f'Stage {i}', 'closed': False, 'pos': 1024 * (i + 1)}
+                    for i, list_id in enumerate(list_ids)]
+    label_names = organisation_labels + ['JHB', 'Abidjan']
+    label_records = [{'id': f'label{i:03d}', 'name': name, 'color': 'green'}
+                     for i, name in enumerate(label_names)]
+
+    positions = rng.integers(0, lists, size=cards)
+    orgs = rng.integers(0, len(organisation_labels), size=cards)
+    sites = len(organisation_labels) + rng.integers(0, 2, size=cards)
+    card_records = [{
+        'id': f'card{i:07d}',
+        'name': f'Study {i}',
+        'idList': list_ids[positions[i]],
+        'idLabels': [label_records[orgs[i]]['id'], label_records[sites[i]]['id']],
+        'closed': bool(rng.random() < 0.05),
+        'dateLastActivity': '2024-06-23T00:00:00.000Z'
+    } for i in range(cards)]
+
+    # Actions are listed newest first, as in Trello exports; a card's k-th most
+    # recent move goes one list forward and ends k - 1 lists before where it sits now
+    moved = rng.integers(0, cards, size=actions)
+    start = pd.Timestamp('2023-01-01', tz='UTC')
+    offsets = np.sort(rng.integers(0, 540 * 86400, size=actions))[::-1]
+    seen = np.zeros(cards, dtype=np.int64)
+    action_records = []
+    for number, (card, offset) in enumerate(zip(moved, offsets)):
+        seen[card] += 1
+        after = (positions[card] - seen[card] + 1) % lists
+        before = (after - 1) % lists
+        action_records.append({
+            'id': f'action{number:08d}',
+            'type': 'updateCard',
+            'date': (start + pd.Timedelta(seconds=int(offset))).strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+            'data': {
+                'card': {'id': card_records[card]['id'], 'name': card_records[card]['name']},
+                'listBefore': {'id': list_ids[before], 'name': list_records[before]['name']},
+                'listAfter': {'id': list_ids[after], 'name': list_records[after]['name']}
+            }
+        })
+
+    return {'name': 'Synthetic board', 'lists': list_records, 'labels': label_records,
+            'cards': card_records, 'actions': action_records}
+
+
+def synthetic_anomaly_frame(lat, lon, months=anomaly_months, seed=0):
+    """One grid cell's monthly series, with the columns of Abidjan_anomaly-*.csv"""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2012-02-01', periods=months, freq='MS')
+    season = np.sin(2 * np.pi * (dates.month.to_numpy() - 1) / 12)
+    df = pd.DataFrame({
+        'longitude': lon,
+        'time': dates.year + (dates.month - 1) / 12 + 1 / 24,
+        'latitude': lat,
+        'date': [f'{d.month}/{d.year}' for d in dates],
+        'month_number': np.arange(months) % 12 + 1
+    })
+    for kind, base in (('avg', 27.0), ('max', 33.0), ('min', 22.0)):
+        climatology = np.round(base + 2 * season, 2)
+        anomaly = np.round(rng.normal(0.3, 0.6, size=months), 2)
+        df[f'climatology_{kind}'] = climatology
+        df[f'temperature_{kind}'] = anomaly
+        df[f'calculated_temp_{kind}'] = np.round(climatology + anomaly, 2)
+    return df
+
+
+def write_inputs(path, scale, seed=0):
+    """Write one scale's synthetic inputs under ``path`` and return their locations"""
+    os.makedirs(path, exist_ok=True)
+    table_path = os.path.join(path, 'stage_table.csv')
+    synthetic_stage_table(base_months * scale, studies=250 * scale, seed=seed).to_csv(table_path)
+
+    board_path = os.path.join(path, 'board.json')
+    with open(board_path, 'w', encoding='utf-8') as file:
+        json.dump(synthetic_board(base_cards * scale, base_actions * scale, seed=seed), file)
+
+    anomaly_paths = []
+    for cell in range(base_cells * scale):
+        lat, lon = 5.5 + cell // 10, -4.5 + cell % 10
+        anomaly_path = os.path.join(path, f'Synthetic_anomaly-{lat:g}-{lon:g}-2012-2022.csv')
+        synthetic_anomaly_frame(lat, lon, seed=seed + cell).to_csv(anomaly_path, sep=';', index=False)
+        anomaly_paths.append(anomaly_path)
+    return {'stage_table': table_path, 'board': board_path, 'anomaly': anomaly_paths}
+
+
+# Benchmark cases -------------------------------------------------------------
+# Each case is a list of (phase, function) pairs; a phase receives the
+# previous phase's result, so phases can be timed one by one.
+
+def stage_table_case(inputs, output_dir):
+    def load(_):
+        return pd.read_csv(inputs['stage_table'], index_col='Stage')
+
+    def aggregate(table):
+        wide_to_long(table, 'synthetic')
+        return table
+
+    def build_figure(table):
+        generate_updated_visuals.plot_stacked_bar_chart(table.reset_index(), 'Synthetic progress')
+        return plt.gcf()
+
+    def savefig(figure):
+        # The chart draws into generate_updated_visuals.progress_template; keep it open for reuse
+        figure.savefig(os.path.join(output_dir, 'stage_table.png'), bbox_inches='tight', dpi=300)
+
+    return [('load', load), ('aggregate', aggregate), ('figure', build_figure), ('savefig', savefig)]
+
+
+def interactive_case(inputs, output_dir):
+    def load(_):
+        return pd.read_csv(inputs['stage_table'], index_col='Stage')
+
+    def build_figure(table):
+        return create_stacked_bar_chart(table, 'Synthetic')
+
+    def write_html(figure):
+        save_figure(figure, os.path.join(output_dir, 'stage_table.html'))
+
+    return [('load', load), ('figure', build_figure), ('write_html', write_html)]
+
+
+def board_case(inputs, output_dir):
+    def load(_):
+        return TrelloBoard.from_file(inputs['board'])
+
+    def aggregate(board):
+        _, stages = board.stage_counts(from_history=True)
+        months = pd.date_range('2023-01-01', '2024-06-01', freq='MS').strftime(month_format)
+        BoardReplay(board).monthly_counts(list(months), organisation_labels)
+        return pd.DataFrame(stages).T.fillna(0)
+
+    def build_figure(counts):
+        ax = counts.plot(kind='bar', stacked=True, figsize=(14, 8), colormap='Set2', legend=False)
+        ax.set_title('Stages of Studies by Organization')
+        return ax.figure
+
+    def savefig(figure):
+        figure.savefig(os.path.join(output_dir, 'board.png'), bbox_inches='tight', dpi=300)
+        plt.close(figure)
+
+    return [('load', load), ('aggregate', aggregate), ('figure', build_figure), ('savefig', savefig)]
+
+
+def anomaly_case(inputs, output_dir):
+    def load(_):
+        return [read_anomaly_csv(path) for path in inputs['anomaly']]
+
+    def aggregate(frames):
+        combined = pd.concat(frames, keys=range(len(frames)), names=['cell'])
+        return combined.groupby(['cell', 'month_number'])['temperature_max'].mean().unstack('cell')
+
+    def build_figure(monthly):
+        fig, ax = plt.subplots(figsize=(12, 6))
+        ax.plot(monthly.index, monthly.to_numpy(), linewidth=0.8)
+        ax.set_xlabel('Month')
+        ax.set_ylabel('Mean max temperature anomaly (°C)')
+        return fig
+
+    def savefig(figure):
+        figure.savefig(os.path.join(output_dir, 'anomaly.png'), bbox_inches='tight', dpi=300)
+        plt.close(figure)
+
+    return [('load', load), ('aggregate', aggregate), ('figure', build_figure), ('savefig', savefig)]
+
+
+cases = {
+    'stage_table': stage_table_case,
+    'interactive': interactive_case,
+    'board': board_case,
+    'anomaly': anomaly_case
+}
+
+
+def time_case(phases, repeat=3):
+    """Best-of-``repeat`` wall time (seconds) of each phase"""
+    best = {}
+    for _ in range(repeat):
+        result = None
+        for phase, func in phases:
+            start = time.perf_counter()
+            result = func(result)
+            elapsed = time.perf_counter() - start
+            best[phase] = min(best.get(phase, elapsed), elapsed)
+    return best
+
+
+def run(scales=scales, case_names=None, repeat=3, seed=0):
+    """
+    Time every case at every scale on freshly generated inputs
+
+    Returns:
+    --------
+    list of dict
+        One ``{'case', 'scale', 'phase', 'seconds'}`` row per measurement
+    """
+    rows = []
+    with tempfile.TemporaryDirectory(prefix='heat_bench_') as path:
+        for scale in scales:
+            scale_dir = os.path.join(path, f'x{scale}')
+            inputs = write_inputs(scale_dir, scale, seed)
+            for name in case_names or cases:
+                timings = time_case(cases[name](inputs, scale_dir), repeat)
+                for phase, seconds in timings.items():
+                    rows.append({'case': name, 'scale': scale, 'phase': phase, 'seconds': round(seconds, 4)})
+                    print(f"{name:12} x{scale:<4} {phase:10} {seconds:8.3f}s")
+    return rows
+
+
+def _key(row):
+    return f"{row['case']}/x{row['scale']}/{row['phase']}"
+
+
+def _limit(seconds, runs=None):
+    runs = np.asarray(runs if runs else [seconds], dtype=float)
+    margin = max(seconds * (tolerance - 1), spread_factor * float(np.ptp(runs)), noise_floor)
+    return round(seconds + margin, 4)
+
+
+def baseline_rows(runs):
+    """
+    Combine several ``run`` results into baseline rows
+
+    Returns:
+    --------
+    list of dict
+        One ``{'case', 'scale', 'phase', 'seconds', 'runs', 'limit'}`` row per
+        measurement: the median time, every run's time and the regression
+        limit derived from their spread
+    """
+    samples = {}
+    for rows in runs:
+        for row in rows:
+            entry = samples.setdefault(_key(row), {key: row[key] for key in ('case', 'scale', 'phase')})
+            entry.setdefault('runs', []).append(row['seconds'])
+    for entry in samples.values():
+        entry['seconds'] = round(float(np.median(entry['runs'])), 4)
+        entry['limit'] = _limit(entry['seconds'], entry['runs'])
+    return list(samples.values())
+
+
+def check(rows, baseline=None):
+    """
+    Attach each measurement's regression limit and whether it was exceeded
+
+    The limit comes from the baseline row (see ``baseline_rows``); older
+    baselines without one get a limit from their single time. Measurements
+    without a baseline are never flagged.
+    """
+    reference = {_key(row): row for row in (baseline or {}).get('results', [])}
+    for row in rows:
+        previous = reference.get(_key(row))
+        row['baseline'] = None if previous is None else previous['seconds']
+        row['limit'] = None if previous is None else previous.get('limit') or _limit(previous['seconds'])
+        row['regressed'] = row['limit'] is not None and row['seconds'] > row['limit']
+    return rows
+
+
+def machine():
+    """The interpreter and hardware a set of timings was recorded on"""
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpus': os.cpu_count()
+    }
+
+
+def write_results(rows, file_path=results_file):
+    report = {
+        'created': pd.Timestamp.now(tz='UTC').isoformat(),
+        **machine(),
+        'tolerance': tolerance,
+        'spread_factor': spread_factor,
+        'noise_floor': noise_floor,
+        'results': rows
+    }
+    with open(file_path, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the progress pipeline on synthetic inputs")
+    parser.add_argument('--scales', type=int, nargs='+', default=list(scales))
+    parser.add_argument('--cases', nargs='+', choices=list(cases))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default=results_file)
+    parser.add_argument('--baseline', default=baseline_file,
+                        help="earlier results to compare against (default: %(default)s, if present)")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="also write a new baseline from this and further runs")
+    parser.add_argument('--baseline-runs', type=int, default=baseline_runs,
+                        help="full runs combined into a saved baseline (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+        recorded = {key: baseline.get(key) for key in machine()}
+        if recorded != machine():
+            print(f"Note: {args.baseline} was recorded on {recorded}; timings from another "
+                  f"machine are only a rough guide. Save one with --save-baseline on this machine.")
+
+    rows = check(run(args.scales, args.cases, args.repeat), baseline)
+    report = write_results(rows, args.output)
+    if args.save_baseline:
+        runs = [rows] + [run(args.scales, args.cases, args.repeat) for _ in range(args.baseline_runs - 1)]
+        write_results(baseline_rows(runs), args.baseline)
+
+    regressions = [row for row in report['results'] if row['regressed']]
+    for row in regressions:
+        print(f"REGRESSION {_key(row)}: {row['seconds']:.3f}s > limit {row['limit']:.3f}s "
+              f"(baseline {row['baseline']:.3f}s)")
+    print(f"Wrote {args.output}: {len(rows)} measurements, {len(regressions)} regression(s)")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
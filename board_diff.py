@@ -0,0 +1,122 @@
+import os
+
+import pandas as pd
+
+from trello_board import TrelloBoard, iter_boards, organisation_labels
+
+# Kinds of change reported between two snapshots, in summary column order
+change_types = ['added', 'removed', 'moved', 'archived', 'unarchived', 'labelled', 'unlabelled']
+
+columns = ['card_id', 'card', 'change', 'before', 'after', 'labels']
+
+
+def _card_labels(board, card):
+    return frozenset(board.label_names.get(label_id, label_id) for label_id in card.id_labels)
+
+
+def diff_boards(old, new):
+    """
+    Changes between two exports of the same board
+
+    Cards are matched by id through the boards' dictionaries, so the diff is
+    one pass over each snapshot. Stage moves compare list *names*, which
+    keeps a move visible even if a list was recreated under a new id.
+
+    Parameters:
+    -----------
+    old, new : TrelloBoard
+        Earlier and later snapshot
+
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per change with columns card_id, card, change (see
+        ``change_types``), before, after and labels (the card's label names
+        in the later snapshot, or the earlier one for removed cards)
+    """
+    rows = []
+    for card_id, card in new.cards.items():
+        labels = _card_labels(new, card)
+        previous = old.cards.get(card_id)
+        if previous is None:
+            rows.append((card_id, card.name, 'added', None, new.list_name(card_id), labels))
+            continue
+
+        before_list, after_list = old.list_name(card_id), new.list_name(card_id)
+        if before_list != after_list:
+            rows.append((card_id, card.name, 'moved', before_list, after_list, labels))
+        if previous.closed != card.closed:
+            change = 'archived' if card.closed else 'unarchived'
+            rows.append((card_id, card.name, change, after_list, after_list, labels))
+
+        previous_labels = _card_labels(old, previous)
+        for label in sorted(labels - previous_labels):
+            rows.append((card_id, card.name, 'labelled', None, label, labels))
+        for label in sorted(previous_labels - labels):
+            rows.append((card_id, card.name, 'unlabelled', label, None, labels))
+
+    for card_id in old.cards.keys() - new.cards.keys():
+        card = old.cards[card_id]
+        rows.append((card_id, card.name, 'removed', old.list_name(card_id), None, _card_labels(old, card)))
+
+    diff = pd.DataFrame(rows, columns=columns)
+    diff['change'] = pd.Categorical(diff['change'], categories=change_types)
+    return diff
+
+
+def summarise(diff, labels=None):
+    """
+    Count changes per organisation label
+
+    Returns:
+    --------
+    pandas.DataFrame
+        Label x change type counts (a card with several labels counts once
+        under each), plus a 'Total' row counting each change once
+    """
+    labels = organisation_labels if labels is None else labels
+    exploded = diff.assign(label=diff['labels'].map(sorted)).explode('label')
+    exploded = exploded[exploded['label'].isin(labels)]
+    summary = pd.crosstab(pd.Categorical(exploded['label'], categories=labels), exploded['change'],
+                          dropna=False)
+    summary = summary.reindex(index=labels, columns=change_types, fill_value=0)
+    summary.loc['Total'] = diff['change'].value_counts().reindex(change_types, fill_value=0)
+    summary.index.name = 'label'
+    summary.columns.name = None
+    return summary
+
+
+def diff_series(file_paths):
+    """
+    Diff each export against the one before it
+
+    Exports are streamed one at a time (see ``iter_boards``), so only two
+    boards are ever in memory.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        ``diff_boards`` rows with 'from' and 'to' snapshot columns added
+    """
+    diffs = []
+    previous_path, previous = None, None
+    for file_path, board in iter_boards(file_paths):
+        if previous is not None:
+            diff = diff_boards(previous, board)
+            diff.insert(0, 'to', os.path.basename(file_path))
+            diff.insert(0, 'from', os.path.basename(previous_path))
+            diffs.append(diff)
+        previous_path, previous = file_path, board
+    if not diffs:
+        return pd.DataFrame(columns=['from', 'to'] + columns)
+    return pd.concat(diffs, ignore_index=True)
+
+
+if __name__ == "__main__":
+    old = TrelloBoard.from_file('RP2_Json_0610.json')
+    new = TrelloBoard.from_file('RP2_Json_0624.json')
+    diff = diff_boards(old, new)
+    print(summarise(diff).to_string())
+    print()
+    moves = diff[diff['change'] == 'moved']
+    print(moves[['card', 'before', 'after']].to_string(index=False))
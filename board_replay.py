@@ -0,0 +1,208 @@
+from bisect import bisect_right
+
+import pandas as pd
+
+from progress_store import month_format
+from stage_taxonomy import canonical_list_name
+from trello_board import TrelloBoard
+
+# Actions that change which list a card is counted in
+state_actions = {'createCard', 'updateCard', 'moveCardToBoard', 'copyCard', 'convertToCardFromCheckItem'}
+
+# Card state when it is not (yet) on the board or has been archived
+off_board = (None, False)
+
+
+def _iso(date):
+    # Trello dates are ISO-8601 UTC strings, which sort like the timestamps they encode;
+    # aware dates are converted to UTC first, naive ones are taken to be UTC already
+    date = pd.Timestamp(date)
+    if date.tzinfo is not None:
+        date = date.tz_convert('UTC').tz_localize(None)
+    return date.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+class BoardReplay:
+    """
+    Card -> list state of a Trello board at any date, rebuilt from its action log
+
+    Exports keep only the newest 1000 actions, so the log cannot be replayed
+    forward from an empty board. Instead the export's own card positions are
+    taken as the state after the last action and the log is walked backwards
+    once, recording for every state-changing action the card's state
+    before and after it. A copy of the full state is kept every
+    ``checkpoint_every`` actions; ``state_at`` starts from the nearest
+    checkpoint and re-applies (or undoes) only the actions in between.
+
+    A card's state is ``(list id, open)``; archived cards and cards not
+    created yet are not counted. Dates before the oldest action in the
+    export return the oldest state that can be reconstructed (see
+    ``start``).
+    """
+
+    def __init__(self, board, checkpoint_every=100):
+        self.board = board
+        self.checkpoint_every = checkpoint_every
+        self.list_names = dict(board.list_names)
+
+        state = {card.id: (card.id_list, not card.closed) for card in board.cards.values()}
+        actions = [a for a in board.actions if a.type in state_actions and a.card_id in state]
+
+        # Walk newest -> oldest, undoing each action to find the state before it
+        transitions = []
+        for action in reversed(actions):
+            after = state[action.card_id]
+            before = self._undo(action, after)
+            if before == after:
+                continue
+            transitions.append((action.date, action.card_id, before, after))
+            state[action.card_id] = before
+            for list_id, name in ((action.list_before, action.list_before_name),
+                                  (action.list_after, action.list_after_name)):
+                if list_id and name:
+                    self.list_names.setdefault(list_id, canonical_list_name(name))
+        transitions.reverse()
+
+        self.transitions = transitions
+        self.dates = [date for date, _, _, _ in transitions]
+        self.start = self.dates[0] if self.dates else None
+
+        # Checkpoint k holds the state after the first k * checkpoint_every transitions
+        self.checkpoints = [state]
+        for index in range(checkpoint_every, len(transitions) + 1, checkpoint_every):
+            state = self._apply(state, index - checkpoint_every, index)
+            self.checkpoints.append(state)
+
+    @classmethod
+    def from_file(cls, file_path, checkpoint_every=100):
+        """Replay engine for a Trello JSON export"""
+        return cls(TrelloBoard.from_file(file_path), checkpoint_every)
+
+    @staticmethod
+    def _undo(action, after):
+        list_id, is_open = after
+        if action.type == 'updateCard':
+            if action.list_after is not None:
+                return (action.list_before or list_id, is_open)
+            if action.closed is not None:
+                return (list_id, action.closed)
+            return after
+        # createCard, moveCardToBoard, copyCard, convertToCardFromCheckItem
+        return off_board
+
+    def _apply(self, state, start, stop):
+        state = dict(state)
+        for _, card_id, _, after in self.transitions[start:stop]:
+            state[card_id] = after
+        return state
+
+    def _state_after(self, count):
+        # State after the first ``count`` transitions, from the nearest checkpoint
+        nearest = min(round(count / self.checkpoint_every), len(self.checkpoints) - 1)
+        position = nearest * self.checkpoint_every
+        if position <= count:
+            return self._apply(self.checkpoints[nearest], position, count)
+        state = dict(self.checkpoints[nearest])
+        for _, card_id, before, _ in reversed(self.transitions[count:position]):
+            state[card_id] = before
+        return state
+
+    def state_at(self, date):
+        """
+        Lists the open cards sat in at ``date``
+
+        Returns:
+        --------
+        dict
+            card id -> list id, for cards that existed and were not archived
+        """
+        state = self._state_after(bisect_right(self.dates, _iso(date)))
+        return {card_id: list_id for card_id, (list_id, is_open) in state.items() if is_open}
+
+    def _groups(self, labels):
+        # Which counts each card contributes to: the whole board (None) plus its labels
+        wanted = set(labels or ())
+        return {card_id: [None] + [name for name in self.board.card_labels(card_id) if name in wanted]
+                for card_id in self.board.cards}
+
+    def monthly_counts(self, months, labels=None):
+        """
+        Open cards per list at the end of each month, in one pass over the log
+
+        Parameters:
+        -----------
+        months : list of str or Timestamp
+            Months to report, e.g. ['Oct 2024', 'Nov 2024']
+        labels : list of str, optional
+            Label names (e.g. organisation labels) to count separately
+
+        Returns:
+        --------
+        dict
+            ``{group: {month: {list id: count}}}`` where group is None for the
+            whole board and a label name otherwise
+        """
+        months = sorted(pd.to_datetime(pd.Series(months), format=month_format).drop_duplicates())
+        groups = self._groups(labels)
+
+        state = dict(self.checkpoints[0])
+        counts = {group: {} for group in [None] + list(labels or ())}
+        for card_id, (list_id, is_open) in state.items():
+            if is_open:
+                for group in groups[card_id]:
+                    counts[group][list_id] = counts[group].get(list_id, 0) + 1
+
+        result = {group: {} for group in counts}
+        position = 0
+        for month in months:
+            boundary = _iso(month + pd.offsets.MonthBegin(1))
+            while position < len(self.transitions) and self.dates[position] < boundary:
+                _, card_id, before, after = self.transitions[position]
+                for group in groups[card_id]:
+                    group_counts = counts[group]
+                    if before[1]:
+                        group_counts[before[0]] -= 1
+                    if after[1]:
+                        group_counts[after[0]] = group_counts.get(after[0], 0) + 1
+                position += 1
+            label = month.strftime(month_format)
+            for group, group_counts in counts.items():
+                result[group][label] = dict(group_counts)
+        return result
+
+    def stage_tables(self, months, labels=None):
+        """
+        Stage x Month tables in the progress store's wide shape
+
+        Rows are the board's lists (in board order) plus a 'Total' row and
+        columns are the requested months, so the result can be passed to
+        ``ProgressStore.import_wide``.
+
+        Returns:
+        --------
+        dict
+            group -> DataFrame indexed by 'Stage'; group is None for the whole
+            board and a label name otherwise
+        """
+        counts = self.monthly_counts(months, labels)
+        list_order = [l.id for l in sorted(self.board.lists, key=lambda l: l.pos or 0)]
+
+        tables = {}
+        for group, by_month in counts.items():
+            df = pd.DataFrame(by_month).fillna(0).astype('int64')
+            order = [list_id for list_id in list_order if list_id in df.index]
+            order += [list_id for list_id in df.index if list_id not in order]
+            df = df.reindex(order)
+            df.index = pd.Index([self.list_names.get(list_id, list_id) for list_id in df.index], name='Stage')
+            # Lists can share a name (e.g. two 'Study documents received'); count them as one stage
+            df = df.groupby(level='Stage', sort=False).sum()
+            df.loc['Total'] = df.sum()
+            tables[group] = df
+        return tables
+
+
+if __name__ == "__main__":
+    replay = BoardReplay.from_file('JSONS/qjaPunsX - data-acquisition-rp2.json')
+    print(f"{len(replay.transitions)} state changes since {replay.start}")
+    tables = replay.stage_tables(['Sep 2024', 'Oct 2024', 'Nov 2024', 'Dec 2024'])
+    print(tables[None].to_string())
@@ -0,0 +1,84 @@
+import hashlib
+import inspect
+import json
+import os
+
+
+def hash_bytes(data):
+    """SHA-256 hex digest of a bytes object"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(file_path):
+    """Content hash of a file on disk (e.g. an input CSV or workbook)"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_frame(df):
+    """Content hash of a DataFrame's values, index and column labels"""
+    return hash_bytes(df.to_csv().encode('utf-8'))
+
+
+def hash_code(*objects):
+    """
+    Hash of the code and settings that define a chart
+
+    Functions and classes contribute their source text; anything else
+    (stage orders, colour maps, write options) contributes its repr.
+    """
+    digest = hashlib.sha256()
+    for obj in objects:
+        if inspect.isfunction(obj) or inspect.isclass(obj):
+            digest.update(inspect.getsource(obj).encode('utf-8'))
+        else:
+            digest.update(repr(obj).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def combine_hashes(*hashes):
+    """Single hash standing for several input hashes"""
+    return hash_bytes('\n'.join(hashes).encode('utf-8'))
+
+
+class BuildManifest:
+    """
+    Record of which inputs each generated file was built from
+
+    The manifest maps every output path to the hash of its inputs. A file
+    only needs rebuilding when that hash changes or the file is missing, so
+    unchanged outputs keep their contents and modification times.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.outputs = {}
+        if os.path.exists(path):
+            with open(path, 'r') as file:
+                self.outputs = json.load(file).get('outputs', {})
+
+    def is_current(self, output, inputs_hash):
+        """True if ``output`` exists and was built from ``inputs_hash``"""
+        return self.outputs.get(output) == inputs_hash and os.path.exists(output)
+
+    def record(self, output, inputs_hash):
+        """Note that ``output`` has just been built from ``inputs_hash``"""
+        self.outputs[output] = inputs_hash
+
+    def prune(self, expected):
+        """Delete outputs from earlier builds that are no longer produced"""
+        removed = []
+        for output in list(self.outputs):
+            if output not in expected:
+                if os.path.exists(output):
+                    os.remove(output)
+                del self.outputs[output]
+                removed.append(output)
+        return removed
+
+    def save(self):
+        with open(self.path, 'w') as file:
+            json.dump({'outputs': self.outputs}, file, indent=2, sort_keys=True)
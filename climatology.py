@@ -0,0 +1,240 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from anomaly_series import csv_dtypes
+
+try:
+    import netCDF4
+except ImportError:  # optional: only needed to stream .nc files
+    netCDF4 = None
+
+# Statistics in the anomaly CSVs, one climatology/anomaly/value column triple each
+kinds = ['avg', 'max', 'min']
+
+# Default variable names of each kind in a NetCDF file (CRU TS naming)
+netcdf_variables = {'avg': 'tmp', 'max': 'tmx', 'min': 'tmn'}
+
+# Grid cells of the study sites, as in the anomaly and disaster file names
+study_sites = {
+    'Abidjan': (5.5, -4.5),
+    'JHB': (-26.5, 28.5)
+}
+
+# Whole months read per block; a block holds chunk_months x lat x lon values per kind
+chunk_months = 12
+
+# Column order of the anomaly CSVs
+anomaly_columns = list(csv_dtypes)
+
+
+class GridSource:
+    """
+    Raw gridded temperatures as (time x lat x lon) arrays that are read in slices
+
+    ``variables`` maps a kind ('avg', 'max', 'min') to anything that returns
+    a NumPy block for ``array[start:end]``: a memory-mapped .npy file or a
+    NetCDF variable, so only the block being processed is ever in memory.
+    Time steps may be daily or monthly but must be in order. A source
+    without an 'avg' variable uses (max + min) / 2.
+    """
+
+    def __init__(self, variables, times, lat, lon):
+        self.variables = dict(variables)
+        self.times = np.asarray(times, dtype='datetime64[D]')
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        if np.any(np.diff(self.times) < np.timedelta64(0, 'D')):
+            raise ValueError("Time steps must be in order")
+
+    @classmethod
+    def from_npy(cls, paths, times, lat, lon):
+        """Memory-map (time x lat x lon) .npy files, e.g. {'max': 'tmax.npy', 'min': 'tmin.npy'}"""
+        return cls({kind: np.load(path, mmap_mode='r') for kind, path in paths.items()}, times, lat, lon)
+
+    @classmethod
+    def from_netcdf(cls, path, variables=None, lat_name='lat', lon_name='lon', time_name='time'):
+        """Open a NetCDF file (needs the netCDF4 package); variables default to ``netcdf_variables``"""
+        if netCDF4 is None:
+            raise ImportError("Reading NetCDF files needs the netCDF4 package (pip install netCDF4)")
+        dataset = netCDF4.Dataset(path)
+        names = variables or {kind: name for kind, name in netcdf_variables.items() if name in dataset.variables}
+        time = dataset.variables[time_name]
+        times = netCDF4.num2date(time[:], time.units, getattr(time, 'calendar', 'standard'),
+                                 only_use_cftime_datetimes=False, only_use_python_datetimes=True)
+        return cls({kind: dataset.variables[name] for kind, name in names.items()},
+                   np.array(times, dtype='datetime64[D]'),
+                   dataset.variables[lat_name][:], dataset.variables[lon_name][:])
+
+    def cell_index(self, lat, lon):
+        """(row, column) of the grid cell whose centre is nearest to (lat, lon)"""
+        return int(np.abs(self.lat - lat).argmin()), int(np.abs(self.lon - lon).argmin())
+
+    def read(self, kind, start, end):
+        """Time steps [start, end) of one kind as float64, NaN where missing"""
+        if kind not in self.variables and not (kind == 'avg' and {'max', 'min'} <= set(self.variables)):
+            raise KeyError(f"No '{kind}' temperatures in this source; have {sorted(self.variables)}")
+        if kind == 'avg' and 'avg' not in self.variables:
+            return (self.read('max', start, end) + self.read('min', start, end)) / 2
+        # NetCDF variables return masked arrays for fill values
+        return np.ma.filled(np.ma.asarray(self.variables[kind][start:end], dtype=np.float64), np.nan)
+
+    def month_blocks(self, months_per_block=chunk_months):
+        """
+        Time-step ranges covering whole months, ``months_per_block`` at a time
+
+        Yields:
+        -------
+        (int, int, numpy.ndarray, numpy.ndarray)
+            start and end step, offset of each month within the block and
+            the months themselves (datetime64[M])
+        """
+        months = self.times.astype('datetime64[M]')
+        month_starts = np.concatenate([[0], np.flatnonzero(months[1:] != months[:-1]) + 1])
+        for first in range(0, len(month_starts), months_per_block):
+            starts = month_starts[first:first + months_per_block]
+            end = month_starts[first + months_per_block] if first + months_per_block < len(month_starts) else len(months)
+            yield starts[0], end, starts - starts[0], months[starts]
+
+
+def monthly_means(block, offsets):
+    """(month x lat x lon) NaN-aware means of a (step x lat x lon) block split at ``offsets``"""
+    present = ~np.isnan(block)
+    totals = np.add.reduceat(np.where(present, block, 0.0), offsets, axis=0)
+    counts = np.add.reduceat(present, offsets, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, totals / counts, np.nan)
+
+
+class MonthlyClimatology:
+    """
+    Per-calendar-month running mean and extrema of monthly values on a grid
+
+    ``update`` folds in a block of months: sums and counts (for the mean)
+    and the lowest and highest monthly value seen, per calendar month and
+    cell. Only (12 x lat x lon) accumulators are kept, however many years
+    are streamed through.
+    """
+
+    def __init__(self, shape):
+        self.total = np.zeros((12,) + shape)
+        self.count = np.zeros((12,) + shape, dtype=np.int64)
+        self.low = np.full((12,) + shape, np.inf)
+        self.high = np.full((12,) + shape, -np.inf)
+
+    def update(self, month_numbers, monthly):
+        """Add (month x lat x lon) values; ``month_numbers`` are 0 (January) to 11"""
+        present = ~np.isnan(monthly)
+        np.add.at(self.total, month_numbers, np.where(present, monthly, 0.0))
+        np.add.at(self.count, month_numbers, present)
+        np.fmin.at(self.low, month_numbers, monthly)
+        np.fmax.at(self.high, month_numbers, monthly)
+
+    @property
+    def mean(self):
+        """(12 x lat x lon) baseline; NaN where a calendar month was never observed"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count > 0, self.total / self.count, np.nan)
+
+    @property
+    def extrema(self):
+        """(lowest, highest) monthly value per calendar month and cell, NaN where unobserved"""
+        observed = self.count > 0
+        return np.where(observed, self.low, np.nan), np.where(observed, self.high, np.nan)
+
+
+def compute_anomalies(source, sites=None, base_years=None, months_per_block=chunk_months):
+    """
+    Climatologies and anomaly series for the study sites' cells in one streaming pass
+
+    Each block of whole months is reduced to monthly means (a no-op for
+    monthly data), folded into a ``MonthlyClimatology`` per kind and the
+    sites' cells are copied out; the anomalies are computed once the
+    baseline is complete.
+
+    Parameters:
+    -----------
+    source : GridSource
+    sites : dict, optional
+        Site name -> (lat, lon); defaults to ``study_sites``
+    base_years : (int, int), optional
+        First and last year of the baseline, e.g. (1991, 2020); every year by default
+    months_per_block : int
+        Whole months read at a time
+
+    Returns:
+    --------
+    (dict, dict)
+        Site -> DataFrame in the anomaly CSV schema, and kind -> MonthlyClimatology
+    """
+    sites = study_sites if sites is None else sites
+    cells = {site: source.cell_index(lat, lon) for site, (lat, lon) in sites.items()}
+    rows = np.array([row for row, _ in cells.values()], dtype=np.intp)
+    columns = np.array([column for _, column in cells.values()], dtype=np.intp)
+    climatologies = {kind: MonthlyClimatology((len(source.lat), len(source.lon))) for kind in kinds}
+
+    months, values = [], {kind: [] for kind in kinds}
+    for start, end, offsets, block_months in source.month_blocks(months_per_block):
+        month_numbers = block_months.astype(np.int64) % 12
+        years = block_months.astype('datetime64[Y]').astype(np.int64) + 1970
+        in_base = np.ones(len(block_months), dtype=bool)
+        if base_years is not None:
+            in_base = (years >= base_years[0]) & (years <= base_years[1])
+        for kind in kinds:
+            monthly = monthly_means(source.read(kind, start, end), offsets)
+            climatologies[kind].update(month_numbers[in_base], monthly[in_base])
+            values[kind].append(monthly[:, rows, columns])
+        months.append(block_months)
+
+    months = np.concatenate(months)
+    month_numbers = months.astype(np.int64) % 12
+    years = months.astype('datetime64[Y]').astype(np.int64) + 1970
+    baselines = {kind: climatology.mean for kind, climatology in climatologies.items()}
+    frames = {}
+    for position, site in enumerate(sites):
+        row, column = cells[site]
+        frame = pd.DataFrame({
+            'longitude': np.float32(source.lon[column]),
+            # Decimal year at mid-month, e.g. Feb 2012 -> 2012.125
+            'time': years + (month_numbers + 0.5) / 12,
+            'latitude': np.float32(source.lat[row]),
+            'date': [f'{number + 1}/{year}' for number, year in zip(month_numbers, years)],
+            'month_number': month_numbers.astype(np.int8)
+        })
+        for kind in kinds:
+            series = np.concatenate(values[kind])[:, position]
+            baseline = baselines[kind][month_numbers, row, column]
+            frame[f'climatology_{kind}'] = np.round(baseline, 2)
+            frame[f'temperature_{kind}'] = np.round(series - baseline, 2)
+            frame[f'calculated_temp_{kind}'] = np.round(series, 2)
+        frames[site] = frame[anomaly_columns]
+    return frames, climatologies
+
+
+def anomaly_file_name(site, frame):
+    """e.g. Abidjan_anomaly-5.5--4.5-2012-2022.csv, readable by anomaly_series.parse_cell_name"""
+    years = frame['date'].str.split('/').str[1].astype(int)
+    return (f"{site}_anomaly-{frame['latitude'].iloc[0]:g}-{frame['longitude'].iloc[0]:g}"
+            f"-{years.min()}-{years.max()}.csv")
+
+
+def write_anomaly_csvs(frames, output_dir='.'):
+    """Write each site's frame as a semicolon-separated anomaly CSV; returns the paths"""
+    paths = []
+    for site, frame in frames.items():
+        path = os.path.join(output_dir, anomaly_file_name(site, frame))
+        frame.to_csv(path, sep=';', index=False)
+        paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    # e.g. python climatology.py cru_ts4.07.2011.2020.nc 1991 2020
+    if len(sys.argv) < 2:
+        sys.exit("Usage: python climatology.py <gridded temperatures .nc> [first base year] [last base year]")
+    base = (int(sys.argv[2]), int(sys.argv[3])) if len(sys.argv) > 3 else None
+    frames, _ = compute_anomalies(GridSource.from_netcdf(sys.argv[1]), base_years=base)
+    for path in write_anomaly_csvs(frames):
+        print(f"Wrote {path}")
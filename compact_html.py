@@ -0,0 +1,265 @@
+import base64
+import gzip
+import glob
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+import plotly.io as pio
+from plotly.offline import get_plotlyjs_version
+
+try:
+    import brotli
+except ImportError:  # optional: .br siblings are skipped without it
+    brotli = None
+
+# plotly.js reads {'dtype', 'bdata'} typed arrays from version 2.28.0 on
+typed_array_version = (2, 28, 0)
+
+# Keys that plotly.js never accepts as typed arrays
+skipped_keys = {'range', 'geojson', 'layer', 'layers', 'categoryarray', 'tickvals', 'ticktext'}
+
+# Arrays shorter than this stay plain JSON; base64 only pays off for longer runs
+min_typed_length = 8
+
+# File name of a shared layout template, as referenced from the pages
+template_asset_pattern = re.compile(r'plotly-template-[0-9a-f]{12}\.js')
+
+_short_types = {'int8': 'i1', 'uint8': 'u1', 'int16': 'i2', 'uint16': 'u2',
+                'int32': 'i4', 'uint32': 'u4', 'float32': 'f4', 'float64': 'f8'}
+
+page_template = """<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><meta name="viewport" content="width=device-width, initial-scale=1">
+<script src="{plotly_src}"></script>
+<script src="{template_src}"></script>
+</head>
+<body style="margin:0">
+<div id="chart" style="width:100%;height:100%"></div>
+<script type="application/json" id="spec">{spec}</script>
+<script>
+const spec = JSON.parse(document.getElementById('spec').textContent);
+for (const trace of spec.data) Object.assign(trace, {{...spec.defaults[trace.type || 'scatter'], ...trace}});
+spec.layout.template = window.plotlyTemplate;
+Plotly.newPlot('chart', spec.data, spec.layout, {config});
+</script>
+</body>
+</html>
+"""
+
+
+def _version(text):
+    return tuple(int(part) for part in text.split('.')[:3] if part.isdigit())
+
+
+def supports_typed_arrays():
+    """Whether the plotly.js shipped with the installed plotly decodes base64 typed arrays"""
+    return _version(get_plotlyjs_version()) >= typed_array_version
+
+
+def typed_array(values):
+    """
+    ``{'dtype', 'bdata'}`` spec of a numeric array, or None if it is not one
+
+    Integers are stored in the narrowest type that holds them; floats that
+    are whole numbers are stored as integers too.
+    """
+    array = np.asarray(values)
+    if array.ndim != 1 or len(array) < min_typed_length or array.dtype.kind not in 'iuf':
+        return None
+    if array.dtype.kind == 'f':
+        if not np.isfinite(array).all() or (array % 1).any():
+            return {'dtype': 'f8', 'bdata': base64.b64encode(array.astype('<f8')).decode('ascii')}
+        array = array.astype(np.int64)
+    low, high = array.min(), array.max()
+    for dtype in ('int8', 'uint8', 'int16', 'uint16', 'int32', 'uint32'):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            data = array.astype(np.dtype(dtype).newbyteorder('<'))
+            return {'dtype': _short_types[dtype], 'bdata': base64.b64encode(data).decode('ascii')}
+    return None
+
+
+def encode_arrays(obj):
+    """Copy of a figure's traces with every numeric data array as a typed array"""
+    if isinstance(obj, dict):
+        encoded = {}
+        for key, value in obj.items():
+            spec = None
+            if key not in skipped_keys and isinstance(value, (list, tuple, np.ndarray)):
+                if not (isinstance(value, (list, tuple)) and any(isinstance(v, (str, bool)) or v is None for v in value)):
+                    spec = typed_array(value)
+            encoded[key] = spec if spec is not None else encode_arrays(value)
+        return encoded
+    if isinstance(obj, (list, tuple)):
+        return [encode_arrays(value) for value in obj]
+    return obj
+
+
+def shared_trace_defaults(traces):
+    """
+    Split out the properties every trace of a type has in common
+
+    Returns:
+    --------
+    (dict, list of dict)
+        Per-type defaults (only types with two or more traces) and the traces
+        without those properties; the page merges them back before plotting
+    """
+    by_type = {}
+    for trace in traces:
+        by_type.setdefault(trace.get('type', 'scatter'), []).append(trace)
+
+    defaults = {}
+    for trace_type, group in by_type.items():
+        if len(group) < 2:
+            continue
+        common = {key: value for key, value in group[0].items() if key != 'type'}
+        for trace in group[1:]:
+            common = {key: value for key, value in common.items()
+                      if key in trace and json.dumps(trace[key], sort_keys=True, default=str)
+                      == json.dumps(value, sort_keys=True, default=str)}
+        if common:
+            defaults[trace_type] = common
+
+    stripped = [{key: value for key, value in trace.items()
+                 if key not in defaults.get(trace.get('type', 'scatter'), {})} for trace in traces]
+    return defaults, stripped
+
+
+def _write_atomic(path, data):
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'wb') as file:
+        file.write(data)
+    os.replace(temp_path, path)
+
+
+def write_compressed(path, data):
+    """
+    Write ``data`` to ``path`` with .gz (and, with brotli installed, .br) siblings
+
+    Returns:
+    --------
+    dict
+        Bytes written per encoding, e.g. {'raw': 11431, 'gz': 2760, 'br': 2301}
+    """
+    _write_atomic(path, data)
+    sizes = {'raw': len(data)}
+    gz = gzip.compress(data, compresslevel=9, mtime=0)
+    _write_atomic(path + '.gz', gz)
+    sizes['gz'] = len(gz)
+    if brotli is not None:
+        br = brotli.compress(data, quality=11)
+        _write_atomic(path + '.br', br)
+        sizes['br'] = len(br)
+    return sizes
+
+
+def write_template_asset(template, output_dir):
+    """
+    Save a layout template as ``plotly-template-<hash>.js`` in ``output_dir``
+
+    The name is taken from the content, so every chart sharing the template
+    refers to one cacheable file and an unchanged template is never rewritten.
+    """
+    body = pio.json.to_json_plotly(template)
+    digest = hashlib.sha256(body.encode('utf-8')).hexdigest()[:12]
+    path = os.path.join(output_dir, f'plotly-template-{digest}.js')
+    if not os.path.exists(path):
+        write_compressed(path, f'window.plotlyTemplate = {body};\n'.encode('utf-8'))
+    return path
+
+
+def prune_template_assets(pages, output_dir):
+    """
+    Delete ``plotly-template-*.js`` files (and their .gz/.br siblings) that
+    none of ``pages`` load any more
+
+    Returns:
+    --------
+    list of str
+        Paths removed
+    """
+    used = set()
+    for page in pages:
+        if os.path.exists(page):
+            with open(page, 'r', encoding='utf-8') as file:
+                used.update(template_asset_pattern.findall(file.read()))
+    removed = []
+    for path in glob.glob(os.path.join(output_dir, 'plotly-template-*.js*')):
+        name = os.path.basename(path)
+        if name.rsplit('.js', 1)[0] + '.js' not in used:
+            os.remove(path)
+            removed.append(path)
+    return sorted(removed)
+
+
+def write_compact_html(fig, output_file, config=None):
+    """
+    Write a figure as a small HTML page plus precompressed siblings
+
+    Compared with ``fig.write_html(include_plotlyjs='cdn')``:
+
+    - numeric trace arrays are base64 typed arrays (when the CDN plotly.js
+      supports them),
+    - the layout template (the theme, identical for every chart) lives in a
+      shared, content-named script next to the page, and
+    - trace properties repeated across every trace of a type (hover
+      templates, text settings) are written once.
+
+    Parameters:
+    -----------
+    fig : dict or plotly.graph_objects.Figure
+    output_file : str
+        Page to write; ``.gz``/``.br`` siblings are written alongside
+    config : dict, optional
+        Plotly config (e.g. ``{'displayModeBar': False}``)
+
+    Returns:
+    --------
+    dict
+        Byte sizes of the page per encoding (see ``write_compressed``)
+    """
+    fig = fig if isinstance(fig, dict) else fig.to_plotly_json()
+    layout = dict(fig.get('layout', {}))
+    template = layout.pop('template', None) or {}
+    output_dir = os.path.dirname(output_file) or '.'
+    template_path = write_template_asset(template, output_dir)
+
+    traces = [dict(trace) for trace in fig.get('data', [])]
+    if supports_typed_arrays():
+        traces = encode_arrays(traces)
+    defaults, traces = shared_trace_defaults(traces)
+
+    # Compact JSON; escape '</' so a label can never close the script tag
+    spec = pio.json.to_json_plotly({'data': traces, 'layout': layout, 'defaults': defaults})
+    html = page_template.format(
+        plotly_src=f'https://cdn.plot.ly/plotly-{get_plotlyjs_version()}.min.js',
+        template_src=os.path.basename(template_path),
+        spec=spec.replace('</', '<\\/'),
+        config=json.dumps(config or {})
+    )
+    return write_compressed(output_file, html.encode('utf-8'))
+
+
+def size_report(paths):
+    """
+    On-disk size of each page and its .gz/.br siblings
+
+    Returns:
+    --------
+    dict
+        path -> {'raw': bytes, 'gz': bytes, 'br': bytes}, skipping missing files
+    """
+    report = {}
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        sizes = {'raw': os.path.getsize(path)}
+        for encoding in ('gz', 'br'):
+            if os.path.exists(f'{path}.{encoding}'):
+                sizes[encoding] = os.path.getsize(f'{path}.{encoding}')
+        report[path] = sizes
+    return report
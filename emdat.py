@@ -0,0 +1,145 @@
+import csv
+import io
+import itertools
+import re
+
+import pandas as pd
+
+# Numeric EM-DAT columns and the nullable dtype each is converted to
+numeric_columns = {
+    'CPI': 'Float64',
+    'Dis Mag Value': 'Float64',
+    'Total Deaths': 'Int64',
+    'No Injured': 'Int64',
+    'No Affected': 'Int64',
+    'No Homeless': 'Int64',
+    'Total Affected': 'Int64',
+    "Reconstruction Costs ('000 US$)": 'Float64',
+    "Reconstruction Costs, Adjusted ('000 US$)": 'Float64',
+    "Insured Damages ('000 US$)": 'Float64',
+    "Insured Damages, Adjusted ('000 US$)": 'Float64',
+    "Total Damages ('000 US$)": 'Float64',
+    "Total Damages, Adjusted ('000 US$)": 'Float64',
+    "AID Contribution ('000 US$)": 'Float64',
+    'Latitude': 'Float64',
+    'Longitude': 'Float64',
+    'Start Year': 'Int64',
+    'Start Month': 'Int64',
+    'Start Day': 'Int64',
+    'End Year': 'Int64',
+    'End Month': 'Int64',
+    'End Day': 'Int64',
+    'Year': 'Int64',
+    'Seq': 'Int64'
+}
+
+# Low-cardinality text columns stored as categories
+category_columns = [
+    'ISO', 'Country', 'Region', 'Continent', 'Disaster Group', 'Disaster Subgroup',
+    'Disaster Type', 'Disaster Subtype', 'Disaster Subsubtype', 'Dis Mag Scale'
+]
+
+
+# CPI written with a decimal comma ('87,358...') at the start of a record
+decimal_comma_cpi = re.compile(r'^(\d+),(\d+),')
+
+
+def _unframe(fields):
+    # A framed record is one comma-separated line that a spreadsheet wrapped in a
+    # single quoted field and padded with ';' columns. A ';' inside the original
+    # line (e.g. an 'Admin1 Code' list) split it early, so glue the pieces back.
+    while fields and fields[-1] == '':
+        fields.pop()
+    return ';'.join(fields)
+
+
+def iter_emdat_records(file_path):
+    """
+    Stream EM-DAT records as clean comma-separated lines, repairing the framing
+
+    Handles both plain comma-separated exports and the bounding-box extracts
+    in this repository (e.g. JHB_disasters--26.5-28.5-2012-2022.csv), where
+    every record sits inside one quoted field followed by ``;;;;;;;`` and the
+    CPI uses a decimal comma. The file is read once, record by record.
+
+    Yields:
+    -------
+    str
+        The header line first, then one CSV line per disaster
+    """
+    with open(file_path, 'r', encoding='utf-8-sig', newline='') as file:
+        first_line = file.readline()
+        if not first_line.rstrip('\r\n').endswith(';'):
+            # Already a plain CSV; pass the lines straight through
+            yield first_line
+            yield from file
+            return
+
+        file.seek(0)
+        records = (_unframe(fields) for fields in csv.reader(file, delimiter=';'))
+        header = next(records)
+        fix_cpi = header.startswith('CPI,')
+        yield header + '\n'
+        for record in records:
+            if not record:
+                continue
+            if fix_cpi:
+                record = decimal_comma_cpi.sub(r'\1.\2,', record, count=1)
+            yield record + '\n'
+
+
+def _event_dates(year, month, day, start):
+    # Missing months/days widen the interval: start of period for Start, end for End
+    month = month.fillna(1 if start else 12)
+    frame = pd.DataFrame({'year': year, 'month': month, 'day': 1}).astype('float64')
+    dates = pd.to_datetime(frame, errors='coerce')
+    if start:
+        return dates + pd.to_timedelta(day.fillna(1).astype('float64') - 1, unit='D')
+    month_end = dates + pd.offsets.MonthEnd(0)
+    return month_end.where(day.isna(), dates + pd.to_timedelta(day.astype('float64') - 1, unit='D'))
+
+
+def read_emdat(file_path, chunk_size=100000):
+    """
+    Read an EM-DAT disaster export into a typed DataFrame
+
+    Parameters:
+    -----------
+    file_path : str
+        Path to an EM-DAT CSV (framed bounding-box extract or full dump)
+    chunk_size : int
+        Records converted to a DataFrame at a time while streaming
+
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per disaster with numeric columns as nullable numbers,
+        categorical text columns, and 'Start Date' / 'End Date' timestamps
+    """
+    records = iter_emdat_records(file_path)
+    header = next(records)
+    names = next(csv.reader([header]))
+    dtypes = {column: numeric_columns.get(column, 'string') for column in names}
+
+    # Hand the repaired text to the C parser a chunk at a time
+    chunks = [pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in dtypes.items()})]
+    while lines := list(itertools.islice(records, chunk_size)):
+        chunks.append(pd.read_csv(io.StringIO(''.join(lines)), header=None, names=names,
+                                  dtype=dtypes, keep_default_na=False, na_values=['']))
+    df = pd.concat(chunks, ignore_index=True)
+
+    for column in category_columns:
+        if column in df.columns:
+            df[column] = df[column].str.strip().astype('category')
+
+    if {'Start Year', 'Start Month', 'Start Day'} <= set(df.columns):
+        df['Start Date'] = _event_dates(df['Start Year'], df['Start Month'], df['Start Day'], start=True)
+    if {'End Year', 'End Month', 'End Day'} <= set(df.columns):
+        df['End Date'] = _event_dates(df['End Year'], df['End Month'], df['End Day'], start=False)
+    return df
+
+
+if __name__ == "__main__":
+    disasters = read_emdat('JHB_disasters--26.5-28.5-2012-2022.csv')
+    print(disasters[['Dis No', 'Disaster Type', 'Start Date', 'End Date', 'Total Deaths',
+                     'Total Affected', 'Latitude', 'Longitude']].to_string())
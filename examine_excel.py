@@ -1,8 +1,8 @@
-import pandas as pd
+from heat_tables import load_progress_tables, progress_sheets
 
-def examine_excel(file_path):
-    # Read all sheets from the Excel file
-    excel_data = pd.read_excel(file_path, sheet_name=None)
+def examine_excel(file_path, sheets=progress_sheets):
+    # Read the progress sheets (cached by workbook content; see heat_tables)
+    excel_data = load_progress_tables(file_path, sheets)
     
     print("Available sheets:")
     for sheet_name in excel_data.keys():
@@ -0,0 +1,80 @@
+import matplotlib.pyplot as plt
+import plotly.graph_objects as go
+
+
+def _merge(base, overrides):
+    # One-level merge: nested dicts (title, legend, marker) are combined, not replaced
+    merged = dict(base)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = {**merged[key], **value}
+        else:
+            merged[key] = value
+    return merged
+
+
+class PlotlyTemplate:
+    """
+    Layout and trace styles of one Plotly chart type, resolved once
+
+    The layout and every named trace style go through plotly's validators a
+    single time (which also attaches the default theme) and are kept as
+    plain dicts. ``bind`` only merges a site's data into shallow copies, so
+    each figure costs a few dict operations instead of a full ``go.Figure``
+    build. The result is a figure dict; write it with ``validate=False``.
+
+    Parameters:
+    -----------
+    layout : dict
+        Layout shared by every figure of this type
+    traces : dict, optional
+        Style name -> trace (e.g. ``go.Bar(marker_color=...)``) without data
+    """
+
+    def __init__(self, layout, traces=None):
+        self.layout = go.Figure(layout=layout).to_dict()['layout']
+        self.traces = {name: go.Figure(data=[trace]).to_dict()['data'][0]
+                       for name, trace in (traces or {}).items()}
+
+    def trace(self, name, **data):
+        """Trace dict in style ``name`` carrying ``data`` (x, y, labels, values, ...)"""
+        return _merge(self.traces[name], data)
+
+    def bind(self, traces, **layout):
+        """Figure dict with the given traces and per-figure layout changes (title text, annotations)"""
+        return {'data': list(traces), 'layout': _merge(self.layout, layout)}
+
+
+class FigureTemplate:
+    """
+    A matplotlib figure whose fixed parts are drawn once and reused
+
+    ``setup(fig)`` draws what every chart of this kind shares (axes labels,
+    notes, margins) and returns the axes. ``bind`` returns the figure with
+    everything drawn since setup removed and the data limits reset, so the
+    next site's bars, labels and legend go into the same figure. One figure
+    is kept per process; closing it just makes the next ``bind`` rebuild it.
+    """
+
+    def __init__(self, setup, **figure_kwargs):
+        self.setup = setup
+        self.figure_kwargs = figure_kwargs
+        self.figure = None
+        self.axes = None
+        self._static = set()
+
+    def bind(self):
+        """(figure, axes) ready for new data, made the current pyplot figure"""
+        if self.figure is None or not plt.fignum_exists(self.figure.number):
+            self.figure = plt.figure(**self.figure_kwargs)
+            self.axes = self.setup(self.figure)
+            self._static = set(self.axes.get_children())
+        else:
+            for artist in self.axes.get_children():
+                if artist not in self._static:
+                    artist.remove()
+            self.axes.containers.clear()
+            self.axes.relim()
+            self.axes.set_autoscale_on(True)
+        plt.figure(self.figure.number)
+        return self.figure, self.axes
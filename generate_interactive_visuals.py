@@ -1,23 +1,27 @@
-import pandas as pd
 import plotly.graph_objects as go
+import plotly.io as pio
+import glob
+import json
 import os
+import sys
+
+from build_manifest import BuildManifest, combine_hashes, hash_code, hash_frame
+from compact_html import (encode_arrays, page_template, prune_template_assets, shared_trace_defaults,
+                          size_report, typed_array, write_compact_html)
+from figure_templates import PlotlyTemplate
+from instrumentation import RunReport, step
+from progress_store import load_store
+from render_scheduler import RenderError, make_job, output_path, run_jobs
+from stage_taxonomy import canonical_stage, pipeline_order
 
 # Create directory for interactive plots if it doesn't exist
 os.makedirs('interactive_plots', exist_ok=True)
 
-# Define the order of stages for consistent visualization
-stage_order = [
-    'Ineligible/declined participation/data currently unavailable',  # Start with ineligible
-    'Contact procedures not initiated',
-    '1st or 2nd invites',
-    '3rd or more invites',
-    'Data sharing discussions and eligibility check',
-    'DTA in progress',
-    'DTA completed',
-    'Data sets in hand',
-    'Database harmonization',  # End with the final process
-    'Database ready for analysis'
-]
+# Records which inputs each chart was last built from
+manifest_file = 'interactive_plots/.build_manifest.json'
+
+# Bytes of every page per encoding (raw, gz, br), rewritten on each build
+size_report_file = 'interactive_plots/size_report.json'
 
 # Define colors for each stage
 color_map = {
@@ -33,8 +37,70 @@ color_map = {
     'Ineligible/declined participation/data currently unavailable': '#7f7f7f'  # Gray
 }
 
+# Charted stages in pipeline order (see stage_taxonomy), ineligible first
+ineligible = canonical_stage('ineligible')
+stage_order = [ineligible] + [stage for stage in pipeline_order(color_map) if stage != ineligible]
+
+# Charts share their layout and trace styles across sites; the templates are
+# validated once per process and each site's data is bound into copies
+_templates = {}
+
+def chart_templates():
+    """Plotly templates for the donut and stacked bar charts, built on first use"""
+    if not _templates:
+        title = dict(x=0.5, y=0.95, xanchor='center', yanchor='top', font=dict(size=20))
+        legend = dict(orientation="h", yanchor="bottom", y=-0.5, xanchor="center", x=0.5)
+        
+        _templates['donut'] = PlotlyTemplate(
+            layout=dict(
+                showlegend=True,
+                title=title,
+                legend=legend,
+                height=600,
+                margin=dict(t=100, b=150)
+            ),
+            traces={'donut': go.Pie(
+                hole=.5,
+                hovertemplate="Stage: %{label}<br>Studies: %{value}<extra></extra>",
+                textinfo='value+percent',
+                textposition='inside'
+            )}
+        )
+        
+        # One bar style per stage, so colours and hover text are resolved once
+        _templates['bar'] = PlotlyTemplate(
+            layout=dict(
+                barmode='stack',
+                title=title,
+                showlegend=True,
+                legend=dict(legend, traceorder='normal'),  # Normal order to match stage_order
+                xaxis_title="Month",
+                yaxis_title="Number of Studies",
+                height=600,
+                margin=dict(t=100, b=150),
+                hovermode='closest'
+            ),
+            traces={stage: go.Bar(
+                name=stage,
+                marker_color=color_map[stage],
+                hovertemplate="Stage: %{fullData.name}<br>Month: %{x}<br>Studies: %{y}<extra></extra>"
+            ) for stage in stage_order}
+        )
+    return _templates
+
+def _donut_figure(stages, values, title, total):
+    template = chart_templates()['donut']
+    trace = template.trace('donut', labels=stages, values=values,
+                           marker=dict(colors=[color_map[stage] for stage in stages]))
+    return template.bind([trace], title=dict(text=title), annotations=[dict(
+        text=f'Total Studies: {int(total)}',
+        x=0.5, y=0.5,
+        font=dict(size=16),
+        showarrow=False
+    )])
+
 def create_donut_chart(df, name):
-    """Create a donut chart for the latest month's data"""
+    """Create a donut chart for the latest month's data (a figure dict; see chart_templates)"""
     # Get latest month data
     latest_month = df.columns[-1]
     latest_data = df[~df.index.isin(['Total'])].copy()  # Exclude Total row
@@ -46,84 +112,28 @@ def create_donut_chart(df, name):
     sorted_stages = [stage for stage in stage_order if stage in latest_data.index]
     sorted_values = [latest_data.loc[stage, latest_month] for stage in sorted_stages]
     
-    # Create donut chart
-    fig = go.Figure(data=[go.Pie(
-        labels=sorted_stages,
-        values=sorted_values,
-        hole=.5,
-        marker_colors=[color_map[stage] for stage in sorted_stages],
-        hovertemplate="Stage: %{label}<br>Studies: %{value}<extra></extra>",
-        textinfo='value+percent',
-        textposition='inside'
-    )])
-    
     # Get total from the Total row if it exists, otherwise calculate it
     total = df.loc['Total', latest_month] if 'Total' in df.index else sum(sorted_values)
     
-    # Update layout
-    fig.update_layout(
-        showlegend=True,
-        title=dict(
-            text=f"{name} Distribution - {latest_month}",
-            x=0.5,
-            y=0.95,
-            xanchor='center',
-            yanchor='top',
-            font=dict(size=20)
-        ),
-        legend=dict(
-            orientation="h",
-            yanchor="bottom",
-            y=-0.5,
-            xanchor="center",
-            x=0.5
-        ),
-        height=600,
-        margin=dict(t=100, b=150),
-        annotations=[dict(
-            text=f'Total Studies: {int(total)}',
-            x=0.5, y=0.5,
-            font_size=16,
-            showarrow=False
-        )]
-    )
-    
-    return fig
+    return _donut_figure(sorted_stages, sorted_values, f"{name} Distribution - {latest_month}", total)
 
 def create_stacked_bar_chart(df, name):
-    """Create an interactive stacked bar chart showing progress"""
-    # Create figure
-    fig = go.Figure()
+    """Create an interactive stacked bar chart showing progress (a figure dict; see chart_templates)"""
+    template = chart_templates()['bar']
     
     # Remove Total row if it exists
     df_no_total = df[~df.index.isin(['Total'])]
+    months = list(df_no_total.columns)
     
-    # Add traces for each stage in reverse order for proper stacking
-    # First add ineligible at bottom
-    if 'Ineligible/declined participation/data currently unavailable' in df_no_total.index:
-        stage_data = df_no_total.loc['Ineligible/declined participation/data currently unavailable']
-        if any(stage_data > 0):
-            fig.add_trace(go.Bar(
-                name='Ineligible/declined participation/data currently unavailable',
-                x=df_no_total.columns,
-                y=stage_data,
-                marker_color=color_map['Ineligible/declined participation/data currently unavailable'],
-                hovertemplate="Stage: Ineligible/declined participation/data currently unavailable<br>Month: %{x}<br>Studies: %{y}<extra></extra>"
-            ))
-    
-    # Then add other stages in reverse order (excluding ineligible)
-    other_stages = [s for s in reversed(stage_order) if s != 'Ineligible/declined participation/data currently unavailable']
-    for stage in other_stages:
+    # Ineligible goes at the bottom, then the other stages in reverse order
+    # for proper stacking; stages without any studies get no trace
+    stages = [ineligible] + [s for s in reversed(stage_order) if s != ineligible]
+    traces = []
+    for stage in stages:
         if stage in df_no_total.index:
             stage_data = df_no_total.loc[stage]
-            if any(stage_data > 0):  # Only add trace if there's non-zero data
-                fig.add_trace(go.Bar(
-                    name=stage,
-                    x=df_no_total.columns,
-                    y=stage_data,
-                    marker_color=color_map[stage],
-                    hovertemplate=f"Stage: {stage}<br>Month: %{{x}}<br>Studies: %{{y}}<extra></extra>"
-                ))
+            if any(stage_data > 0):
+                traces.append(template.trace(stage, x=months, y=stage_data.to_numpy()))
     
     # Get monthly totals from Total row if it exists, otherwise calculate
     if 'Total' in df.index:
@@ -131,69 +141,43 @@ def create_stacked_bar_chart(df, name):
     else:
         monthly_totals = df_no_total.sum()
     
-    # Update layout
-    fig.update_layout(
-        barmode='stack',
-        title=dict(
-            text=f"{name} Progress Over Time",
-            x=0.5,
-            y=0.95,
-            xanchor='center',
-            yanchor='top',
-            font=dict(size=20)
-        ),
-        showlegend=True,
-        legend=dict(
-            traceorder='normal',  # Normal order to match stage_order
-            orientation="h",
-            yanchor="bottom",
-            y=-0.5,
-            xanchor="center",
-            x=0.5
-        ),
-        xaxis_title="Month",
-        yaxis_title="Number of Studies",
-        height=600,
-        margin=dict(t=100, b=150),
-        hovermode='closest',
-        annotations=[
-            dict(
-                x=month,
-                y=total,
-                text=f'N={int(total)}',
-                showarrow=False,
-                yshift=10
-            ) for month, total in monthly_totals.items()
-        ]
-    )
-    
-    return fig
+    return template.bind(traces, title=dict(text=f"{name} Progress Over Time"), annotations=[
+        dict(
+            x=month,
+            y=total,
+            text=f'N={int(total)}',
+            showarrow=False,
+            yshift=10
+        ) for month, total in monthly_totals.items()
+    ])
 
-def create_combined_donut_chart(datasets):
-    """Create a combined donut chart showing the latest distribution across all datasets"""
+def create_combined_donut_chart(frames):
+    """Create a combined donut chart showing the latest distribution across all datasets
+
+    frames maps each site name to its Stage x Month table, as already loaded
+    for the per-site charts.
+    """
     # Combine the latest month data from all datasets
     combined_data = {}
     total_studies = 0
     
-    for site_name, file_name in datasets.items():
-        if os.path.exists(file_name):
-            df = pd.read_csv(file_name, index_col='Stage')
-            latest_month = df.columns[-1]
-            
-            # Get data excluding Total row
-            latest_data = df[~df.index.isin(['Total'])].copy()
-            
-            # Add data to combined dictionary
-            for stage in latest_data.index:
-                if stage not in combined_data:
-                    combined_data[stage] = 0
-                combined_data[stage] += latest_data.loc[stage, latest_month]
-            
-            # Add to total studies
-            if 'Total' in df.index:
-                total_studies += df.loc['Total', latest_month]
-            else:
-                total_studies += latest_data[latest_month].sum()
+    for site_name, df in frames.items():
+        latest_month = df.columns[-1]
+        
+        # Get data excluding Total row
+        latest_data = df[~df.index.isin(['Total'])].copy()
+        
+        # Add data to combined dictionary
+        for stage in latest_data.index:
+            if stage not in combined_data:
+                combined_data[stage] = 0
+            combined_data[stage] += latest_data.loc[stage, latest_month]
+        
+        # Add to total studies
+        if 'Total' in df.index:
+            total_studies += df.loc['Total', latest_month]
+        else:
+            total_studies += latest_data[latest_month].sum()
     
     # Filter out stages with zero values and prepare for plotting
     plot_data = {stage: count for stage, count in combined_data.items() if count > 0}
@@ -202,99 +186,230 @@ def create_combined_donut_chart(datasets):
     sorted_stages = [stage for stage in stage_order if stage in plot_data]
     sorted_values = [plot_data[stage] for stage in sorted_stages]
     
-    # Create donut chart
-    fig = go.Figure(data=[go.Pie(
-        labels=sorted_stages,
-        values=sorted_values,
-        hole=.5,
-        marker_colors=[color_map[stage] for stage in sorted_stages],
-        hovertemplate="Stage: %{label}<br>Studies: %{value}<extra></extra>",
-        textinfo='value+percent',
-        textposition='inside'
-    )])
+    return _donut_figure(sorted_stages, sorted_values, "Combined Distribution - Latest Data", total_studies)
+
+# Options passed to every write_html call
+html_config = {
+    'displayModeBar': False,
+    'responsive': True
+}
+
+def save_figure(fig, output_file):
+    """Write a figure (dict or go.Figure) as a compact HTML page
+
+    Trace data is written as typed arrays, the theme goes to a shared
+    script next to the page and .gz/.br siblings are written for static
+    hosting (see compact_html). Returns the page's sizes per encoding.
+    """
+    return write_compact_html(fig, output_file, config=html_config)
+
+def render_chart(builder, output_file, *args):
+    """Build a figure with one of the chart functions and save it (runs in a worker)"""
+    with step('build figure'):
+        fig = builder(*args)
+    with step('write_html'):
+        save_figure(fig, output_file)
+
+# Single-page dashboard output
+dashboard_file = 'dashboard.html'
+plotly_bundle = 'vendor/plotly.min.js'
+
+dashboard_template = """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>HE²AT Project Data Acquisition Progress</title>
+    <style>
+        body {{ font-family: Arial, sans-serif; margin: 0; padding: 20px; background-color: #f5f5f5; color: #333; }}
+        .container {{ max-width: 1200px; margin: 0 auto; background-color: white; padding: 30px; border-radius: 15px; }}
+        .plot-container {{ margin-bottom: 40px; }}
+        .plot-title {{ text-align: center; }}
+        .chart {{ width: 100%; min-height: 600px; }}
+    </style>
+    <script src="{plotly_src}"></script>
+</head>
+<body>
+    <div class="container">
+        <h1 class="plot-title">HE²AT Project Data Acquisition Progress</h1>
+{sections}
+    </div>
+    <script type="application/json" id="figure-specs">{specs}</script>
+    <script>
+        // Render every figure from its JSON spec with the one shared Plotly bundle
+        const specs = JSON.parse(document.getElementById('figure-specs').textContent);
+        const config = {config};
+        for (const [id, spec] of Object.entries(specs.figures)) {{
+            spec.layout.template = specs.template;
+            Plotly.newPlot(id, spec.data, spec.layout, config);
+        }}
+    </script>
+</body>
+</html>
+"""
+
+def vendor_plotly(bundle_path=plotly_bundle):
+    """Write the plotly.js bundle shipped with the plotly package next to the dashboard
+
+    The file is only rewritten when its contents differ, so repeated builds
+    leave it (and browser caches of it) untouched.
+    """
+    from plotly.offline import get_plotlyjs
     
-    # Update layout
-    fig.update_layout(
-        showlegend=True,
-        title=dict(
-            text=f"Combined Distribution - Latest Data",
-            x=0.5,
-            y=0.95,
-            xanchor='center',
-            yanchor='top',
-            font=dict(size=20)
-        ),
-        legend=dict(
-            orientation="h",
-            yanchor="bottom",
-            y=-0.5,
-            xanchor="center",
-            x=0.5
-        ),
-        height=600,
-        margin=dict(t=100, b=150),
-        annotations=[dict(
-            text=f'Total Studies: {int(total_studies)}',
-            x=0.5, y=0.5,
-            font_size=16,
-            showarrow=False
-        )]
-    )
+    bundle = get_plotlyjs()
+    if os.path.exists(bundle_path):
+        with open(bundle_path, 'r', encoding='utf-8') as file:
+            if file.read() == bundle:
+                return bundle_path
+    os.makedirs(os.path.dirname(bundle_path), exist_ok=True)
+    with open(bundle_path, 'w', encoding='utf-8') as file:
+        file.write(bundle)
+    return bundle_path
+
+def build_dashboard(frames, output_file=dashboard_file, bundle_path=plotly_bundle):
+    """Write every chart into one page that loads Plotly once
+
+    Figures are embedded as compact JSON specs and drawn into plain divs, so
+    the page needs a single browsing context and no network access.
+    """
+    vendor_plotly(bundle_path)
     
-    return fig
+    sections = []
+    specs = {}
+    
+    def add_section(title, figures):
+        divs = []
+        for div_id, fig in figures:
+            fig = fig if isinstance(fig, dict) else fig.to_plotly_json()
+            specs[div_id] = dict(fig, layout=dict(fig['layout']))
+            divs.append(f'            <div id="{div_id}" class="chart"></div>')
+        sections.append('\n'.join([
+            '        <div class="plot-container">',
+            f'            <h2 class="plot-title">{title}</h2>',
+            *divs,
+            '        </div>'
+        ]))
+    
+    add_section('Overall Progress', [('combined_donut', create_combined_donut_chart(frames))])
+    for site_name, df in frames.items():
+        site_id = site_name.lower()
+        add_section(f'{site_name} Progress', [
+            (f'{site_id}_donut', create_donut_chart(df, site_name)),
+            (f'{site_id}_bar', create_stacked_bar_chart(df, site_name))
+        ])
+    
+    # Every figure carries the same default template; ship it once
+    templates = [spec['layout'].pop('template', None) for spec in specs.values()]
+    payload = {'template': templates[0] if templates else None, 'figures': specs}
+    
+    # Compact JSON; escape '</' so a label can never close the script tag
+    specs_json = pio.json.to_json_plotly(payload).replace('</', '<\\/')
+    html = dashboard_template.format(
+        plotly_src=os.path.relpath(bundle_path, os.path.dirname(output_file) or '.'),
+        sections='\n'.join(sections),
+        specs=specs_json,
+        config=json.dumps(html_config)
+    )
+    with open(output_file, 'w', encoding='utf-8') as file:
+        file.write(html)
+    return output_file
 
-def main():
-    # Process each dataset
+def main(force=False, max_workers=None, dashboard=False, report=None):
+    """Build the interactive charts, re-rendering only those whose inputs changed
+
+    Each output is recorded in interactive_plots/.build_manifest.json with a
+    hash of its data and of the chart code; pass force=True (or --force on
+    the command line) to rebuild everything. With dashboard=True (or
+    --dashboard) a single dashboard.html is written instead of one page per
+    chart. Set HEAT_INSTRUMENT=1 (or pass an enabled RunReport) to write a
+    timing and memory report to interactive_plots/.
+    """
+    report = report or RunReport('generate_interactive_visuals', 'interactive_plots')
+
+    # Process each dataset (site name -> key in the progress store)
     datasets = {
-        'RP1': 'rp1_data.csv',
-        'Johannesburg': 'johannesburg_data.csv',
-        'Abidjan': 'abidjan_data.csv'
+        'RP1': 'rp1',
+        'Johannesburg': 'johannesburg',
+        'Abidjan': 'abidjan'
     }
     
-    # Remove old files
-    for file in os.listdir('interactive_plots'):
-        os.remove(os.path.join('interactive_plots', file))
+    manifest = BuildManifest(manifest_file)
     
-    for site_name, file_name in datasets.items():
-        if os.path.exists(file_name):
-            # Load data
-            df = pd.read_csv(file_name, index_col='Stage')
-            
-            # Create and save donut chart
-            donut_fig = create_donut_chart(df, site_name)
-            donut_fig.write_html(
-                f'interactive_plots/{site_name.lower()}_donut.html',
-                include_plotlyjs='cdn',
-                full_html=True,
-                config={
-                    'displayModeBar': False,
-                    'responsive': True
-                }
-            )
-            
-            # Create and save bar chart
-            bar_fig = create_stacked_bar_chart(df, site_name)
-            bar_fig.write_html(
-                f'interactive_plots/{site_name.lower()}_bar.html',
-                include_plotlyjs='cdn',
-                full_html=True,
-                config={
-                    'displayModeBar': False,
-                    'responsive': True
-                }
-            )
+    # Load every site's table once and share it between the charts
+    with report.phase('load store'):
+        store = load_store()
+        frames = {site_name: store.wide(site) for site_name, site in datasets.items()
+                  if site in store.sites()}
     
-    # Create and save combined donut chart
-    combined_donut = create_combined_donut_chart(datasets)
-    combined_donut.write_html(
-        'interactive_plots/combined_donut.html',
-        include_plotlyjs='cdn',
-        full_html=True,
-        config={
-            'displayModeBar': False,
-            'responsive': True
-        }
-    )
+    if dashboard:
+        with report.phase('build dashboard'):
+            print(f"Generated {build_dashboard(frames)}")
+        report.write()
+        return
+    
+    # Hashes of the chart code, so a change to a chart spec rebuilds its files
+    with report.phase('hash inputs'):
+        writer_code = hash_code(save_figure, html_config, write_compact_html, encode_arrays,
+                                typed_array, shared_trace_defaults, page_template)
+        donut_code = hash_code(chart_templates, _donut_figure, create_donut_chart,
+                               stage_order, color_map, writer_code)
+        bar_code = hash_code(chart_templates, create_stacked_bar_chart,
+                             stage_order, color_map, writer_code)
+        combined_code = hash_code(chart_templates, _donut_figure, create_combined_donut_chart,
+                                  stage_order, color_map, writer_code)
+        site_hashes = {site_name: hash_frame(df) for site_name, df in frames.items()}
+    expected = []
+    jobs = []
+    job_hashes = {}
+    
+    def schedule(site_name, chart_type, inputs_hash, builder, *args):
+        output_file = output_path('interactive_plots', site_name, chart_type, 'html')
+        expected.append(output_file)
+        if force or not manifest.is_current(output_file, inputs_hash):
+            jobs.append(make_job(site_name, chart_type, output_file,
+                                 render_chart, builder, output_file, *args))
+            job_hashes[output_file] = inputs_hash
+    
+    for site_name, df in frames.items():
+        # Donut and bar chart for each site
+        schedule(site_name, 'donut', combine_hashes(site_hashes[site_name], donut_code),
+                 create_donut_chart, df, site_name)
+        schedule(site_name, 'bar', combine_hashes(site_hashes[site_name], bar_code),
+                 create_stacked_bar_chart, df, site_name)
+    
+    # Combined donut chart whenever any site changed
+    combined_hash = combine_hashes(*[f'{name}:{h}' for name, h in site_hashes.items()], combined_code)
+    schedule('combined', 'donut', combined_hash, create_combined_donut_chart, frames)
+    
+    # Render the out-of-date charts in parallel, recording whatever succeeded
+    rebuilt = []
+    try:
+        with report.phase('render charts'):
+            rebuilt = run_jobs(jobs, max_workers=max_workers, report=report)
+    except RenderError as error:
+        rebuilt = [job.output for job in error.completed]
+        raise
+    finally:
+        for output_file in rebuilt:
+            manifest.record(output_file, job_hashes[output_file])
+        # Remove charts of sites that are no longer part of the build, and
+        # theme scripts that no remaining page loads
+        for output in manifest.prune(expected) + prune_template_assets(expected, 'interactive_plots'):
+            print(f"Removed {output}")
+        manifest.save()
+    
+    for output in rebuilt:
+        print(f"Generated {output}")
+    print(f"{len(expected) - len(rebuilt)} of {len(expected)} charts unchanged")
+    
+    # Transfer sizes of every page (and the shared theme script) per encoding
+    assets = sorted(glob.glob('interactive_plots/plotly-template-*.js'))
+    sizes = size_report(expected + assets)
+    with open(size_report_file, 'w', encoding='utf-8') as file:
+        json.dump(sizes, file, indent=2)
+    for path, encodings in sizes.items():
+        print(f"{path}: " + ', '.join(f"{encoding} {size / 1024:.1f} KB" for encoding, size in encodings.items()))
+    report.write()
 
 if __name__ == "__main__":
-    main()
+    main(force='--force' in sys.argv, dashboard='--dashboard' in sys.argv)
@@ -1,12 +1,13 @@
 import pandas as pd
+from heat_tables import load_progress_tables
 from progress_visualizer import ProgressVisualizer
 
 def process_excel_data(excel_file):
     """
     Read and process data from the Excel file
     """
-    # Read the Excel file
-    df = pd.read_excel(excel_file, sheet_name=None)
+    # Read the progress sheets (cached by workbook content; see heat_tables)
+    df = load_progress_tables(excel_file)
     
     # Initialize visualizer
     visualizer = ProgressVisualizer()
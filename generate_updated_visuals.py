@@ -1,19 +1,18 @@
+import os
+
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
 
-# Define stage order and colors
-stage_order = [
-    '1st or 2nd invites',
-    '3rd or more invites',
-    'Data sharing discussions and eligibility check',
-    'DTA in progress',
-    'DTA completed',
-    'Data sets in hand',
-    'Databases harmonised',
-    'Ineligible/declined participation/data currently unavailable'
-]
+from figure_templates import FigureTemplate
+from image_export import export_figure, write_srcset_manifest
+from instrumentation import RunReport, step
+from progress_store import load_store, month_format
+from render_scheduler import make_job, output_path, run_jobs
+from stage_taxonomy import encode_stages, pipeline_order, reindex_stages
+from stacked_bars import add_texts, plot_stacked_bars, stack_positions, value_labels
 
+# Colour of each charted stage
 color_map = {
     '1st or 2nd invites': '#1f77b4',
     '3rd or more invites': '#ff7f0e',
@@ -21,70 +20,101 @@ color_map = {
     'DTA in progress': '#d62728',
     'DTA completed': '#9467bd',
     'Data sets in hand': '#8c564b',
-    'Databases harmonised': '#e377c2',
+    'Database harmonization': '#e377c2',
     'Ineligible/declined participation/data currently unavailable': '#7f7f7f'
 }
 
+# Charted stages in pipeline order (see stage_taxonomy)
+stage_order = pipeline_order(color_map)
+
+def _progress_chart_setup(fig):
+    """Parts of the progress chart that are the same for every site"""
+    ax = fig.gca()
+    ax.set_ylabel('Number of Studies')
+    
+    # Add notes explaining N and n
+    note_text = "Notes:\nN = Total number of eligible studies\nn = Number of ineligible/declined studies"
+    fig.text(0.98, 0.02, note_text, ha='right', va='bottom', fontsize=10, style='italic')
+    fig.subplots_adjust(right=0.85, bottom=0.2)
+    return ax
+
+# One 15x8 figure per process; each site's bars, labels and legend are drawn into it
+progress_template = FigureTemplate(_progress_chart_setup, figsize=(15, 8))
+
 def plot_stacked_bar_chart(df, title, save_path=None):
-    """Create a stacked bar chart showing progress"""
+    """Create a stacked bar chart showing progress
+
+    The figure comes from ``progress_template`` and is kept open for the
+    next chart; only the data-dependent artists are drawn here.
+    """
     # Prepare the data
-    df = df[df['Stage'] != 'Total'].copy()  # Remove Total row
-    df = df.set_index('Stage').reindex(stage_order).reset_index()
-    months = df.columns[1:]
-    
-    # Create the plot
-    plt.figure(figsize=(15, 8))
-    ax = plt.gca()
-    
-    # Plot each stage
-    bottom = np.zeros(len(months))
-    for stage in df['Stage']:
-        values = df[df['Stage'] == stage].iloc[:, 1:].values[0]
-        ax.bar(range(len(months)), values, bottom=bottom, 
-               label=stage, color=color_map.get(stage, '#333333'))
-        
-        # Add value labels for non-zero values
-        for i, v in enumerate(values):
-            if v > 0:
-                ax.text(i, bottom[i] + v/2, f'{int(v)}',
-                       ha='center', va='center')
-        bottom += values
+    with step('reshape'):
+        df = df[df['Stage'] != 'Total'].copy()  # Remove Total row
+        df = reindex_stages(df, stage_order)
+        months = df.columns[1:]
+
+        # Stage x Month matrix; stages missing from this table count as 0
+        values = np.nan_to_num(df.iloc[:, 1:].to_numpy(dtype=float))
+    
+    # Reuse the chart's figure, cleared of the previous site's data
+    fig, ax = progress_template.bind()
+    
+    # Plot each stage with its non-zero values labelled in the segment centre
+    plot_stacked_bars(ax, values, df['Stage'], [color_map.get(stage, '#333333') for stage in df['Stage']])
     
     # Calculate totals excluding ineligible
-    monthly_totals = df[df['Stage'] != 'Ineligible/declined participation/data currently unavailable'].iloc[:, 1:].sum()
-    ineligible = df[df['Stage'] == 'Ineligible/declined participation/data currently unavailable'].iloc[:, 1:].values[0]
+    is_ineligible = (df['Stage'] == 'Ineligible/declined participation/data currently unavailable').to_numpy()
+    monthly_totals = values[~is_ineligible].sum(axis=0)
+    ineligible = values[is_ineligible].sum(axis=0)
+    _, _, heights = stack_positions(values)
     
     # Add N= and n= annotations
-    for i, (total, excl) in enumerate(zip(monthly_totals, ineligible)):
-        ax.text(i, total + excl + 3, f'N={int(total)}', ha='center', va='bottom')
-        if excl > 0:
-            ax.text(i, total + excl + 1, f'n={int(excl)}',
-                   ha='center', va='bottom', color='red', fontsize=10)
+    x = np.arange(len(months))
+    add_texts(ax, x, heights + 3, [f'N={int(total)}' for total in monthly_totals], ha='center', va='bottom')
+    add_texts(ax, x, heights + 1, value_labels(ineligible, 'n='),
+              ha='center', va='bottom', color='red', fontsize=10)
     
     # Customize the plot
-    plt.xticks(range(len(months)), months, rotation=45, ha='right')
-    plt.title(title, pad=20)
-    plt.ylabel('Number of Studies')
-    
-    # Add notes explaining N and n
-    note_text = "Notes:\nN = Total number of eligible studies\nn = Number of ineligible/declined studies"
-    plt.figtext(0.98, 0.02, note_text, ha='right', va='bottom', fontsize=10, style='italic')
+    ax.set_xticks(range(len(months)), months, rotation=45, ha='right')
+    ax.set_title(title, pad=20)
     
     # Adjust legend
-    plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
-    plt.subplots_adjust(right=0.85, bottom=0.2)
+    ax.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
     
     if save_path:
-        plt.savefig(save_path, bbox_inches='tight', dpi=300)
-        plt.close()
+        with step('savefig'):
+            export_figure(fig, save_path, bbox_inches='tight', dpi=300)
     else:
         plt.show()
 
+def final_month_counts(data_frames, month=None):
+    """
+    Per-stage totals across the site tables for one month
+
+    Parameters:
+    -----------
+    data_frames : list of pandas.DataFrame
+        Stage x Month tables with a 'Stage' column
+    month : str, optional
+        Column to total; defaults to the last month every table has
+
+    Returns:
+    --------
+    (pandas.Series, str)
+        Totals indexed by stage, and the month they are for
+    """
+    tables = [df.assign(Stage=encode_stages(df['Stage']).astype(str)).set_index('Stage') for df in data_frames]
+    if month is None:
+        common = [c for c in tables[0].columns if all(c in t.columns for t in tables[1:])]
+        month = common[-1]
+    totals = pd.concat([t[month] for t in tables]).fillna(0).groupby(level=0).sum()
+    return totals.astype('int64'), month
+
 def plot_final_month_summary(data_frames, title, output_file):
-    """Create a summary visualization of the final month's data"""
-    # Set total and excluded values
-    total = 202  # Total number of studies
-    excl = 40    # Number of excluded studies
+    """Create a summary visualization of the final month's data, titled '<title> - <Month Year>'"""
+    with step('reshape'):
+        totals, month = final_month_counts(data_frames)
+    title = f"{title} - {pd.to_datetime(month, format=month_format).strftime('%B %Y')}"
     
     # Prepare data for plotting
     categories = [
@@ -94,10 +124,14 @@ def plot_final_month_summary(data_frames, title, output_file):
         'DTA in progress',
         'DTA completed',
         'Data sets in hand',
-        'Databases harmonised'
+        'Database harmonization'
     ]
     
-    values = [7, 10, 29, 36, 36, 64, 20]  # Your provided values
+    values = [int(totals.get(category, 0)) for category in categories]
+    
+    # Set total and excluded values
+    total = sum(values)  # Total number of studies
+    excl = int(totals.get('Ineligible/declined participation/data currently unavailable', 0))  # Number of excluded studies
     
     # Create figure
     plt.figure(figsize=(12, 6))
@@ -123,8 +157,8 @@ def plot_final_month_summary(data_frames, title, output_file):
     plt.title(title)
     
     # Add total studies and excluded studies annotations
-    plt.text(205, 0.1, f'N={total}', ha='left', va='center')
-    plt.text(205, -0.1, f'n={excl}', ha='left', va='center')
+    plt.text(total * 1.015, 0.1, f'N={total}', ha='left', va='center')
+    plt.text(total * 1.015, -0.1, f'n={excl}', ha='left', va='center')
     
     # Add notes at the bottom
     plt.figtext(0.02, 0.02, 'Notes:', ha='left')
@@ -135,28 +169,55 @@ def plot_final_month_summary(data_frames, title, output_file):
     plt.tight_layout()
     
     # Save the plot
-    plt.savefig(output_file, bbox_inches='tight', dpi=300, pad_inches=0.5)
+    with step('savefig'):
+        export_figure(plt.gcf(), output_file, bbox_inches='tight', dpi=300, pad_inches=0.5)
     plt.close()
 
-def process_excel_data(excel_file):
-    """Process the data and create visualizations"""
-    # Read data files
-    rp1_data = pd.read_csv('updated_heat_data.csv')
-    abj_data = pd.read_csv('abidjan_data.csv')
-    jhb_data = pd.read_csv('johannesburg_data.csv')
+def process_excel_data(excel_file, max_workers=None, report=None):
+    """Process the data and create visualizations
+
+    The four charts are independent and are rendered in parallel; each is
+    also written as smaller WebP and PNG copies listed in srcset.json. Set
+    HEAT_INSTRUMENT=1 (or pass an enabled RunReport) to write a timing and
+    memory report next to the charts.
+    """
+    output_dir = 'Jan 2025'
+    report = report or RunReport('generate_updated_visuals', output_dir)
+    
+    # Read data from the progress store
+    with report.phase('load store'):
+        store = load_store()
+        rp1_data = store.wide('updated_heat').reset_index()
+        abj_data = store.wide('abidjan').reset_index()
+        jhb_data = store.wide('johannesburg').reset_index()
     
     # Create visualizations
-    plot_stacked_bar_chart(rp1_data, 'RP1 Progress', 'Jan 2025/rp1_progress.png')
-    plot_stacked_bar_chart(abj_data, 'Abidjan Progress', 'Jan 2025/abidjan_progress.png')
-    plot_stacked_bar_chart(jhb_data, 'Johannesburg Progress', 'Jan 2025/johannesburg_progress.png')
+    jobs = [
+        make_job(site, 'progress', output_path(output_dir, site, 'progress', 'png'),
+                 plot_stacked_bar_chart, data, title, output_path(output_dir, site, 'progress', 'png'))
+        for site, data, title in [
+            ('RP1', rp1_data, 'RP1 Progress'),
+            ('Abidjan', abj_data, 'Abidjan Progress'),
+            ('Johannesburg', jhb_data, 'Johannesburg Progress')
+        ]
+    ]
     
     # Create overall summary
-    plot_final_month_summary(
+    overall_file = output_path(output_dir, 'overall', 'progress', 'png')
+    jobs.append(make_job(
+        'overall', 'progress', overall_file, plot_final_month_summary,
         [rp1_data, abj_data, jhb_data],
-        'Overall Data Acquisition for the HE2AT Center - December 2024',
-        'Jan 2025/overall_progress.png'
-    )
+        'Overall Data Acquisition for the HE2AT Center',
+        overall_file
+    ))
+    
+    with report.phase('render charts'):
+        rendered = run_jobs(jobs, max_workers=max_workers, report=report)
     print("Generated all progress charts")
+    
+    # Widths/formats of every chart, for a page that embeds them with <picture srcset>
+    print(f"Wrote {write_srcset_manifest(rendered, os.path.join(output_dir, 'srcset.json'))}")
+    report.write()
 
 def main():
     process_excel_data(None)
@@ -0,0 +1,276 @@
+import glob
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from anomaly_series import AnomalyCache, value_columns
+from emdat import read_emdat
+
+# e.g. JHB_disasters--26.5-28.5-2012-2022.csv -> JHB, cell (-26.5, 28.5), 2012-2022
+disaster_file_pattern = re.compile(
+    r'(?P<site>[^/\\]*?)_?disasters-(?P<lat>-?\d+(?:\.\d+)?)-(?P<lon>-?\d+(?:\.\d+)?)'
+    r'-(?P<start>\d{4})-(?P<end>\d{4})\.csv$'
+)
+
+# Spacing of the anomaly grid in degrees; a point belongs to a cell within half of it
+grid_spacing = 1.0
+
+# Room for every month ordinal when (cell, month) is packed into one int64 key;
+# ordinals are shifted by half of it so months before 1970 (negative) still fit
+_month_span = 1 << 20
+_month_shift = _month_span // 2
+
+# Room for every grid column when (row, column) is packed into one int64 cell key
+_column_span = 1 << 32
+
+
+def _month_ordinals(dates):
+    # Months since 1970-01 so month arithmetic is plain integer arithmetic, and the NaT mask
+    months = pd.DatetimeIndex(dates).to_numpy().astype('datetime64[M]')
+    missing = np.isnat(months)
+    return np.where(missing, 0, months.astype(np.int64)), missing
+
+
+def read_disasters(pattern='*disasters--*.csv'):
+    """
+    Read every EM-DAT bounding-box extract and tag each event with its grid cell
+
+    The cell comes from the file name (the centre of the extract); files
+    without one fall back to the event's own Latitude/Longitude. Extracts of
+    the same cell saved under several names are de-duplicated on 'Dis No'.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        read_emdat columns plus 'cell_lat' and 'cell_lon'
+    """
+    frames = []
+    for file_path in sorted(glob.glob(pattern)):
+        df = read_emdat(file_path)
+        match = disaster_file_pattern.search(os.path.basename(file_path))
+        if match is not None:
+            df['cell_lat'] = float(match.group('lat'))
+            df['cell_lon'] = float(match.group('lon'))
+        else:
+            df['cell_lat'] = df['Latitude'].astype('float64')
+            df['cell_lon'] = df['Longitude'].astype('float64')
+        frames.append(df)
+    if not frames:
+        raise FileNotFoundError(f"No disaster files match {pattern}")
+    disasters = pd.concat(frames, ignore_index=True)
+    return disasters.drop_duplicates(['Dis No', 'cell_lat', 'cell_lon'], ignore_index=True)
+
+
+class AnomalyGrid:
+    """
+    Lat/lon grid index over the cached anomaly cells
+
+    Every cell is loaded once into dense (cell x month) arrays on a shared
+    month axis, so a threshold query is a single array comparison. Cell
+    centres lie on a regular ``grid_spacing`` lattice, so a coordinate is
+    snapped to its (row, column) key and found with one ``searchsorted``.
+    """
+
+    def __init__(self, cache=None, columns=value_columns):
+        cache = cache or AnomalyCache()
+        cells = sorted(cache.cells())
+        if not cells:
+            raise ValueError(f"No anomaly cells cached in {cache.path}")
+        self.lat = np.array([lat for lat, _ in cells], dtype=np.float64)
+        self.lon = np.array([lon for _, lon in cells], dtype=np.float64)
+        # Lattice origin (e.g. centres at x.5) and the cells' keys, sorted for lookups
+        self._origin = (self.lat[0] % grid_spacing, self.lon[0] % grid_spacing)
+        keys, _ = self._cell_keys(self.lat, self.lon)
+        self._key_order = np.argsort(keys, kind='stable')
+        self._sorted_keys = keys[self._key_order]
+
+        records = [cache.records(lat, lon) for lat, lon in cells]
+        ordinals = [r['month'].astype(np.int64) for r in records]
+        self.first_month = int(min(o.min() for o in ordinals))
+        n_months = int(max(o.max() for o in ordinals)) - self.first_month + 1
+        self.months = np.arange(n_months) + np.datetime64(self.first_month, 'M')
+
+        self.values = {}
+        for column in columns:
+            values = np.full((len(cells), n_months), np.nan, dtype=np.float32)
+            for row, (cell_records, cell_ordinals) in enumerate(zip(records, ordinals)):
+                values[row, cell_ordinals - self.first_month] = cell_records[column]
+            self.values[column] = values
+
+    def __len__(self):
+        return len(self.lat)
+
+    def _cell_keys(self, lat, lon):
+        # (row, column) on the lattice packed into one int64, and which points are valid
+        rows = (lat - self._origin[0]) / grid_spacing
+        columns = (lon - self._origin[1]) / grid_spacing
+        valid = np.isfinite(rows) & np.isfinite(columns)
+        rows = np.floor(np.where(valid, rows, 0) + 0.5).astype(np.int64)
+        columns = np.floor(np.where(valid, columns, 0) + 0.5).astype(np.int64)
+        return rows * _column_span + (columns + _column_span // 2), valid
+
+    def cell_index(self, lat, lon, max_distance=grid_spacing / 2):
+        """
+        Grid row of the cell containing each (lat, lon)
+
+        Each point is snapped to the nearest lattice centre and that cell is
+        looked up by key, so the cost is O(points x log cells). Returns -1
+        where that cell is not cached or its centre is more than
+        ``max_distance`` degrees away (Chebyshev distance).
+        """
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        lon = np.atleast_1d(np.asarray(lon, dtype=np.float64))
+        keys, valid = self._cell_keys(lat, lon)
+        position = np.minimum(np.searchsorted(self._sorted_keys, keys), len(self._sorted_keys) - 1)
+        found = valid & (self._sorted_keys[position] == keys)
+        index = self._key_order[position]
+        distance = np.maximum(np.abs(lat - self.lat[index]), np.abs(lon - self.lon[index]))
+        return np.where(found & (distance <= max_distance), index, -1)
+
+    def exceedances(self, column, threshold, cells=None):
+        """(cell row, month ordinal, value) of every month where ``column`` > ``threshold``"""
+        values = self.values[column]
+        if cells is not None:
+            mask = np.zeros(len(self), dtype=bool)
+            mask[cells[cells >= 0]] = True
+            values = np.where(mask[:, None], values, np.nan)
+        rows, columns = np.nonzero(values > threshold)
+        return rows, columns + self.first_month, values[rows, columns]
+
+
+class DisasterIndex:
+    """
+    Month-keyed interval index over disaster Start/End dates
+
+    Each event's [Start, End] interval is expanded into the months it
+    touches, and the (cell, month) keys are kept sorted, so looking up any
+    batch of (cell, month) pairs is two ``searchsorted`` calls.
+    """
+
+    def __init__(self, cells, start_dates, end_dates):
+        cells = np.asarray(cells, dtype=np.int64)
+        start, no_start = _month_ordinals(start_dates)
+        end, no_end = _month_ordinals(end_dates)
+        end = np.where(no_end, start, end)
+        valid = (cells >= 0) & ~no_start & (end >= start)
+
+        events = np.flatnonzero(valid)
+        lengths = end[events] - start[events] + 1
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        months = np.repeat(start[events], lengths) + offsets
+        keys = np.repeat(cells[events], lengths) * _month_span + months + _month_shift
+
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.events = np.repeat(events, lengths)[order]
+
+    def lookup(self, cells, months):
+        """
+        Events active in each (cell, month ordinal) pair
+
+        Returns:
+        --------
+        (numpy.ndarray, numpy.ndarray)
+            Position in the query and event row, one pair per match
+        """
+        keys = np.asarray(cells, dtype=np.int64) * _month_span + np.asarray(months, dtype=np.int64) + _month_shift
+        left = np.searchsorted(self.keys, keys, side='left')
+        right = np.searchsorted(self.keys, keys, side='right')
+        counts = right - left
+        query = np.repeat(np.arange(len(keys)), counts)
+        matches = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        return query, self.events[np.repeat(left, counts) + matches]
+
+
+class HeatDisasterJoin:
+    """
+    Join heat anomalies to disaster events by grid cell and month
+
+    Example:
+    --------
+    >>> join = HeatDisasterJoin.from_files()
+    >>> join.disasters_in_hot_months('temperature_max', 1.0, lat=5.5, lon=-4.5)
+    """
+
+    def __init__(self, grid, disasters):
+        self.grid = grid
+        self.disasters = disasters.reset_index(drop=True)
+        self.disaster_cells = grid.cell_index(self.disasters['cell_lat'], self.disasters['cell_lon'])
+        self.index = DisasterIndex(self.disaster_cells, self.disasters['Start Date'],
+                                   self.disasters['End Date'])
+
+    @classmethod
+    def from_files(cls, anomaly_pattern='*anomaly-*.csv', disaster_pattern='*disasters--*.csv',
+                   cache=None):
+        """Ingest anomaly CSVs into the cache (if changed) and read the disaster extracts"""
+        cache = cache or AnomalyCache()
+        cache.ingest_all(anomaly_pattern)
+        return cls(AnomalyGrid(cache), read_disasters(disaster_pattern))
+
+    def _cells(self, lat, lon):
+        if lat is None and lon is None:
+            return None
+        cells = self.grid.cell_index(lat, lon)
+        if (cells < 0).all():
+            raise KeyError(f"No anomaly cell covers ({lat}, {lon})")
+        return cells
+
+    def hot_months(self, column, threshold, lat=None, lon=None):
+        """
+        Months where ``column`` exceeded ``threshold``
+
+        Parameters:
+        -----------
+        column : str
+            Anomaly column, e.g. 'temperature_max'
+        threshold : float
+            Strict lower bound on the value
+        lat, lon : float or array-like, optional
+            Restrict to the cells containing these points; all cells by default
+
+        Returns:
+        --------
+        pandas.DataFrame
+            Columns lat, lon, month and ``column``
+        """
+        cells, months, values = self.grid.exceedances(column, threshold, self._cells(lat, lon))
+        return pd.DataFrame({
+            'lat': self.grid.lat[cells],
+            'lon': self.grid.lon[cells],
+            'month': months.astype('datetime64[M]').astype('datetime64[ns]'),
+            column: values
+        })
+
+    def disasters_in_hot_months(self, column, threshold, lat=None, lon=None):
+        """
+        Disasters active in a month where ``column`` exceeded ``threshold`` in their cell
+
+        An event spanning several hot months appears once per month.
+
+        Returns:
+        --------
+        pandas.DataFrame
+            lat, lon, month and ``column`` of the hot month followed by the
+            disaster's EM-DAT columns
+        """
+        cells, months, values = self.grid.exceedances(column, threshold, self._cells(lat, lon))
+        query, events = self.index.lookup(cells, months)
+        hot = pd.DataFrame({
+            'lat': self.grid.lat[cells[query]],
+            'lon': self.grid.lon[cells[query]],
+            'month': months[query].astype('datetime64[M]').astype('datetime64[ns]'),
+            column: values[query]
+        })
+        matched = self.disasters.iloc[events].drop(columns=['cell_lat', 'cell_lon'])
+        return pd.concat([hot, matched.reset_index(drop=True)], axis=1)
+
+
+if __name__ == "__main__":
+    join = HeatDisasterJoin.from_files()
+    print(f"{len(join.grid)} anomaly cell(s), {len(join.disasters)} disaster(s)")
+    print(join.hot_months('temperature_max', 1.0).to_string())
+    print(join.disasters_in_hot_months('temperature_max', 1.0)[
+        ['lat', 'lon', 'month', 'temperature_max', 'Dis No', 'Disaster Type', 'Start Date', 'End Date']
+    ].to_string())
@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+
+from anomaly_series import AnomalyCache
+from heat_disaster_join import AnomalyGrid
+
+# Columns of the event table returned by ``detect_events``
+event_columns = ['cell', 'start', 'end', 'duration', 'peak', 'peak_index',
+                 'cumulative_intensity', 'excess']
+
+
+def run_lengths(mask):
+    """
+    Runs of True along the last axis of a 2-D boolean array
+
+    The mask is padded with a False column on each side, so every run has
+    exactly one rising and one falling edge in the padded diff; those edges
+    come out of ``np.nonzero`` in (row, time) order, so the i-th start and
+    the i-th end belong to the same run.
+
+    Returns:
+    --------
+    (numpy.ndarray, numpy.ndarray, numpy.ndarray)
+        Row, first index and end index (exclusive) of each run
+    """
+    mask = np.asarray(mask, dtype=bool)
+    padded = np.zeros((mask.shape[0], mask.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    return rows, starts, ends
+
+
+def detect_events(values, threshold, min_duration=1):
+    """
+    Runs of consecutive time steps above a threshold, for every cell at once
+
+    Parameters:
+    -----------
+    values : array-like
+        (cell x time) array, e.g. ``AnomalyGrid.values['temperature_max']``;
+        NaN (a missing month) never exceeds and so breaks a run
+    threshold : float or array-like
+        Strict lower bound: a scalar, one value per cell (e.g. a per-cell
+        percentile) or a full (cell x time) array (e.g. a climatology)
+    min_duration : int
+        Shortest run reported, in time steps
+
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per event with ``event_columns``: cell row, start and end
+        index (end inclusive), duration, peak value and its index, the sum
+        of the values over the event (cumulative intensity; for anomaly
+        columns the cumulative anomaly) and the sum of their excess over
+        the threshold
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim != 2:
+        raise ValueError(f"values must be a (cell x time) array, got shape {values.shape}")
+    threshold = np.asarray(threshold, dtype=np.float64)
+    if threshold.ndim == 1:
+        threshold = threshold[:, None]
+    threshold = np.broadcast_to(threshold, values.shape)
+
+    exceeds = values > threshold
+    rows, starts, ends = run_lengths(exceeds)
+    durations = ends - starts
+
+    # The exceeding values, in (row, time) order, are the events laid end to end
+    offsets = np.concatenate([[0], np.cumsum(durations)[:-1]]).astype(np.intp)
+    in_event = values[exceeds]
+    if len(in_event):
+        peaks = np.maximum.reduceat(in_event, offsets)
+        cumulative = np.add.reduceat(in_event, offsets)
+        excess = np.add.reduceat(in_event - threshold[exceeds], offsets)
+        # First position in each event equal to its peak
+        at_peak = np.flatnonzero(in_event == np.repeat(peaks, durations))
+        peak_index = starts + at_peak[np.searchsorted(at_peak, offsets)] - offsets
+    else:
+        peaks = cumulative = excess = np.empty(0)
+        peak_index = np.empty(0, dtype=np.intp)
+
+    keep = durations >= min_duration
+    return pd.DataFrame({
+        'cell': rows[keep],
+        'start': starts[keep],
+        'end': ends[keep] - 1,
+        'duration': durations[keep],
+        'peak': peaks[keep],
+        'peak_index': peak_index[keep],
+        'cumulative_intensity': cumulative[keep],
+        'excess': excess[keep]
+    }, columns=event_columns)
+
+
+def grid_events(grid, column, threshold, min_duration=1):
+    """
+    ``detect_events`` over one column of an ``AnomalyGrid``, with coordinates and dates
+
+    Parameters:
+    -----------
+    grid : heat_disaster_join.AnomalyGrid
+    column : str
+        An anomaly column ('temperature_max') for anomaly thresholds or an
+        absolute one ('calculated_temp_max') for absolute thresholds
+    threshold : float or array-like
+        See ``detect_events``
+    min_duration : int
+        Shortest event reported, in months
+
+    Returns:
+    --------
+    pandas.DataFrame
+        lat, lon, start, end and peak month, duration in months, peak,
+        cumulative_intensity and excess
+    """
+    events = detect_events(grid.values[column], threshold, min_duration)
+    months = grid.months.astype('datetime64[ns]')
+    return pd.DataFrame({
+        'lat': grid.lat[events['cell']],
+        'lon': grid.lon[events['cell']],
+        'start': months[events['start']],
+        'end': months[events['end']],
+        'duration': events['duration'].to_numpy(),
+        'peak_month': months[events['peak_index']],
+        'peak': events['peak'].to_numpy(),
+        'cumulative_intensity': events['cumulative_intensity'].to_numpy(),
+        'excess': events['excess'].to_numpy()
+    })
+
+
+if __name__ == "__main__":
+    cache = AnomalyCache()
+    cache.ingest_all()
+    grid = AnomalyGrid(cache)
+    for column in ['temperature_max', 'temperature_avg', 'temperature_min']:
+        events = grid_events(grid, column, 0.5, min_duration=3)
+        print(f"{column}: {len(events)} event(s) of 3+ months above +0.5°C")
+        print(events.sort_values('cumulative_intensity', ascending=False).head(5).to_string(index=False))
@@ -1,20 +1,16 @@
 import pandas as pd
 import matplotlib.pyplot as plt
+import numpy as np
 from datetime import datetime
 
-# Define the stage order and color map
-stage_order = [
-    'Contact procedures not initiated',
-    '1st or 2nd invites',
-    '3rd or more invites',
-    'Data sharing discussions and eligibility check',
-    'DTA in progress',
-    'DTA completed',
-    'Data sets in hand',
-    'Database harmonization',
-    'Ineligible/declined participation/data currently unavailable'
-]
+from heat_tables import load_progress_tables
+from image_export import export_figure, write_srcset_manifest
+from instrumentation import RunReport, step
+from render_scheduler import make_job, output_path, run_jobs
+from stacked_bars import add_texts, value_labels
+from stage_taxonomy import pipeline_order, reindex_stages
 
+# Colour of each charted stage
 color_map = {
     'Contact procedures not initiated': '#FFB6C1',    # Light pink
     '1st or 2nd invites': '#FFE4B5',                 # Light yellow
@@ -27,6 +23,9 @@ color_map = {
     'Ineligible/declined participation/data currently unavailable': '#FFFFFF'  # White
 }
 
+# Charted stages in pipeline order (see stage_taxonomy)
+stage_order = pipeline_order(color_map)
+
 def plot_stacked_bar_chart(df, title, last_n_months=8, save_path=None):
     """
     Create a stacked bar chart showing progress
@@ -42,37 +41,39 @@ def plot_stacked_bar_chart(df, title, last_n_months=8, save_path=None):
     save_path : str, optional
         If provided, save the plot to this path instead of showing it
     """
-    df = df.set_index('Stage').reindex(stage_order).reset_index()
-    stages_df = df[~df['Stage'].str.contains("Total")]
-    transposed_df = stages_df.set_index('Stage').transpose()
-    transposed_df = transposed_df.iloc[-last_n_months:]
+    with step('reshape'):
+        df = reindex_stages(df, stage_order)
+        stages_df = df[~df['Stage'].str.contains("Total")]
+        transposed_df = stages_df.set_index('Stage').transpose()
+        transposed_df = transposed_df.iloc[-last_n_months:]
 
-    # Exclude 'Ineligible/declined participation/data currently unavailable' from the plot
-    plot_df = transposed_df.drop(columns=['Ineligible/declined participation/data currently unavailable'], errors='ignore')
+        # Exclude 'Ineligible/declined participation/data currently unavailable' from the plot
+        plot_df = transposed_df.drop(columns=['Ineligible/declined participation/data currently unavailable'], errors='ignore')
 
     fig, ax = plt.subplots(figsize=(15, 7))
     bars = plot_df.plot(kind='bar', stacked=True, ax=ax, 
                        color=[color_map.get(x, '#333333') for x in stage_order if x in plot_df.columns])
 
-    # Add value labels in the center of each bar segment
-    for bar in bars.containers:
-        labels = [f'{v.get_height():.0f}' if v.get_height() != 0 else '' for v in bar]
-        ax.bar_label(bar, labels=labels, label_type='center', padding=3)
-
-    # Add N= and n= annotations
-    for i, month in enumerate(transposed_df.index):
-        month_data = transposed_df.loc[month]
-        cumulative_height = float(month_data.drop('Ineligible/declined participation/data currently unavailable', 
-                                                errors='ignore').sum())
-        excluded_height = float(month_data.get('Ineligible/declined participation/data currently unavailable', 0))
-
-        x_position = i + 0.5
-        # Adjust the positions of the N= and n= labels
-        ax.text(i + 0.3, cumulative_height / 2, f"N={cumulative_height:.0f}", 
-                ha='left', va='center')
-        if excluded_height > 0:
-            ax.text(i + 0.3, cumulative_height - (excluded_height), f"n={excluded_height:.0f}", 
-                   ha='left', va='center', color='red', fontsize=10, fontweight='bold')
+    # Add value labels in the center of each bar segment, one batch per stage
+    segment_labels = value_labels(plot_df.to_numpy(dtype=float).T)
+    for bar, labels in zip(bars.containers, segment_labels):
+        ax.bar_label(bar, labels=list(labels), label_type='center', padding=3)
+
+    # Add N= and n= annotations from per-month totals computed in one pass
+    ineligible = 'Ineligible/declined participation/data currently unavailable'
+    cumulative_heights = np.nan_to_num(plot_df.to_numpy(dtype=float)).sum(axis=1)
+    if ineligible in transposed_df.columns:
+        excluded_heights = np.nan_to_num(transposed_df[ineligible].to_numpy(dtype=float))
+    else:
+        excluded_heights = np.zeros(len(transposed_df))
+
+    # Adjust the positions of the N= and n= labels
+    x_positions = np.arange(len(transposed_df)) + 0.3
+    add_texts(ax, x_positions, cumulative_heights / 2,
+              [f"N={height:.0f}" for height in cumulative_heights], ha='left', va='center')
+    add_texts(ax, x_positions, cumulative_heights - excluded_heights,
+              value_labels(np.clip(excluded_heights, 0, None), 'n='),
+              ha='left', va='center', color='red', fontsize=10, fontweight='bold')
 
     # Customize the plot
     ax.set_xticklabels([x.strftime('%b %Y') if isinstance(x, datetime) else x 
@@ -85,7 +86,8 @@ def plot_stacked_bar_chart(df, title, last_n_months=8, save_path=None):
     ax.set_ylabel('Number of Studies')
 
     if save_path:
-        plt.savefig(save_path, bbox_inches='tight', dpi=300)
+        with step('savefig'):
+            export_figure(fig, save_path, bbox_inches='tight', dpi=300)
         plt.close()
     else:
         plt.show()
@@ -105,44 +107,46 @@ def plot_cumulative_stacked_bar_chart(dfs, title, last_n_months=8, save_path=Non
     save_path : str, optional
         If provided, save the plot to this path instead of showing it
     """
-    combined_df = pd.DataFrame()
-    for df in dfs:
-        df = df.set_index('Stage').reindex(stage_order).reset_index()
-        stages_df = df[~df['Stage'].str.contains("Total")]
-        if combined_df.empty:
-            combined_df = stages_df
-        else:
-            combined_df = combined_df.set_index('Stage').add(stages_df.set_index('Stage'), fill_value=0).reset_index()
-    
-    transposed_df = combined_df.set_index('Stage').transpose()
-    transposed_df = transposed_df.iloc[-last_n_months:]
-
-    # Exclude 'Ineligible/declined participation/data currently unavailable' from the plot
-    plot_df = transposed_df.drop(columns=['Ineligible/declined participation/data currently unavailable'], errors='ignore')
+    with step('reshape'):
+        combined_df = pd.DataFrame()
+        for df in dfs:
+            df = reindex_stages(df, stage_order)
+            stages_df = df[~df['Stage'].str.contains("Total")]
+            if combined_df.empty:
+                combined_df = stages_df
+            else:
+                combined_df = combined_df.set_index('Stage').add(stages_df.set_index('Stage'), fill_value=0).reset_index()
+
+        transposed_df = combined_df.set_index('Stage').transpose()
+        transposed_df = transposed_df.iloc[-last_n_months:]
+
+        # Exclude 'Ineligible/declined participation/data currently unavailable' from the plot
+        plot_df = transposed_df.drop(columns=['Ineligible/declined participation/data currently unavailable'], errors='ignore')
 
     fig, ax = plt.subplots(figsize=(15, 7))
     bars = plot_df.plot(kind='bar', stacked=True, ax=ax, 
                        color=[color_map.get(x, '#333333') for x in stage_order if x in plot_df.columns])
 
-    # Add value labels in the center of each bar segment
-    for bar in bars.containers:
-        labels = [f'{v.get_height():.0f}' if v.get_height() != 0 else '' for v in bar]
-        ax.bar_label(bar, labels=labels, label_type='center', padding=3)
-
-    # Add N= and n= annotations
-    for i, month in enumerate(transposed_df.index):
-        month_data = transposed_df.loc[month]
-        cumulative_height = float(month_data.drop('Ineligible/declined participation/data currently unavailable', 
-                                                errors='ignore').sum())
-        excluded_height = float(month_data.get('Ineligible/declined participation/data currently unavailable', 0))
-
-        x_position = i + 0.5
-        # Adjust the positions of the N= and n= labels
-        ax.text(i + 0.3, cumulative_height / 2, f"N={cumulative_height:.0f}", 
-                ha='left', va='center')
-        if excluded_height > 0:
-            ax.text(i + 0.3, cumulative_height - (excluded_height / 2), f"n={excluded_height:.0f}", 
-                   ha='left', va='center', color='red', fontsize=10, fontweight='bold')
+    # Add value labels in the center of each bar segment, one batch per stage
+    segment_labels = value_labels(plot_df.to_numpy(dtype=float).T)
+    for bar, labels in zip(bars.containers, segment_labels):
+        ax.bar_label(bar, labels=list(labels), label_type='center', padding=3)
+
+    # Add N= and n= annotations from per-month totals computed in one pass
+    ineligible = 'Ineligible/declined participation/data currently unavailable'
+    cumulative_heights = np.nan_to_num(plot_df.to_numpy(dtype=float)).sum(axis=1)
+    if ineligible in transposed_df.columns:
+        excluded_heights = np.nan_to_num(transposed_df[ineligible].to_numpy(dtype=float))
+    else:
+        excluded_heights = np.zeros(len(transposed_df))
+
+    # Adjust the positions of the N= and n= labels
+    x_positions = np.arange(len(transposed_df)) + 0.3
+    add_texts(ax, x_positions, cumulative_heights / 2,
+              [f"N={height:.0f}" for height in cumulative_heights], ha='left', va='center')
+    add_texts(ax, x_positions, cumulative_heights - excluded_heights / 2,
+              value_labels(np.clip(excluded_heights, 0, None), 'n='),
+              ha='left', va='center', color='red', fontsize=10, fontweight='bold')
 
     # Customize the plot
     ax.set_xticklabels([x.strftime('%b %Y') if isinstance(x, datetime) else x 
@@ -155,41 +159,58 @@ def plot_cumulative_stacked_bar_chart(dfs, title, last_n_months=8, save_path=Non
     ax.set_ylabel('Number of Studies')
 
     if save_path:
-        plt.savefig(save_path, bbox_inches='tight', dpi=300)
+        with step('savefig'):
+            export_figure(fig, save_path, bbox_inches='tight', dpi=300)
         plt.close()
     else:
         plt.show()
 
-def process_excel_data(excel_file):
+def process_excel_data(excel_file, max_workers=None, report=None):
     """
     Process the Excel file and create visualizations for each region and overall
+
+    The charts are independent, so they are rendered in parallel on a
+    process pool (see render_scheduler). Each chart is also written as
+    smaller WebP and PNG copies, listed in srcset.json (see image_export).
+    Set HEAT_INSTRUMENT=1 (or pass an
+    enabled RunReport) to write a timing and memory report next to the charts.
     """
-    # Read all sheets from the Excel file
-    excel_data = pd.read_excel(excel_file, sheet_name=['RP1', 'Abj_outputs', 'Jhb_outputs'])
+    report = report or RunReport('heat_progress_visualizer')
+
+    # Read the progress sheets (cached by workbook content; see heat_tables)
+    with report.phase('read workbook'):
+        excel_data = load_progress_tables(excel_file, ['RP1', 'Abj_outputs', 'Jhb_outputs'])
+    
+    titles = {
+        'RP1': 'RP1 Progress',
+        'Abj_outputs': 'Abidjan Progress',
+        'Jhb_outputs': 'Johannesburg Progress'
+    }
     
     # Create individual visualizations for each sheet
+    jobs = []
     for sheet_name, df in excel_data.items():
-        if sheet_name == 'RP1':
-            title = 'RP1 Progress'
-        elif sheet_name == 'Abj_outputs':
-            title = 'Abidjan Progress'
-        elif sheet_name == 'Jhb_outputs':
-            title = 'Johannesburg Progress'
-        else:
+        if sheet_name not in titles:
             continue
-            
-        output_file = f"{sheet_name.lower()}_progress.png"
-        plot_stacked_bar_chart(df, title, last_n_months=8, save_path=output_file)
-        print(f"Generated {title} chart: {output_file}")
+        output_file = output_path('', sheet_name, 'progress', 'png')
+        jobs.append(make_job(sheet_name, 'progress', output_file, plot_stacked_bar_chart,
+                             df, titles[sheet_name], last_n_months=8, save_path=output_file))
     
     # Create the cumulative visualization
-    plot_cumulative_stacked_bar_chart(
-        list(excel_data.values()),
-        'Overall data acquisition for the HE2AT center',
-        last_n_months=8,
-        save_path='overall_progress.png'
-    )
-    print("Generated Overall Progress chart: overall_progress.png")
+    jobs.append(make_job('overall', 'progress', 'overall_progress.png', plot_cumulative_stacked_bar_chart,
+                         list(excel_data.values()),
+                         'Overall data acquisition for the HE2AT center',
+                         last_n_months=8,
+                         save_path='overall_progress.png'))
+    
+    with report.phase('render charts'):
+        rendered = run_jobs(jobs, max_workers=max_workers, report=report)
+    for output_file in rendered:
+        print(f"Generated chart: {output_file}")
+    
+    # Widths/formats of every chart, for a page that embeds them with <picture srcset>
+    print(f"Wrote {write_srcset_manifest(rendered, 'srcset.json')}")
+    report.write()
 
 if __name__ == "__main__":
     excel_file = "HEAT_Tables_0422_am_1327.xlsx"
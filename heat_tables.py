@@ -0,0 +1,149 @@
+import os
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+from build_manifest import hash_file
+from stage_taxonomy import encode_stages
+
+# Sheets of the HEAT_Tables workbooks that hold Stage x Month progress tables
+progress_sheets = ('RP1', 'Abj_outputs', 'Jhb_outputs')
+
+# Where parsed sheets are cached, one folder per workbook content hash
+cache_dir = 'workbook_cache'
+
+
+def _month_labels(header):
+    # Month headers repeat across years ('Jan' ... 'Dec', 'Jan'); number the
+    # repeats the way pandas.read_excel does ('Jan', 'Jan.1') so existing
+    # chart code sees the same column names
+    labels, seen = [], {}
+    for value in header:
+        label = str(value).strip()
+        count = seen.get(label, 0)
+        seen[label] = count + 1
+        labels.append(label if count == 0 else f'{label}.{count}')
+    return labels
+
+
+def parse_progress_sheet(rows):
+    """
+    Normalise the rows of one progress sheet into a Stage x Month table
+
+    The first row is the header ('Stage', then month names). Blank rows and
+    columns are dropped, counts typed in as text ('1') become numbers and
+    empty cells become NaN. Columns are int64 when every count is present.
+
+    Parameters:
+    -----------
+    rows : iterable of tuple
+        Cell values, e.g. ``worksheet.iter_rows(values_only=True)``
+
+    Returns:
+    --------
+    pandas.DataFrame
+        A 'Stage' column followed by one column per month
+    """
+    rows = iter(rows)
+    header = list(next(rows, ()))
+    while header and header[-1] is None:
+        header.pop()
+    if not header:
+        return pd.DataFrame({'Stage': pd.Series(dtype='str')})
+    width = len(header)
+
+    stages, values = [], []
+    for row in rows:
+        stage = row[0] if row else None
+        if stage is None or not str(stage).strip():
+            continue
+        stages.append(str(stage).strip())
+        cells = list(row[1:width]) + [None] * (width - len(row))
+        values.append([np.nan if cell is None else cell for cell in cells])
+
+    months = _month_labels(header[1:])
+    table = pd.DataFrame(values, columns=months, dtype=object)
+    table = table.apply(pd.to_numeric, errors='coerce')
+    for month in months:
+        column = table[month]
+        if column.notna().all() and (column % 1 == 0).all():
+            table[month] = column.astype('int64')
+    table.insert(0, 'Stage', stages)
+    return table
+
+
+def read_workbook(file_path, sheets=progress_sheets):
+    """
+    Parse only ``sheets`` of a workbook with openpyxl's read-only reader
+
+    Returns:
+    --------
+    dict
+        Sheet name -> Stage x Month DataFrame, in the order requested
+    """
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        missing = [sheet for sheet in sheets if sheet not in workbook.sheetnames]
+        if missing:
+            raise KeyError(f"{file_path} has no sheet(s) {missing}; found {workbook.sheetnames}")
+        return {sheet: parse_progress_sheet(workbook[sheet].iter_rows(values_only=True))
+                for sheet in sheets}
+    finally:
+        workbook.close()
+
+
+class WorkbookCache:
+    """
+    Parsed progress sheets keyed by the workbook's content hash
+
+    A workbook is hashed (cheap) rather than parsed (slow); sheets already
+    parsed for that hash are read back from Parquet. Renamed or copied
+    snapshots share an entry, and an edited workbook gets a new one.
+    Tables come back with 'Stage' as a Categorical of canonical stage names
+    (see stage_taxonomy).
+    """
+
+    def __init__(self, path=cache_dir):
+        self.path = path
+
+    def _sheet_path(self, digest, sheet):
+        return os.path.join(self.path, digest, f'{sheet}.parquet')
+
+    def load(self, file_path, sheets=progress_sheets):
+        """Stage x Month tables for ``sheets``, parsing only those not cached yet"""
+        digest = hash_file(file_path)
+        tables = {}
+        missing = []
+        for sheet in sheets:
+            sheet_path = self._sheet_path(digest, sheet)
+            if os.path.exists(sheet_path):
+                tables[sheet] = pd.read_parquet(sheet_path)
+            else:
+                missing.append(sheet)
+
+        if missing:
+            os.makedirs(os.path.join(self.path, digest), exist_ok=True)
+            for sheet, table in read_workbook(file_path, missing).items():
+                table.to_parquet(self._sheet_path(digest, sheet), index=False)
+                tables[sheet] = table
+
+        # Sheets spell some stages differently ('Databases harmonised'); resolve
+        # them to the shared taxonomy on the way out so the cache stays a plain parse
+        for table in tables.values():
+            table['Stage'] = encode_stages(table['Stage'])
+        return {sheet: tables[sheet] for sheet in sheets}
+
+
+def load_progress_tables(file_path, sheets=progress_sheets, cache=None):
+    """Stage x Month tables of a HEAT_Tables workbook, via the default cache"""
+    return (cache or WorkbookCache()).load(file_path, sheets)
+
+
+if __name__ == "__main__":
+    import glob
+
+    cache = WorkbookCache()
+    for workbook in sorted(glob.glob('*HEAT_Tables_*.xlsx')):
+        for sheet, table in cache.load(workbook).items():
+            print(f"{workbook} / {sheet}: {len(table)} stages x {table.shape[1] - 1} months")
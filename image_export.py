@@ -0,0 +1,154 @@
+import glob
+import io
+import json
+import os
+import re
+import sys
+from urllib.parse import quote
+
+from PIL import Image
+
+from instrumentation import step
+
+# Widths (px) of the downscaled copies; widths at or above the original are skipped
+widths = (640, 1280, 1920)
+
+# WebP quality for the lossy copies; charts are flat colour, so 85 is visually lossless
+webp_quality = 85
+
+# Colours in the palette-quantised PNG fallbacks
+png_colors = 256
+
+# Layout width hint for the browser: full width on phones, the content column otherwise
+default_sizes = '(max-width: 1000px) 100vw, 1000px'
+
+
+def variant_path(path, width, extension):
+    """Path of one copy of a chart, e.g. 'Jan 2025/rp1_progress.png' -> 'Jan 2025/rp1_progress-640w.webp'"""
+    stem, _ = os.path.splitext(path)
+    return f'{stem}-{width}w.{extension}'
+
+
+def _widths(image):
+    return [width for width in widths if width < image.width]
+
+
+def write_variants(image, path):
+    """
+    Write the downscaled WebP and palette PNG copies of a chart image
+
+    Every copy is resized from ``image`` (the full-resolution render), so
+    re-encoding never needs the figure again.
+
+    Returns:
+    --------
+    list of str
+        Paths written
+    """
+    image = image.convert('RGB')
+    written = []
+    for width in _widths(image):
+        height = round(image.height * width / image.width)
+        resized = image.resize((width, height), Image.LANCZOS)
+
+        webp_path = variant_path(path, width, 'webp')
+        resized.save(webp_path, 'WEBP', quality=webp_quality, method=6)
+
+        # No dithering: it only adds noise to flat fills and makes the PNG larger
+        png_path = variant_path(path, width, 'png')
+        palette = resized.quantize(png_colors, method=Image.Quantize.MEDIANCUT, dither=Image.Dither.NONE)
+        palette.save(png_path, 'PNG', optimize=True)
+        written += [webp_path, png_path]
+    return written
+
+
+def export_figure(fig, path, **savefig_kwargs):
+    """
+    Save a matplotlib figure and its responsive copies from a single render
+
+    The figure is drawn once into an in-memory PNG; those bytes become the
+    full-resolution chart at ``path`` (identical to ``fig.savefig(path)``)
+    and the same buffer is decoded for ``write_variants``.
+
+    Parameters:
+    -----------
+    fig : matplotlib.figure.Figure
+    path : str
+        Where the full-resolution PNG goes, e.g. 'Jan 2025/rp1_progress.png'
+    **savefig_kwargs
+        Passed to ``fig.savefig`` (dpi, bbox_inches, pad_inches, ...)
+    """
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', **savefig_kwargs)
+    with open(path, 'wb') as file:
+        file.write(buffer.getbuffer())
+    with step('encode variants'):
+        buffer.seek(0)
+        with Image.open(buffer) as image:
+            write_variants(image, path)
+
+
+def _srcset(paths):
+    # srcset is split on whitespace, so paths ('Jan 2025/...') are URL-encoded
+    return ', '.join(f'{quote(path.replace(os.sep, "/"))} {width}w' for path, width in paths)
+
+
+def srcset_entry(path, sizes=default_sizes):
+    """
+    ``<picture>`` sources for one chart, from the copies found next to it
+
+    Returns:
+    --------
+    dict
+        width and height of the original, a WebP source and the PNG srcset
+        (the full-resolution PNG is the largest candidate), plus ready-made
+        ``<picture>`` markup
+    """
+    with Image.open(path) as image:
+        width, height = image.size
+    webp = [(variant_path(path, w, 'webp'), w) for w in widths if w < width]
+    png = [(variant_path(path, w, 'png'), w) for w in widths if w < width] + [(path, width)]
+    webp = [(p, w) for p, w in webp if os.path.exists(p)]
+    png = [(p, w) for p, w in png if os.path.exists(p)]
+
+    src = quote(png[0][0].replace(os.sep, '/'))
+    entry = {
+        'width': width,
+        'height': height,
+        'sizes': sizes,
+        'sources': [{'type': 'image/webp', 'srcset': _srcset(webp)}] if webp else [],
+        'img': {'src': src, 'srcset': _srcset(png)}
+    }
+    sources = ''.join(f'<source type="{source["type"]}" srcset="{source["srcset"]}" sizes="{sizes}">'
+                      for source in entry['sources'])
+    entry['html'] = (f'<picture>{sources}<img src="{src}" srcset="{entry["img"]["srcset"]}" sizes="{sizes}" '
+                     f'width="{width}" height="{height}" loading="lazy" alt=""></picture>')
+    return entry
+
+
+def write_srcset_manifest(paths, manifest_path):
+    """
+    Write ``{chart path: srcset_entry}`` for the given charts as JSON
+
+    Built from the files on disk, so it can run in the parent process after
+    the render workers finish. Returns the manifest path.
+    """
+    manifest = {path.replace(os.sep, '/'): srcset_entry(path) for path in paths if os.path.exists(path)}
+    with open(manifest_path, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2)
+    return manifest_path
+
+
+if __name__ == "__main__":
+    # Re-encode existing charts without re-plotting, e.g. python image_export.py "Jan 2025"/*.png
+    paths = [path for pattern in sys.argv[1:] or ['Jan 2025/*.png']
+             for path in glob.glob(pattern) if not re.search(r'-\d+w\.(png|webp)$', path)]
+    for path in paths:
+        with Image.open(path) as image:
+            written = write_variants(image, path)
+        total = sum(os.path.getsize(p) for p in written if p.endswith('.webp'))
+        print(f"{path}: {os.path.getsize(path) / 1024:.0f} KB -> {len(written)} copies "
+              f"(WebP {total / 1024:.0f} KB across widths)")
+    for directory in sorted({os.path.dirname(path) for path in paths}):
+        charts = [path for path in paths if os.path.dirname(path) == directory]
+        print(f"Wrote {write_srcset_manifest(charts, os.path.join(directory, 'srcset.json'))}")
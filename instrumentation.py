@@ -0,0 +1,247 @@
+import cProfile
+import json
+import os
+import sys
+import time
+import traceback
+import tracemalloc
+from contextlib import contextmanager
+
+# Set to any non-empty value (other than '0') to instrument a run
+enable_variable = 'HEAT_INSTRUMENT'
+
+# Name of a chart job ('<site>/<chart type>', e.g. 'rp1/progress') to run under cProfile
+profile_variable = 'HEAT_PROFILE_JOB'
+
+# Steps recorded by ``step`` inside the job currently being measured (None when not measuring)
+_job_steps = None
+
+# Measurements in progress, outermost first
+_active = []
+
+
+def _peak_rss_mb():
+    # Peak resident set size of this process so far; not available on Windows
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+class Measurement:
+    """
+    Wall time, CPU time, peak RSS and tracemalloc peak of a block of code
+
+    Used as a context manager; ``result`` holds the figures afterwards.
+    tracemalloc is started for the block (and stopped again) unless it is
+    already tracing. Measurements can nest (a job run in-process inside a
+    phase): an inner one resets tracemalloc's peak, so the peak seen so far
+    is first handed to the enclosing measurement. Peak RSS is the process's
+    high-water mark, which for a pool worker includes the jobs it ran before.
+    """
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.result = None
+
+    def __enter__(self):
+        self._started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        self._traced_peak = 0
+        if self._started_tracing:
+            tracemalloc.start()
+        elif self.trace_memory:
+            self._hand_peak_to_parent()
+            tracemalloc.reset_peak()
+        _active.append(self)
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        return self
+
+    def _hand_peak_to_parent(self):
+        if _active:
+            parent = _active[-1]
+            parent._traced_peak = max(parent._traced_peak, tracemalloc.get_traced_memory()[1])
+
+    def __exit__(self, *exc_info):
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu
+        _active.remove(self)
+        traced_peak = None
+        if self.trace_memory:
+            peak = max(self._traced_peak, tracemalloc.get_traced_memory()[1])
+            traced_peak = round(peak / (1024 * 1024), 1)
+            if self._started_tracing:
+                tracemalloc.stop()
+            else:
+                self._hand_peak_to_parent()
+        self.result = {
+            'wall_s': round(wall, 4),
+            'cpu_s': round(cpu, 4),
+            'peak_rss_mb': _peak_rss_mb(),
+            'tracemalloc_peak_mb': traced_peak
+        }
+        return False
+
+
+@contextmanager
+def step(name):
+    """
+    Time one step of a chart job, e.g. ``with step('savefig'): ...``
+
+    A no-op unless the job is being measured by ``measure_job``; steps only
+    record wall and CPU time so they do not disturb the job's memory peak.
+    """
+    if _job_steps is None:
+        yield
+        return
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        _job_steps.append({'name': name,
+                           'wall_s': round(time.perf_counter() - wall, 4),
+                           'cpu_s': round(time.process_time() - cpu, 4)})
+
+
+def job_name(job):
+    """Report name of a render job, e.g. 'rp1/progress'"""
+    return f"{job.site}/{job.chart_type}".lower()
+
+
+def measure_job(job, profile_dir=None):
+    """
+    Run a render job and measure it (runs in the worker process)
+
+    With ``profile_dir`` set, the job also runs under cProfile and its
+    stats are written to ``<profile_dir>/<site>_<chart type>.prof``.
+
+    Returns:
+    --------
+    (str or None, dict)
+        The traceback if the job failed, and the job's measurement (up to
+        the failure, if any) with its steps and the profile path, if any
+    """
+    global _job_steps
+    _job_steps = []
+    profile_path = None
+    error = None
+    try:
+        with Measurement() as measurement:
+            try:
+                if profile_dir is None:
+                    job.func(*job.args, **job.kwargs)
+                else:
+                    profiler = cProfile.Profile()
+                    try:
+                        profiler.runcall(job.func, *job.args, **job.kwargs)
+                    finally:
+                        os.makedirs(profile_dir, exist_ok=True)
+                        profile_path = os.path.join(profile_dir, job_name(job).replace('/', '_') + '.prof')
+                        profiler.dump_stats(profile_path)
+            except Exception:
+                error = traceback.format_exc()
+        steps = _job_steps
+    finally:
+        _job_steps = None
+    result = dict(kind='job', name=job_name(job), output=job.output, pid=os.getpid(), **measurement.result)
+    result['steps'] = steps
+    if error is not None:
+        result['failed'] = True
+    if profile_path:
+        result['profile'] = profile_path
+    return error, result
+
+
+class RunReport:
+    """
+    Opt-in timing and memory report for one run of a chart script
+
+    Pipeline phases are wrapped with ``phase`` and render jobs are measured
+    by ``run_jobs(jobs, report=report)``. ``write`` saves
+    ``<output_dir>/<name>_run_report.json`` and a text summary next to it.
+    A disabled report (the default) costs nothing: phases run unmeasured and
+    ``write`` does nothing.
+
+    Parameters:
+    -----------
+    name : str
+        Script name used for the report files, e.g. 'generate_updated_visuals'
+    output_dir : str
+        Where the script writes its charts; the report goes alongside them
+    enabled : bool, optional
+        Defaults to whether ``HEAT_INSTRUMENT`` is set
+    profile_job : str, optional
+        Job name to run under cProfile; defaults to ``HEAT_PROFILE_JOB``
+    """
+
+    def __init__(self, name, output_dir='.', enabled=None, profile_job=None):
+        if enabled is None:
+            enabled = os.environ.get(enable_variable, '') not in ('', '0')
+        if profile_job is None:
+            profile_job = os.environ.get(profile_variable) or None
+        self.name = name
+        self.output_dir = output_dir or '.'
+        self.enabled = enabled
+        self.profile_job = profile_job.lower() if profile_job else None
+        self.records = []
+        self.started = time.time()
+
+    @contextmanager
+    def phase(self, name):
+        """Measure a block of the pipeline, e.g. ``with report.phase('read workbook'):``"""
+        if not self.enabled:
+            yield
+            return
+        with Measurement() as measurement:
+            yield
+        self.records.append(dict(kind='phase', name=name, **measurement.result))
+
+    def profile_dir(self, job):
+        """Where to write the job's cProfile stats, or None if it is not the profiled job"""
+        if self.profile_job in (job_name(job), job.output):
+            return os.path.join(self.output_dir, f'{self.name}_profiles')
+        return None
+
+    def add_jobs(self, results):
+        """Record the measurements returned by the render workers"""
+        self.records.extend(result for result in results if result is not None)
+
+    def summary(self):
+        """Text table of every phase and job, slowest steps listed under each job"""
+        lines = [f"{self.name}: {time.time() - self.started:.2f}s total",
+                 f"{'':6}{'name':36}{'wall s':>9}{'cpu s':>9}{'rss MB':>9}{'traced MB':>11}"]
+        for record in self.records:
+            rss = record['peak_rss_mb'] if record['peak_rss_mb'] is not None else float('nan')
+            traced = record['tracemalloc_peak_mb'] if record['tracemalloc_peak_mb'] is not None else float('nan')
+            name = record['name'] + (' (failed)' if record.get('failed') else '')
+            lines.append(f"{record['kind']:6}{name:36}{record['wall_s']:9.3f}"
+                         f"{record['cpu_s']:9.3f}{rss:9.1f}{traced:11.1f}")
+            for job_step in sorted(record.get('steps', []), key=lambda s: -s['wall_s']):
+                lines.append(f"{'':8}{job_step['name']:34}{job_step['wall_s']:9.3f}{job_step['cpu_s']:9.3f}")
+            if record.get('profile'):
+                lines.append(f"{'':8}profile: {record['profile']}")
+        return '\n'.join(lines)
+
+    def write(self):
+        """Save the JSON report and text summary; returns the JSON path (None if disabled)"""
+        if not self.enabled:
+            return None
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, f'{self.name}_run_report')
+        report = {
+            'name': self.name,
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'total_wall_s': round(time.time() - self.started, 4),
+            'python': sys.version.split()[0],
+            'records': self.records
+        }
+        with open(base + '.json', 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+        summary = self.summary()
+        with open(base + '.txt', 'w', encoding='utf-8') as file:
+            file.write(summary + '\n')
+        print(summary)
+        return base + '.json'
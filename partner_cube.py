@@ -0,0 +1,172 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from progress_store import month_format
+from trello_board import iter_boards, organisation_labels
+
+# Site labels on the RP2 board, used for the per-site roll-up
+site_labels = ['JHB', 'Abidjan']
+
+
+def _index(names):
+    return {name: position for position, name in enumerate(names)}
+
+
+def _snapshot_date(board, file_path):
+    # Date of the newest activity recorded in the export
+    dates = [action.date for action in board.actions if action.date]
+    dates += [card.date_last_activity for card in board.cards.values() if card.date_last_activity]
+    if not dates:
+        raise ValueError(f"{file_path} has no dated actions or cards to take a snapshot date from")
+    return pd.Timestamp(max(dates)).tz_localize(None).normalize()
+
+
+class PartnerCube:
+    """
+    Open cards per organisation x stage x snapshot, held in one dense array
+
+    ``counts[org, stage, snapshot]`` is an int32 NumPy array and every axis
+    has a name -> position dictionary, so "one organisation over time"
+    (``org``) and "every organisation at one date" (``at``) are a dictionary
+    hit plus an array view rather than a scan over cards. Site labels (JHB,
+    Abidjan) are counted into ``site_counts`` in the same pass, which gives
+    the per-site roll-up without knowing which organisation belongs where.
+
+    Stages are Trello list names after ``canonical_list_name``, in board
+    order; stages first seen in later snapshots are appended.
+    """
+
+    def __init__(self, counts, orgs, stages, snapshots, site_counts=None, sites=()):
+        self.orgs = list(orgs)
+        self.stages = list(stages)
+        self.snapshots = list(snapshots)
+        self.sites = list(sites)
+        self.counts = counts
+        if site_counts is None:
+            site_counts = np.zeros((len(self.sites), len(self.stages), len(self.snapshots)), dtype=np.int32)
+        self.site_counts = site_counts
+
+        self.org_index = _index(self.orgs)
+        self.stage_index = _index(self.stages)
+        self.snapshot_index = _index(self.snapshots)
+        self.site_index = _index(self.sites)
+
+    @classmethod
+    def from_boards(cls, file_paths, orgs=None, sites=None, from_history=False):
+        """
+        Build the cube from board exports, one snapshot per export
+
+        Exports are streamed one at a time (see ``iter_boards``) and each
+        board's open cards are visited once; the (label, stage, snapshot)
+        hits are added into the array in a single ``np.add.at`` at the end.
+
+        Parameters:
+        -----------
+        file_paths : list of str
+            Trello JSON exports, e.g. ['RP2_Json_0610.json', 'RP2_Json_0624.json']
+        orgs, sites : list of str, optional
+            Label names for the organisation and site axes; default to
+            ``organisation_labels`` and ``site_labels``
+        from_history : bool
+            Take a card's stage from its latest logged move (the notebooks'
+            behaviour) instead of its current list
+
+        Returns:
+        --------
+        PartnerCube
+            Snapshots are dated by the newest activity in each export
+        """
+        orgs = organisation_labels if orgs is None else list(orgs)
+        sites = site_labels if sites is None else list(sites)
+        groups = _index(orgs + sites)
+
+        stage_index = {}
+        snapshots, hits = [], []
+        for position, (file_path, board) in enumerate(iter_boards(file_paths)):
+            snapshots.append(_snapshot_date(board, file_path))
+            for trello_list in sorted(board.lists, key=lambda l: l.pos or 0):
+                if not trello_list.closed:
+                    stage_index.setdefault(board.list_names[trello_list.id], len(stage_index))
+
+            for card in board.open_cards():
+                stage = board.last_moved_to(card.id) if from_history else board.list_name(card.id)
+                if not stage:
+                    continue
+                stage = stage_index.setdefault(stage, len(stage_index))
+                for label in board.card_labels(card.id):
+                    group = groups.get(label)
+                    if group is not None:
+                        hits.append((group, stage, position))
+
+        cube = np.zeros((len(groups), len(stage_index), len(snapshots)), dtype=np.int32)
+        if hits:
+            group, stage, snapshot = np.array(hits, dtype=np.intp).T
+            np.add.at(cube, (group, stage, snapshot), 1)
+        return cls(cube[:len(orgs)], orgs, stage_index, snapshots, cube[len(orgs):], sites)
+
+    @classmethod
+    def from_replay(cls, replay, months, orgs=None, sites=None):
+        """
+        Build the cube from one export's action log, one snapshot per month end
+
+        Uses ``BoardReplay.stage_tables``, so every month comes out of a
+        single pass over the log.
+        """
+        orgs = organisation_labels if orgs is None else list(orgs)
+        sites = site_labels if sites is None else list(sites)
+        tables = replay.stage_tables(months, orgs + sites)
+
+        stages = []
+        for table in tables.values():
+            stages += [stage for stage in table.index if stage != 'Total' and stage not in stages]
+        columns = list(tables[None].columns)
+        snapshots = list(pd.to_datetime(columns, format=month_format) + pd.offsets.MonthEnd(0))
+
+        cube = np.stack([tables[group].reindex(index=stages, columns=columns, fill_value=0).to_numpy(np.int32)
+                         for group in orgs + sites])
+        return cls(cube[:len(orgs)], orgs, stages, snapshots, cube[len(orgs):], sites)
+
+    def _snapshot(self, date):
+        try:
+            return self.snapshot_index[pd.Timestamp(date)]
+        except KeyError:
+            dates = [snapshot.strftime('%Y-%m-%d') for snapshot in self.snapshots]
+            raise KeyError(f"No snapshot dated {date}; have {dates}") from None
+
+    def org(self, org):
+        """Stage x snapshot counts for one organisation"""
+        return pd.DataFrame(self.counts[self.org_index[org]], index=self.stages, columns=self.snapshots)
+
+    def at(self, date):
+        """Organisation x stage counts at one snapshot date"""
+        return pd.DataFrame(self.counts[:, :, self._snapshot(date)], index=self.orgs, columns=self.stages)
+
+    def site(self, site):
+        """Stage x snapshot counts for every card carrying a site label"""
+        return pd.DataFrame(self.site_counts[self.site_index[site]], index=self.stages, columns=self.snapshots)
+
+    def sites_at(self, date):
+        """Site x stage counts at one snapshot date"""
+        return pd.DataFrame(self.site_counts[:, :, self._snapshot(date)], index=self.sites, columns=self.stages)
+
+    def studies(self, date):
+        """Studies per organisation at one snapshot (the notebooks' ``labels_count``)"""
+        return dict(zip(self.orgs, self.counts[:, :, self._snapshot(date)].sum(axis=1).tolist()))
+
+    def stages_data(self, date):
+        """Non-zero ``{org: {stage: count}}`` at one snapshot (the notebooks' ``stages_data``)"""
+        counts = self.counts[:, :, self._snapshot(date)]
+        return {org: {self.stages[s]: int(counts[o, s]) for s in np.flatnonzero(counts[o])}
+                for o, org in enumerate(self.orgs)}
+
+
+if __name__ == "__main__":
+    exports = ['RP2_Json_0610.json', 'RP2_Json_0624.json', os.path.join('JSONS', 'qjaPunsX - data-acquisition-rp2.json')]
+    cube = PartnerCube.from_boards(exports)
+    print(f"{len(cube.orgs)} organisations x {len(cube.stages)} stages x {len(cube.snapshots)} snapshots")
+    latest = cube.snapshots[-1]
+    print(cube.studies(latest))
+    print(cube.sites_at(latest).sum(axis=1).to_string())
+    print(cube.org('VIDA').loc[lambda df: df.any(axis=1)].to_string())
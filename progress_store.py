@@ -0,0 +1,216 @@
+import glob
+import json
+import os
+
+import pandas as pd
+
+from build_manifest import hash_file
+from stage_taxonomy import canonical_stage, encode_stages
+
+# Default location of the store and the wide CSVs it is seeded from
+store_dir = 'progress_store'
+site_tables = {
+    'rp1': 'rp1_data.csv',
+    'johannesburg': 'johannesburg_data.csv',
+    'abidjan': 'abidjan_data.csv',
+    'updated_heat': 'updated_heat_data.csv'
+}
+
+month_format = '%b %Y'
+columns = ['site', 'stage', 'stage_pos', 'month', 'count']
+
+
+def wide_to_long(df, site):
+    """
+    Convert a wide Stage x Month table into long (site, stage, month, count) rows
+
+    Parameters:
+    -----------
+    df : pandas.DataFrame
+        Table indexed by Stage with one column per month (e.g. 'Jul 2024')
+    site : str
+        Key the rows are stored under
+    """
+    long_df = df.reset_index().melt(id_vars='Stage', var_name='month', value_name='count')
+    long_df = long_df.rename(columns={'Stage': 'stage'})
+    # Remember the original row order so wide tables come back unchanged
+    positions = {stage: pos for pos, stage in enumerate(df.index)}
+    long_df['stage_pos'] = long_df['stage'].map(positions)
+    long_df['month'] = pd.to_datetime(long_df['month'], format=month_format)
+    long_df['site'] = site
+    return _typed(long_df[columns])
+
+
+def _typed(long_df):
+    # Stage names are resolved to the canonical taxonomy (see stage_taxonomy)
+    long_df = long_df.assign(stage=encode_stages(long_df['stage']))
+    return long_df.astype({
+        'site': 'category',
+        'stage_pos': 'int16',
+        'month': 'datetime64[ns]',
+        'count': 'int32'
+    })
+
+
+class ProgressStore:
+    """
+    Long-format, Parquet-backed store of monthly Stage x Month progress tables
+
+    Rows are (site, stage, month, count). Each write adds a small part file,
+    so appending a month never rewrites existing data; when the same
+    (site, stage, month) appears in several parts the newest part wins.
+    The combined frame is read once and shared by every caller.
+
+    The wide CSVs in ``tables`` stay the source of truth: the store is a
+    derived cache (not committed), and ``append_month`` writes the month
+    back to the site's CSV so a later re-import cannot lose it.
+    """
+
+    def __init__(self, path=store_dir, tables=None):
+        self.path = path
+        self.tables = tables or {}
+        self._frame = None
+        os.makedirs(self.path, exist_ok=True)
+
+    @property
+    def _sources_path(self):
+        return os.path.join(self.path, 'sources.json')
+
+    def _read_sources(self):
+        if not os.path.exists(self._sources_path):
+            return {}
+        with open(self._sources_path, 'r') as file:
+            return json.load(file)
+
+    def _record_source(self, sources, site, csv_path):
+        # Content hash, not mtime: a checkout or fresh clone must not count as an edit
+        sources[site] = {'file': csv_path, 'sha256': hash_file(csv_path)}
+        with open(self._sources_path, 'w') as file:
+            json.dump(sources, file, indent=2)
+
+    def _parts(self):
+        return sorted(glob.glob(os.path.join(self.path, 'part-*.parquet')))
+
+    def _write_part(self, long_df):
+        parts = self._parts()
+        next_id = int(os.path.basename(parts[-1])[5:-8]) + 1 if parts else 0
+        part_path = os.path.join(self.path, f'part-{next_id:05d}.parquet')
+        _typed(long_df[columns]).to_parquet(part_path, index=False)
+        self._frame = None
+        return part_path
+
+    @property
+    def frame(self):
+        """All rows of the store, loaded once and cached"""
+        if self._frame is None:
+            parts = self._parts()
+            if not parts:
+                frame = pd.DataFrame(columns=columns)
+            else:
+                frame = pd.concat([pd.read_parquet(p) for p in parts], ignore_index=True)
+                frame = frame.drop_duplicates(['site', 'stage', 'month'], keep='last')
+            self._frame = _typed(frame).reset_index(drop=True)
+        return self._frame
+
+    def sites(self):
+        """Site keys present in the store"""
+        return sorted(self.frame['site'].astype(str).unique())
+
+    def wide(self, site):
+        """
+        Stage x Month table for one site
+
+        Shaped like ``pd.read_csv(<site csv>, index_col='Stage')``: rows in
+        their original order and month columns labelled e.g. 'Jul 2024'.
+        """
+        rows = self.frame[self.frame['site'] == site]
+        if rows.empty:
+            raise KeyError(f"No progress data stored for site {site!r}")
+        order = rows.groupby('stage', observed=True)['stage_pos'].min().sort_values().index
+        df = rows.pivot_table(index='stage', columns='month', values='count',
+                              aggfunc='last', observed=True)
+        df = df.reindex(index=order, columns=sorted(df.columns)).fillna(0).astype('int64')
+        df.index = pd.Index(df.index.astype(str), name='Stage')
+        df.columns = [month.strftime(month_format) for month in df.columns]
+        return df
+
+    def import_wide(self, site, df):
+        """Store a wide Stage x Month table for a site, replacing what it had"""
+        others = self.frame[self.frame['site'] != site]
+        return self._rewrite(pd.concat([others, wide_to_long(df, site)], ignore_index=True))
+
+    def import_csv(self, site, csv_path):
+        """Store one of the wide progress CSVs (e.g. rp1_data.csv)"""
+        return self.import_wide(site, pd.read_csv(csv_path, index_col='Stage'))
+
+    def append_month(self, site, month, counts):
+        """
+        Add (or correct) one month of counts for a site
+
+        If the site was imported from a CSV, the CSV is rewritten from the
+        store with the new month included.
+
+        Parameters:
+        -----------
+        site : str
+            Site key, e.g. 'rp1'
+        month : str or datetime
+            Month the counts belong to, e.g. 'Mar 2025'
+        counts : dict
+            Stage name -> number of studies
+        """
+        month = pd.to_datetime(month, format=month_format) if isinstance(month, str) else pd.Timestamp(month)
+        existing = self.frame[self.frame['site'] == site]
+        positions = existing.groupby('stage', observed=True)['stage_pos'].min().to_dict()
+        next_pos = max(positions.values(), default=-1) + 1
+        rows = []
+        for stage, count in counts.items():
+            stage = canonical_stage(stage)
+            if stage not in positions:
+                positions[stage] = next_pos
+                next_pos += 1
+            rows.append({'site': site, 'stage': stage, 'stage_pos': positions[stage],
+                         'month': month, 'count': count})
+        part_path = self._write_part(pd.DataFrame(rows, columns=columns))
+
+        csv_path = self.tables.get(site)
+        if csv_path is not None:
+            self.wide(site).to_csv(csv_path)
+            self._record_source(self._read_sources(), site, csv_path)
+        return part_path
+
+    def _rewrite(self, frame):
+        old_parts = self._parts()
+        part_path = self._write_part(frame)
+        for part in old_parts:
+            os.remove(part)
+        return part_path
+
+    def compact(self):
+        """Rewrite all parts as a single part file"""
+        return self._rewrite(self.frame)
+
+
+def load_store(path=store_dir, tables=site_tables):
+    """
+    Open the progress store, importing any wide CSV that changed since last time
+
+    The CSVs' content hashes are recorded in the store, so a CSV is only
+    parsed when it is new or its content has changed.
+    """
+    store = ProgressStore(path, tables)
+    sources = store._read_sources()
+    for site, csv_path in tables.items():
+        if not os.path.exists(csv_path):
+            continue
+        if sources.get(site, {}).get('sha256') != hash_file(csv_path):
+            store.import_csv(site, csv_path)
+            store._record_source(sources, site, csv_path)
+    return store
+
+
+if __name__ == "__main__":
+    store = load_store()
+    for site in store.sites():
+        df = store.wide(site)
+        print(f"{site}: {len(df)} stages x {len(df.columns)} months ({df.columns[0]} - {df.columns[-1]})")
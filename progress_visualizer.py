@@ -3,6 +3,8 @@ import matplotlib.pyplot as plt
 import numpy as np
 from datetime import datetime
 
+from stacked_bars import add_texts, plot_stacked_bars, stack_positions, value_labels
+
 class ProgressVisualizer:
     def __init__(self):
         # Define the stages and their colors
@@ -16,6 +18,8 @@ class ProgressVisualizer:
             'Data sets in hand': '#008000',                  # Dark green
             'Database harmonization': '#ADD8E6'              # Light blue
         }
+        # Column counted as n= (excluded studies) when present
+        self.ineligible_stage = 'Ineligible/declined participation/data currently unavailable'
         
     def create_progress_chart(self, data, output_file, title="Progress Report"):
         """
@@ -39,20 +43,12 @@ class ProgressVisualizer:
         # Create the plot
         fig, ax = plt.subplots(figsize=(15, 8))
         
-        # Plot each stage
-        bottoms = np.zeros(len(df))
-        for stage, color in self.stages.items():
-            if stage in df.columns:
-                values = df[stage].values
-                bar = ax.bar(range(len(df)), values, bottom=bottoms, 
-                           label=stage, color=color)
-                
-                # Add value labels in the middle of each segment
-                for i, v in enumerate(values):
-                    if v > 0:  # Only add label if there's a value
-                        height = bottoms[i] + v/2
-                        ax.text(i, height, str(int(v)), ha='center', va='center')
-                bottoms += values
+        # Stage x Month matrix of the stages present in the data
+        stages = [stage for stage in self.stages if stage in df.columns]
+        values = df[stages].to_numpy(dtype=float).T
+        
+        # Plot each stage with value labels in the middle of each segment
+        plot_stacked_bars(ax, values, stages, [self.stages[stage] for stage in stages])
         
         # Customize the plot
         ax.set_title(title, pad=20)
@@ -63,12 +59,18 @@ class ProgressVisualizer:
         if 'Month' in df.columns:
             plt.xticks(range(len(df)), df['Month'], rotation=45)
         
-        # Add n=8 and N=38 annotations
-        for i in range(len(df)):
-            ax.text(i, ax.get_ylim()[1], 'n=8', color='red', 
-                   ha='center', va='bottom')
-            ax.text(i, ax.get_ylim()[1]/2, 'N=38', color='black', 
-                   ha='right', va='center')
+        # Add n= and N= annotations from the monthly totals
+        _, _, totals = stack_positions(values)
+        if self.ineligible_stage in df.columns:
+            ineligible = df[self.ineligible_stage].to_numpy(dtype=float)
+        else:
+            ineligible = np.zeros(len(df))
+        x = np.arange(len(df))
+        y_max = ax.get_ylim()[1]
+        add_texts(ax, x, np.full(len(df), y_max), value_labels(ineligible, 'n='), color='red',
+                  ha='center', va='bottom')
+        add_texts(ax, x, np.full(len(df), y_max / 2), value_labels(totals, 'N='), color='black',
+                  ha='right', va='center')
         
         # Add legend
         ax.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
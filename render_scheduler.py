@@ -0,0 +1,119 @@
+import os
+import re
+import traceback
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from instrumentation import measure_job
+
+# One chart to render: ``func(*args, **kwargs)`` writes the chart to ``output``
+RenderJob = namedtuple('RenderJob', ['site', 'chart_type', 'output', 'func', 'args', 'kwargs'])
+
+
+class RenderError(Exception):
+    """
+    Raised after a batch of render jobs finished with at least one failure
+
+    ``failures`` holds (job, traceback text) pairs and ``completed`` the
+    jobs that did render, so callers can still record the good outputs.
+    """
+
+    def __init__(self, failures, completed):
+        self.failures = failures
+        self.completed = completed
+        lines = [f"{len(failures)} of {len(failures) + len(completed)} chart(s) failed to render:"]
+        for job, error in failures:
+            lines.append(f"--- {job.site} / {job.chart_type} -> {job.output}")
+            lines.append(error.rstrip())
+        super().__init__('\n'.join(lines))
+
+
+def output_path(output_dir, site, chart_type, extension):
+    """
+    Deterministic location of a chart: ``<output_dir>/<site>_<chart_type>.<ext>``
+
+    e.g. ('interactive_plots', 'RP1', 'donut', 'html') -> interactive_plots/rp1_donut.html
+    """
+    site_slug = re.sub(r'[^a-z0-9]+', '_', site.lower()).strip('_')
+    return os.path.join(output_dir, f"{site_slug}_{chart_type}.{extension}")
+
+
+def make_job(site, chart_type, output, func, *args, **kwargs):
+    """Build a RenderJob; ``func`` must be a module-level function so it can be pickled"""
+    return RenderJob(site, chart_type, output, func, args, kwargs)
+
+
+def _init_worker():
+    # Workers never open windows; render straight to files
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def _run_job(job, measure=False, profile_dir=None):
+    # Returns (traceback text or None, measurement or None)
+    if measure:
+        # A failed job still reports what it measured up to the failure
+        return measure_job(job, profile_dir)
+    try:
+        job.func(*job.args, **job.kwargs)
+        return None, None
+    except Exception:
+        return traceback.format_exc(), None
+
+
+def run_jobs(jobs, max_workers=None, report=None):
+    """
+    Render independent chart jobs on a process pool
+
+    Parameters:
+    -----------
+    jobs : list of RenderJob
+        Charts to render; each is CPU-bound and independent of the others
+    max_workers : int, optional
+        Size of the pool; defaults to the number of CPUs. With one worker
+        (or one job) the jobs run in this process.
+    report : instrumentation.RunReport, optional
+        If enabled, every job is measured in its worker and recorded in it
+
+    Returns:
+    --------
+    list of str
+        Output paths of the rendered charts, in job order
+
+    Raises:
+    -------
+    RenderError
+        After every job has run, if any of them failed
+    """
+    jobs = list(jobs)
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(jobs)))
+
+    measure = report is not None and report.enabled
+    measures = [measure] * len(jobs)
+    profile_dirs = [report.profile_dir(job) if measure else None for job in jobs]
+
+    if max_workers == 1:
+        outcomes = [_run_job(*arguments) for arguments in zip(jobs, measures, profile_dirs)]
+    else:
+        # One future per job: a worker that dies (out of memory, segfault) breaks
+        # the pool, which fails only the jobs still pending instead of the batch
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as pool:
+            futures = [pool.submit(_run_job, *arguments) for arguments in zip(jobs, measures, profile_dirs)]
+            outcomes = []
+            for future in futures:
+                try:
+                    outcomes.append(future.result())
+                except Exception as error:
+                    outcomes.append((''.join(traceback.format_exception_only(type(error), error)), None))
+
+    errors = [error for error, _ in outcomes]
+    if measure:
+        report.add_jobs(measurement for _, measurement in outcomes)
+
+    failures = [(job, error) for job, error in zip(jobs, errors) if error is not None]
+    completed = [job for job, error in zip(jobs, errors) if error is None]
+    if failures:
+        raise RenderError(failures, completed)
+    return [job.output for job in completed]
@@ -0,0 +1,81 @@
+import numpy as np
+
+
+def stack_positions(values):
+    """
+    Segment geometry of a stacked bar chart in one cumulative sum
+
+    Parameters:
+    -----------
+    values : array-like, shape (n_stages, n_months)
+        Stage x Month counts, bottom stage first; missing values count as 0
+
+    Returns:
+    --------
+    (numpy.ndarray, numpy.ndarray, numpy.ndarray)
+        Bottom and midpoint of every segment (same shape as ``values``) and
+        the height of each stacked bar (one per month)
+    """
+    values = np.nan_to_num(np.asarray(values, dtype=float))
+    tops = np.cumsum(values, axis=0)
+    bottoms = tops - values
+    mids = bottoms + values / 2
+    heights = tops[-1] if len(tops) else np.zeros(values.shape[1] if values.ndim == 2 else 0)
+    return bottoms, mids, heights
+
+
+def value_labels(values, prefix=''):
+    """
+    Text labels for an array of counts, blank where the count is zero
+
+    e.g. value_labels([[3, 0]]) -> [['3', '']]; value_labels([5], 'N=') -> ['N=5']
+    """
+    values = np.nan_to_num(np.asarray(values, dtype=float))
+    text = np.char.add(prefix, np.rint(values).astype(np.int64).astype(str))
+    return np.where(values != 0, text, '')
+
+
+def plot_stacked_bars(ax, values, stages, colors, x=None, label_values=True, **bar_kwargs):
+    """
+    Draw a stacked bar chart with centred value labels
+
+    Bottoms come from ``stack_positions`` and each stage's labels are added
+    with a single ``bar_label`` call, so the cost grows with the number of
+    stages rather than with stages x months.
+
+    Parameters:
+    -----------
+    ax : matplotlib.axes.Axes
+        Axes to draw on
+    values : array-like, shape (n_stages, n_months)
+        Stage x Month counts, bottom stage first
+    stages : list of str
+        Legend label for each row of ``values``
+    colors : list of str
+        Bar colour for each row of ``values``
+    x : array-like, optional
+        Bar positions; defaults to 0..n_months-1
+
+    Returns:
+    --------
+    list of matplotlib.container.BarContainer
+    """
+    values = np.nan_to_num(np.asarray(values, dtype=float))
+    bottoms, _, _ = stack_positions(values)
+    x = np.arange(values.shape[1]) if x is None else x
+    labels = value_labels(values)
+
+    containers = []
+    for row, (stage, color) in enumerate(zip(stages, colors)):
+        container = ax.bar(x, values[row], bottom=bottoms[row], label=stage, color=color, **bar_kwargs)
+        if label_values:
+            ax.bar_label(container, labels=list(labels[row]), label_type='center')
+        containers.append(container)
+    return containers
+
+
+def add_texts(ax, xs, ys, texts, **text_kwargs):
+    """Place precomputed labels, skipping blank ones"""
+    for x, y, text in zip(xs, ys, texts):
+        if text:
+            ax.text(x, y, text, **text_kwargs)
@@ -0,0 +1,160 @@
+import numpy as np
+import pandas as pd
+
+from stage_taxonomy import canonical_list_name
+from trello_board import TrelloBoard, organisation_labels
+from trello_stream import Action
+
+interval_columns = ['card_id', 'card', 'stage', 'entered', 'exited', 'days', 'open']
+
+
+def _action_frame(board):
+    actions = pd.DataFrame(board.actions, columns=Action._fields)
+    actions['date'] = pd.to_datetime(actions['date'], utc=True, format='ISO8601')
+    return actions[actions['card_id'].isin(board.cards.keys())]
+
+
+def stage_intervals(board, as_of=None):
+    """
+    (card, stage, entered, exited) intervals from a board's action log
+
+    Every list move (``updateCard`` with listAfter) and card creation starts
+    an interval; it ends at the card's next move, found with one sorted
+    group-wise shift rather than a loop per card. A card's stage before its
+    first logged move is kept with an unknown (NaT) entry date, since the
+    export's log is truncated. The last interval of each open card is still
+    running; its ``days`` is the current age at ``as_of``.
+
+    Parameters:
+    -----------
+    board : TrelloBoard
+        Board export (or a full-history mirror from trello_sync)
+    as_of : str or Timestamp, optional
+        Reference time for running intervals; defaults to the newest action
+
+    Returns:
+    --------
+    pandas.DataFrame
+        Columns card_id, card, stage, entered, exited, days, open
+    """
+    actions = _action_frame(board)
+    moves = actions[(actions['type'] == 'updateCard') & actions['list_after'].notna()]
+    created = actions[actions['type'] == 'createCard']
+
+    entries = pd.concat([
+        pd.DataFrame({'card_id': moves['card_id'], 'stage_id': moves['list_after'], 'entered': moves['date']}),
+        pd.DataFrame({'card_id': created['card_id'], 'stage_id': created['list_id'], 'entered': created['date']})
+    ])
+
+    # Where each moved card sat before its first logged move (entry date unknown)
+    first_moves = moves.sort_values('date').drop_duplicates('card_id')
+    first_moves = first_moves[~first_moves['card_id'].isin(created['card_id'])]
+    entries = pd.concat([
+        pd.DataFrame({'card_id': first_moves['card_id'], 'stage_id': first_moves['list_before'],
+                      'entered': pd.NaT}),
+        entries
+    ])
+
+    # Cards never moved within the log sit in their current list since an unknown date
+    logged = set(entries['card_id'])
+    unmoved = [card_id for card_id in board.cards if card_id not in logged]
+    entries = pd.concat([
+        pd.DataFrame({'card_id': unmoved, 'stage_id': [board.card_list[c] for c in unmoved],
+                      'entered': pd.NaT}),
+        entries
+    ], ignore_index=True)
+    entries['entered'] = pd.to_datetime(entries['entered'], utc=True)
+
+    entries = entries.sort_values(['card_id', 'entered'], na_position='first', kind='stable')
+    entries['exited'] = entries.groupby('card_id')['entered'].shift(-1)
+
+    if as_of is None:
+        as_of = actions['date'].max()
+    else:
+        # Naive dates are taken as UTC, aware ones converted
+        as_of = pd.Timestamp(as_of)
+        as_of = as_of.tz_localize('UTC') if as_of.tzinfo is None else as_of.tz_convert('UTC')
+    closed = {card.id for card in board.cards.values() if card.closed}
+    entries['open'] = entries['exited'].isna() & ~entries['card_id'].isin(closed)
+    end = entries['exited'].fillna(as_of).where(entries['exited'].notna() | entries['open'])
+    entries['days'] = (end - entries['entered']).dt.total_seconds() / 86400
+
+    list_names = dict(board.list_names)
+    for action in board.actions:
+        for list_id, name in ((action.list_before, action.list_before_name),
+                              (action.list_after, action.list_after_name)):
+            if list_id and name:
+                list_names.setdefault(list_id, canonical_list_name(name))
+    entries['stage'] = entries['stage_id'].map(list_names)
+    entries['card'] = entries['card_id'].map({card_id: card.name for card_id, card in board.cards.items()})
+    return entries[interval_columns].reset_index(drop=True)
+
+
+def card_label_frame(board, labels=None):
+    """(card_id, label) pairs for the given label names (organisation labels by default)"""
+    labels = organisation_labels if labels is None else labels
+    wanted = set(labels)
+    pairs = [(card_id, name) for card_id in board.cards for name in board.card_labels(card_id)
+             if name in wanted]
+    return pd.DataFrame(pairs, columns=['card_id', 'label'])
+
+
+def _distribution(grouped):
+    return grouped.agg(
+        intervals='count',
+        median='median',
+        mean='mean',
+        p75=lambda d: d.quantile(0.75),
+        p90=lambda d: d.quantile(0.9),
+        max='max'
+    )
+
+
+def dwell_times(intervals, by=('stage',)):
+    """
+    Distribution of completed time-in-stage (days), grouped by ``by``
+
+    Only intervals with both an entry and an exit are counted.
+    """
+    done = intervals.dropna(subset=['entered', 'exited'])
+    return _distribution(done.groupby(list(by), sort=False)['days'])
+
+
+def dwell_times_by_label(intervals, card_labels):
+    """Completed dwell-time distribution per organisation label and stage"""
+    return dwell_times(intervals.merge(card_labels, on='card_id'), by=('label', 'stage'))
+
+
+def current_outliers(intervals, quantile=0.9, min_intervals=5):
+    """
+    Open cards that have sat in their stage longer than most completed stays
+
+    A running interval is an outlier when its current age exceeds the
+    ``quantile`` of completed dwell times for that stage. Stages with fewer
+    than ``min_intervals`` completed stays fall back to the quantile over
+    all stages.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        Running intervals sorted by how far they exceed the threshold
+    """
+    done = intervals.dropna(subset=['entered', 'exited'])
+    by_stage = done.groupby('stage')['days']
+    thresholds = by_stage.quantile(quantile)[by_stage.count() >= min_intervals]
+    overall = done['days'].quantile(quantile) if len(done) else np.inf
+
+    running = intervals[intervals['open'] & intervals['entered'].notna()].copy()
+    running['threshold'] = running['stage'].map(thresholds).fillna(overall)
+    running = running[running['days'] > running['threshold']]
+    running['excess'] = running['days'] - running['threshold']
+    return running.sort_values('excess', ascending=False).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    board = TrelloBoard.from_file('RP2_Json_0624.json')
+    intervals = stage_intervals(board)
+    print(dwell_times(intervals).round(1).sort_values('median', ascending=False).to_string())
+    print()
+    outliers = current_outliers(intervals)
+    print(outliers[['card', 'stage', 'entered', 'days', 'threshold']].round({'days': 1, 'threshold': 1}).to_string())
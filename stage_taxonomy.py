@@ -0,0 +1,125 @@
+import re
+from collections import namedtuple
+
+import pandas as pd
+
+# One step of the data acquisition pipeline: short code, display name, other spellings
+Stage = namedtuple('Stage', ['code', 'name', 'aliases'])
+
+# Progress-table stages, in pipeline order
+stages = [
+    Stage('not_contacted', 'Contact procedures not initiated', ()),
+    Stage('invites_1_2', '1st or 2nd invites', ('1st/2nd invites',)),
+    Stage('invites_3_plus', '3rd or more invites', ()),
+    Stage('discussions', 'Data sharing discussions and eligibility check', ()),
+    Stage('dta_in_progress', 'DTA in progress', ()),
+    Stage('dta_completed', 'DTA completed', ()),
+    Stage('data_in_hand', 'Data sets in hand', ()),
+    Stage('harmonised', 'Database harmonization',
+          ('Databases harmonised', 'Database harmonisation', 'Databases harmonized')),
+    Stage('analysis_ready', 'Database ready for analysis', ()),
+    Stage('ineligible', 'Ineligible/declined participation/data currently unavailable', ()),
+]
+
+# Row holding the column sums in the wide Stage x Month tables
+total_row = 'Total'
+
+stage_names = [stage.name for stage in stages]
+stage_codes = {stage.name: stage.code for stage in stages}
+
+# Ordered categories shared by every loader; integer codes follow pipeline order
+stage_dtype = pd.CategoricalDtype(stage_names + [total_row], ordered=True)
+
+# Trello list names spelt more than one way across boards and exports
+list_aliases = {
+    'Data transfered to UCT': 'Data transferred to UCT',
+    'Study documents recieved/': 'Study documents received',
+    'Ineligibles studies': 'Ineligible studies',
+    'Recheck eligability after looking at the data (UCT)': 'Recheck eligibility after looking at the data (UCT)',
+    'Declined Participation': 'Declined participation',
+    'No Engagement': 'No engagement',
+    'linked to UCT': 'Linked to UCT',
+    'Transfer of Data in progress (UCT)': 'Transfer of data in progress (UCT)',
+}
+
+
+def _key(name):
+    # Spelling-insensitive lookup key: case, repeated spaces and trailing '/' ignored
+    return re.sub(r'\s+', ' ', str(name)).strip().rstrip('/').strip().casefold()
+
+
+_stage_lookup = {}
+for _stage in stages:
+    for _name in (_stage.name, _stage.code) + _stage.aliases:
+        _stage_lookup[_key(_name)] = _stage.name
+_stage_lookup[_key(total_row)] = total_row
+
+_list_lookup = {_key(alias): name for alias, name in list_aliases.items()}
+
+
+def canonical_stage(name):
+    """
+    Canonical display name of a progress stage
+
+    Accepts the canonical name, its code or any registered alias, ignoring
+    case and spacing, e.g. 'Databases harmonised' -> 'Database harmonization'.
+
+    Raises:
+    -------
+    KeyError
+        If the name is not a known stage
+    """
+    try:
+        return _stage_lookup[_key(name)]
+    except KeyError:
+        raise KeyError(f"Unknown stage {name!r}; add it (or an alias) to stage_taxonomy.stages") from None
+
+
+def encode_stages(names):
+    """
+    Stage names as an ordered Categorical with ``stage_dtype``
+
+    Each distinct spelling is resolved once, so a long column costs one
+    lookup per unique value. Unknown names raise KeyError instead of
+    silently turning into NaN.
+    """
+    names = pd.Series(names, copy=False)
+    if isinstance(names.dtype, pd.CategoricalDtype):
+        names = names.astype(str)
+    mapping = {name: canonical_stage(name) for name in names.dropna().unique()}
+    return pd.Categorical(names.map(mapping), dtype=stage_dtype)
+
+
+def stage_order_codes(names):
+    """Integer codes (pipeline order, 'Total' last) for stage names"""
+    return encode_stages(names).codes
+
+
+def pipeline_order(names):
+    """
+    Canonical names of the given stages in pipeline order
+
+    e.g. a chart's colour map keys -> the order its stages are drawn in;
+    'Total' is left out. Unknown names raise KeyError.
+    """
+    wanted = {canonical_stage(name) for name in names}
+    return [name for name in stage_names if name in wanted]
+
+
+def reindex_stages(table, order):
+    """
+    A wide Stage x Month table (with a 'Stage' column) with its rows in ``order``
+
+    Stage names are resolved to their canonical spelling first. Rows not in
+    ``order`` (e.g. 'Total') are dropped; stages in ``order`` that the table
+    lacks come back as NaN rows.
+    """
+    stage = encode_stages(table['Stage']).astype(str)
+    return table.assign(Stage=stage).set_index('Stage').reindex(order).reset_index()
+
+
+def canonical_list_name(name):
+    """Trello list name with known misspellings and case variants unified"""
+    if name is None:
+        return None
+    return _list_lookup.get(_key(name), name)
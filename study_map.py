@@ -0,0 +1,268 @@
+import html
+import math
+import os
+import sys
+
+import folium
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from branca.colormap import LinearColormap
+from folium.plugins import FastMarkerCluster
+from PIL import Image
+
+from climatology import GridSource, monthly_means
+from trello_board import iter_boards
+
+# Study counts per country plus the two study sites (drawn as circles)
+locations_file = 'study_locations.csv'
+
+# Trello exports whose cards may carry a location
+board_exports = [os.path.join('JSONS', 'qjaPunsX - data-acquisition-rp2.json'),
+                 os.path.join('JSONS', 'ClS62fmQ - data-acquisition-rp1.json')]
+
+# Pre-rendered overlay tiles go to <tile_dir>/<layer>/<z>/<x>/<y>.png
+tile_dir = 'tiles'
+tile_size = 256
+
+# Zoom levels rendered; Leaflet upscales the last one when zooming in further.
+# At zoom 6 a 0.5 degree cell is already ~20 px wide.
+zoom_levels = range(2, 7)
+
+# Opening view: the whole of Africa
+map_center = (0.0, 20.0)
+map_zoom = 3
+
+temperature_cmap = 'inferno'
+
+# Creates one marker per [lat, lon, popup] row inside the cluster layer
+marker_callback = """
+function (row) {
+    var marker = L.marker(new L.LatLng(row[0], row[1]));
+    marker.bindPopup(row[2]);
+    return marker;
+}
+"""
+
+
+def read_locations(file_path=locations_file):
+    """
+    Study locations from a sites table
+
+    Returns:
+    --------
+    pandas.DataFrame
+        name, kind ('country', 'site' or 'study'), lat, lon, studies, color
+        and the popup label, e.g. 'Benin n=4'
+    """
+    df = pd.read_csv(file_path, dtype={'name': 'str', 'kind': 'str', 'color': 'str'})
+    df['color'] = df['color'].fillna('')
+    df['label'] = df['name'] + ' n=' + df['studies'].astype(str)
+    return df
+
+
+def card_locations(file_paths=board_exports):
+    """One 'study' row per open Trello card that has a location set"""
+    rows = []
+    for _, board in iter_boards([path for path in file_paths if os.path.exists(path)]):
+        for card in board.open_cards():
+            if card.coordinates is not None:
+                rows.append({'name': card.name, 'kind': 'study', 'lat': card.coordinates[0],
+                             'lon': card.coordinates[1], 'studies': 1, 'color': '', 'label': card.name})
+    return pd.DataFrame(rows, columns=['name', 'kind', 'lat', 'lon', 'studies', 'color', 'label'])
+
+
+def annual_field(source, year, kind='max'):
+    """
+    (lat x lon) mean of one kind over a year, streamed a block of months at a time
+
+    e.g. ``annual_field(GridSource.from_netcdf('cru_ts.nc'), 2023)`` is the
+    2023 mean of the daily maxima.
+    """
+    total = np.zeros((len(source.lat), len(source.lon)))
+    count = np.zeros(total.shape, dtype=np.int64)
+    for start, end, offsets, months in source.month_blocks():
+        in_year = months.astype('datetime64[Y]').astype(np.int64) + 1970 == year
+        if not in_year.any():
+            continue
+        monthly = monthly_means(source.read(kind, start, end), offsets)[in_year]
+        total += np.nansum(monthly, axis=0)
+        count += (~np.isnan(monthly)).sum(axis=0)
+    if not count.any():
+        raise ValueError(f"No {kind} temperatures for {year}")
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(count > 0, total / count, np.nan)
+
+
+def _cell_indices(centres, points):
+    # Grid cell containing each point on a regular axis (ascending or descending); -1 outside
+    step = centres[1] - centres[0]
+    index = np.floor((points - (centres[0] - step / 2)) / step).astype(np.intp)
+    return np.where((index >= 0) & (index < len(centres)), index, -1)
+
+
+def _tile_lons(x, zoom):
+    pixels = x * tile_size + np.arange(tile_size) + 0.5
+    return pixels / (tile_size * 2 ** zoom) * 360.0 - 180.0
+
+
+def _tile_lats(y, zoom):
+    pixels = y * tile_size + np.arange(tile_size) + 0.5
+    return np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * pixels / (tile_size * 2 ** zoom)))))
+
+
+def _tile_range(low, high, zoom, to_tile):
+    first, last = sorted((to_tile(low, zoom), to_tile(high, zoom)))
+    return range(max(first, 0), min(last, 2 ** zoom - 1) + 1)
+
+
+def _lon_tile(lon, zoom):
+    return int((lon + 180.0) / 360.0 * 2 ** zoom)
+
+
+def _lat_tile(lat, zoom):
+    lat = math.radians(max(min(lat, 85.0511), -85.0511))
+    return int((1 - math.asinh(math.tan(lat)) / math.pi) / 2 * 2 ** zoom)
+
+
+def render_tiles(values, lat, lon, output_dir, zooms=zoom_levels, vmin=None, vmax=None, cmap=temperature_cmap):
+    """
+    Pre-render a gridded field as an XYZ (Web Mercator) PNG tile pyramid
+
+    The field is coloured once into an RGBA grid (NaN is transparent). A
+    tile pixel's longitude depends only on its column and its latitude only
+    on its row, so every tile is one ``np.ix_`` lookup into that grid.
+    Tiles with no data are not written.
+
+    Parameters:
+    -----------
+    values : numpy.ndarray
+        (lat x lon) field, e.g. from ``annual_field``
+    lat, lon : numpy.ndarray
+        Regularly spaced cell centres
+    output_dir : str
+        Tiles are written as ``<output_dir>/<z>/<x>/<y>.png``
+    zooms : iterable of int
+    vmin, vmax : float, optional
+        Colour scale limits; default to the field's range
+
+    Returns:
+    --------
+    int
+        Number of tiles written
+    """
+    values = np.asarray(values, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    vmin = np.nanmin(values) if vmin is None else vmin
+    vmax = np.nanmax(values) if vmax is None else vmax
+    rgba = plt.get_cmap(cmap)(plt.Normalize(vmin, vmax)(values), bytes=True)
+    rgba[np.isnan(values)] = 0
+
+    lat_edges = (lat.min() - abs(lat[1] - lat[0]) / 2, lat.max() + abs(lat[1] - lat[0]) / 2)
+    lon_edges = (lon.min() - abs(lon[1] - lon[0]) / 2, lon.max() + abs(lon[1] - lon[0]) / 2)
+    written = 0
+    for zoom in zooms:
+        columns = {x: _cell_indices(lon, _tile_lons(x, zoom)) for x in _tile_range(*lon_edges, zoom, _lon_tile)}
+        rows = {y: _cell_indices(lat, _tile_lats(y, zoom)) for y in _tile_range(*lat_edges, zoom, _lat_tile)}
+        for x, column_index in columns.items():
+            for y, row_index in rows.items():
+                tile = rgba[np.ix_(row_index, column_index)]
+                tile[row_index < 0] = 0
+                tile[:, column_index < 0] = 0
+                if not tile[..., 3].any():
+                    continue
+                path = os.path.join(output_dir, str(zoom), str(x), f'{y}.png')
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                Image.fromarray(tile, 'RGBA').save(path, optimize=True)
+                written += 1
+    return written
+
+
+def build_map(output_file, locations=None, overlay=None):
+    """
+    Write a Leaflet map of study locations over a pre-tiled temperature layer
+
+    Studies go into a ``FastMarkerCluster``: the page carries one array of
+    [lat, lon, popup] rows and markers are made in the browser, so hundreds
+    of studies cost neither page size nor start-up time. Study sites are
+    drawn as circles in their own layer.
+
+    Parameters:
+    -----------
+    output_file : str
+        e.g. 'max_temp_2023_with_studies.html'
+    locations : pandas.DataFrame, optional
+        ``read_locations``/``card_locations`` rows; no markers if omitted
+    overlay : dict, optional
+        Tile layer: 'url' (relative to the page, with {z}/{x}/{y}), 'name',
+        'vmin', 'vmax' and 'max_native_zoom'
+    """
+    tiled_map = folium.Map(location=map_center, zoom_start=map_zoom, tiles='OpenStreetMap')
+
+    if overlay is not None:
+        folium.TileLayer(
+            tiles=overlay['url'],
+            name=overlay['name'],
+            attr='HE²AT Center',
+            overlay=True,
+            opacity=0.7,
+            max_native_zoom=overlay.get('max_native_zoom', max(zoom_levels)),
+            max_zoom=18
+        ).add_to(tiled_map)
+        colors = [plt.get_cmap(temperature_cmap)(position) for position in np.linspace(0, 1, 9)]
+        LinearColormap(colors, vmin=overlay['vmin'], vmax=overlay['vmax'],
+                       caption=f"{overlay['name']} (°C)").add_to(tiled_map)
+
+    if locations is not None:
+        studies = locations[locations['kind'] != 'site']
+        FastMarkerCluster(
+            data=[[row.lat, row.lon, html.escape(row.label)] for row in studies.itertuples()],
+            callback=marker_callback,
+            name='Studies'
+        ).add_to(tiled_map)
+
+        sites = folium.FeatureGroup(name='Study sites')
+        for row in locations[locations['kind'] == 'site'].itertuples():
+            folium.CircleMarker(
+                location=[row.lat, row.lon],
+                radius=20,
+                color=row.color or 'red',
+                fill=True,
+                fill_color=row.color or 'red',
+                fill_opacity=0.2,
+                weight=3,
+                popup=html.escape(row.label)
+            ).add_to(sites)
+        sites.add_to(tiled_map)
+
+    folium.LayerControl().add_to(tiled_map)
+    tiled_map.save(output_file)
+    return output_file
+
+
+def build_maps(source, year=2023):
+    """Tile the year's max temperature and write max_temp_<year>.html with and without studies"""
+    field = annual_field(source, year, 'max')
+    vmin, vmax = float(np.nanmin(field)), float(np.nanmax(field))
+    layer = f'max_temp_{year}'
+    count = render_tiles(field, source.lat, source.lon, os.path.join(tile_dir, layer), vmin=vmin, vmax=vmax)
+    print(f"Wrote {count} tiles to {os.path.join(tile_dir, layer)}")
+
+    overlay = {'url': f'{tile_dir}/{layer}/{{z}}/{{x}}/{{y}}.png', 'name': f'Max Temperature {year}',
+               'vmin': vmin, 'vmax': vmax, 'max_native_zoom': max(zoom_levels)}
+    locations = read_locations()
+    cards = card_locations()
+    if not cards.empty:
+        locations = pd.concat([locations, cards], ignore_index=True)
+    return [build_map(f'{layer}.html', overlay=overlay),
+            build_map(f'{layer}_with_studies.html', locations, overlay)]
+
+
+if __name__ == "__main__":
+    # e.g. python study_map.py cru_ts4.08.2021.2023.tmx.dat.nc 2023
+    if len(sys.argv) < 2:
+        sys.exit("Usage: python study_map.py <gridded temperatures .nc> [year]")
+    year = int(sys.argv[2]) if len(sys.argv) > 2 else 2023
+    for output_file in build_maps(GridSource.from_netcdf(sys.argv[1]), year):
+        print(f"Generated {output_file}")
@@ -0,0 +1,137 @@
+import asyncio
+import datetime
+import hashlib
+import json
+import tempfile
+import threading
+import unittest
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from trello_sync import BoardSync, TrelloClient, page_size
+
+board_id = 'testBoard'
+
+
+def action_id(number):
+    # Trello ids sort by creation time; zero-padded hex keeps that property
+    return f'{number:024x}'
+
+
+class MockTrello:
+    """
+    In-memory board served over HTTP the way the Trello API pages it
+
+    Actions come back newest first, at most ``limit`` per page, filtered by
+    ``before``/``since`` ids; every other resource carries an ETag and
+    answers a matching If-None-Match with 304.
+    """
+
+    def __init__(self, action_count):
+        self.actions = []
+        self.add_actions(action_count)
+        self.resources = {
+            '': {'id': board_id, 'name': 'Test board'},
+            '/cards': [{'id': 'c1', 'name': 'Study 1', 'idList': 'l1', 'closed': False}],
+            '/lists': [{'id': 'l1', 'name': 'DTA in progress'}],
+            '/labels': [],
+            '/checklists': []
+        }
+        self.requests = []
+
+    def add_actions(self, count):
+        first = len(self.actions)
+        start = datetime.datetime(2024, 1, 1)
+        self.actions += [{'id': action_id(number), 'type': 'updateCard',
+                          'date': (start + datetime.timedelta(minutes=number)).strftime('%Y-%m-%dT%H:%M:00.000Z')}
+                         for number in range(first, first + count)]
+
+    def handle(self, path, query, etag):
+        self.requests.append((path, query, etag))
+        prefix = f'/boards/{board_id}'
+        if path == prefix + '/actions':
+            selected = [a for a in reversed(self.actions)
+                        if ('before' not in query or a['id'] < query['before'])
+                        and ('since' not in query or a['id'] > query['since'])]
+            return 200, None, selected[:int(query.get('limit', 50))]
+        body = self.resources[path[len(prefix):]]
+        current = '"' + hashlib.sha1(json.dumps(body, sort_keys=True).encode()).hexdigest() + '"'
+        if etag == current:
+            return 304, current, None
+        return 200, current, body
+
+
+def serve(mock):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urllib.parse.urlsplit(self.path)
+            query = dict(urllib.parse.parse_qsl(url.query))
+            status, etag, body = mock.handle(url.path, query, self.headers.get('If-None-Match'))
+            self.send_response(status)
+            if etag:
+                self.send_header('ETag', etag)
+            payload = b'' if body is None else json.dumps(body).encode()
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class BoardSyncTest(unittest.TestCase):
+    def setUp(self):
+        self.mock = MockTrello(2 * page_size + 500)
+        self.server = serve(self.mock)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        client = TrelloClient(key='', token='', base_url=f'http://127.0.0.1:{self.server.server_port}')
+        self.sync = lambda: BoardSync(client, board_id, self.directory.name)
+
+    def action_requests(self):
+        return [query for path, query, _ in self.mock.requests if path.endswith('/actions')]
+
+    def test_backfills_past_the_export_cap(self):
+        result = asyncio.run(self.sync().sync())
+
+        self.assertEqual(result['actions'], 2 * page_size + 500)
+        self.assertEqual(sorted(result['updated']), ['board', 'cards', 'checklists', 'labels', 'lists'])
+        # Three pages, each cursor the oldest id of the page before
+        cursors = [query.get('before') for query in self.action_requests()]
+        self.assertEqual(cursors, [None, action_id(1500), action_id(500)])
+
+        board = self.sync().board()
+        self.assertEqual(len(board['actions']), 2 * page_size + 500)
+        self.assertEqual(board['actions'][0]['id'], action_id(2 * page_size + 499))
+        self.assertEqual(board['actions'][-1]['id'], action_id(0))
+        self.assertEqual(board['cards'], self.mock.resources['/cards'])
+
+    def test_resync_fetches_only_changes(self):
+        asyncio.run(self.sync().sync())
+        self.mock.add_actions(3)
+        self.mock.resources['/cards'][0]['idList'] = 'l2'
+        self.mock.requests.clear()
+
+        result = asyncio.run(self.sync().sync())
+
+        self.assertEqual(result, {'actions': 3, 'updated': ['cards']})
+        self.assertEqual([query.get('since') for query in self.action_requests()], [action_id(2 * page_size + 499)])
+        # Every resource request was conditional
+        resources = [etag for path, _, etag in self.mock.requests if not path.endswith('/actions')]
+        self.assertEqual(len(resources), 5)
+        self.assertTrue(all(resources))
+
+        board = self.sync().board()
+        self.assertEqual(len(board['actions']), 2 * page_size + 503)
+        self.assertEqual(board['cards'][0]['idList'], 'l2')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,162 @@
+import json
+
+from stage_taxonomy import canonical_list_name
+from trello_stream import default_sections, iter_export, parse_action, parse_card, parse_label, parse_list
+
+# Organisation labels tracked in the RP2 partner analyses
+organisation_labels = [
+    'PHRU',
+    'Wits RHI',
+    'CHRU',
+    'VIDA',
+    'Right to Care',
+    'Ezintsha',
+    'WCR Bara Clinical Trials unit',
+    'HE2RO',
+    'DPHRU'
+]
+
+
+class TrelloBoard:
+    """
+    Indexed view of a Trello board export (e.g. RP2_Json_0624.json)
+
+    The export is parsed once and the following lookups are built up front
+    so that per-card queries are dictionary hits instead of scans over
+    ``data['actions']``:
+
+    - ``card_list``:    card id -> id of the list the card currently sits in
+    - ``card_actions``: card id -> actions on that card, oldest first
+    - ``label_names``:  label id -> label name
+    - ``list_names``:   list id -> list name
+
+    Cards, lists, labels and actions are held as the typed records defined
+    in trello_stream.
+    """
+
+    def __init__(self, data=None, name=None, cards=(), lists=(), labels=(), actions=()):
+        if data is not None:
+            name = data.get('name')
+            cards = [parse_card(c) for c in data.get('cards', [])]
+            lists = [parse_list(l) for l in data.get('lists', [])]
+            labels = [parse_label(l) for l in data.get('labels', [])]
+            actions = [parse_action(a) for a in data.get('actions', [])]
+
+        self.name = name
+        self.lists = list(lists)
+        self.labels = list(labels)
+        self.list_names = {l.id: canonical_list_name(l.name) for l in self.lists}
+        self.label_names = {l.id: l.name for l in self.labels}
+        self.cards = {c.id: c for c in cards}
+        self.card_list = {c.id: c.id_list for c in self.cards.values()}
+
+        # Trello exports list actions newest first; keep everything oldest first
+        self.actions = sorted(reversed(list(actions)), key=lambda a: a.date or '')
+        self.card_actions = {}
+        for action in self.actions:
+            if action.card_id:
+                self.card_actions.setdefault(action.card_id, []).append(action)
+
+    @classmethod
+    def from_file(cls, file_path):
+        """Load a board by streaming the arrays it needs from a Trello JSON export"""
+        name = None
+        records = {section: [] for section in default_sections}
+        for section, record in iter_export(file_path, default_sections + ('name',)):
+            if section == 'name':
+                name = record
+            else:
+                records[section].append(record)
+        return cls(name=name, **records)
+
+    @classmethod
+    def from_json(cls, file_path):
+        """Load a board with a plain ``json.load`` of the whole export"""
+        with open(file_path, 'r', encoding='utf-8') as file:
+            return cls(json.load(file))
+
+    def list_name(self, card_id):
+        """Name of the list the card currently sits in, or None if unknown"""
+        return self.list_names.get(self.card_list.get(card_id))
+
+    def last_moved_to(self, card_id):
+        """
+        Name of the list recorded by the card's most recent move
+
+        Equivalent to the ``get_list_name`` helper used in the partner
+        notebooks, but served from the per-card action index.
+        """
+        for action in reversed(self.card_actions.get(card_id, [])):
+            if action.type != 'updateCard':
+                continue
+            if action.list_after_name is not None:
+                return canonical_list_name(action.list_after_name)
+            if action.list_before_name is not None:
+                return canonical_list_name(action.list_before_name)
+        return None
+
+    def card_labels(self, card_id):
+        """Names of the labels attached to a card"""
+        card = self.cards[card_id]
+        return [self.label_names.get(label_id, label_id) for label_id in card.id_labels]
+
+    def open_cards(self):
+        """Cards that have not been archived"""
+        return [card for card in self.cards.values() if not card.closed]
+
+    def stage_counts(self, labels=None, from_history=False):
+        """
+        Count open cards per organisation label and stage in one pass
+
+        Parameters:
+        -----------
+        labels : list of str, optional
+            Label names to count; defaults to ``organisation_labels``
+        from_history : bool
+            If True, take a card's stage from its latest move in the action
+            log (the notebooks' behaviour) instead of its current list
+
+        Returns:
+        --------
+        (dict, dict)
+            Studies per label, and a ``{label: {stage: count}}`` breakdown
+        """
+        labels = organisation_labels if labels is None else labels
+        wanted = set(labels)
+        label_counts = {label: 0 for label in labels}
+        stages = {label: {} for label in labels}
+
+        for card in self.open_cards():
+            if from_history:
+                list_name = self.last_moved_to(card.id)
+            else:
+                list_name = self.list_name(card.id)
+            if not list_name:
+                continue
+            for label_name in self.card_labels(card.id):
+                if label_name not in wanted:
+                    continue
+                label_counts[label_name] += 1
+                stages[label_name][list_name] = stages[label_name].get(list_name, 0) + 1
+
+        return label_counts, stages
+
+
+def iter_boards(file_paths):
+    """
+    Load several board exports one after another
+
+    Each export is streamed and only one board is held at a time, so a run
+    over many monthly snapshots stays flat in memory.
+    """
+    for file_path in file_paths:
+        yield file_path, TrelloBoard.from_file(file_path)
+
+
+if __name__ == "__main__":
+    board = TrelloBoard.from_file('RP2_Json_0624.json')
+    label_counts, stages = board.stage_counts()
+    for label, count in label_counts.items():
+        print(f"{label}: {count}")
+        for stage, stage_count in stages[label].items():
+            print(f"    {stage}: {stage_count}")
@@ -0,0 +1,219 @@
+import json
+from collections import namedtuple
+
+# Top-level arrays of a board export that the analyses actually use
+default_sections = ('cards', 'lists', 'labels', 'actions')
+
+# Typed records for the parts of the export we keep
+Card = namedtuple('Card', ['id', 'name', 'id_list', 'id_labels', 'closed', 'date_last_activity', 'coordinates'],
+                  defaults=(None,))
+TrelloList = namedtuple('TrelloList', ['id', 'name', 'closed', 'pos'])
+Label = namedtuple('Label', ['id', 'name', 'color'])
+Action = namedtuple('Action', [
+    'id', 'type', 'date', 'card_id', 'card_name',
+    'list_before', 'list_before_name', 'list_after', 'list_after_name',
+    'list_id', 'closed'
+])
+
+
+def _coordinates(value):
+    # Trello's location field: {'latitude': .., 'longitude': ..} or "lat,lon"; None when unset or malformed
+    try:
+        if isinstance(value, dict) and value.get('latitude') is not None and value.get('longitude') is not None:
+            return float(value['latitude']), float(value['longitude'])
+        if isinstance(value, str) and value.count(',') == 1:
+            lat, lon = value.split(',')
+            return float(lat), float(lon)
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def parse_card(card):
+    """Build a Card record from a raw card dict"""
+    return Card(
+        id=card['id'],
+        name=card.get('name'),
+        id_list=card.get('idList'),
+        id_labels=tuple(card.get('idLabels', ())),
+        closed=bool(card.get('closed', False)),
+        date_last_activity=card.get('dateLastActivity'),
+        coordinates=_coordinates(card.get('coordinates'))
+    )
+
+
+def parse_list(trello_list):
+    """Build a TrelloList record from a raw list dict"""
+    return TrelloList(
+        id=trello_list['id'],
+        name=trello_list.get('name'),
+        closed=bool(trello_list.get('closed', False)),
+        pos=float(trello_list.get('pos') or 0)
+    )
+
+
+def parse_label(label):
+    """Build a Label record from a raw label dict"""
+    return Label(id=label['id'], name=label.get('name'), color=label.get('color'))
+
+
+def parse_action(action):
+    """Build an Action record from a raw action dict"""
+    data = action.get('data', {})
+    card = data.get('card') or {}
+    list_before = data.get('listBefore') or {}
+    list_after = data.get('listAfter') or {}
+    # createCard/moveCardToBoard record the destination list under 'list'
+    target_list = data.get('list') or {}
+    # 'closed' only means something when the action changed it (archive/unarchive)
+    closed = card.get('closed') if 'closed' in (data.get('old') or {}) else None
+    return Action(
+        id=action['id'],
+        type=action.get('type'),
+        date=action.get('date'),
+        card_id=card.get('id'),
+        card_name=card.get('name'),
+        list_before=list_before.get('id'),
+        list_before_name=list_before.get('name'),
+        list_after=list_after.get('id'),
+        list_after_name=list_after.get('name'),
+        list_id=target_list.get('id') or card.get('idList'),
+        closed=closed
+    )
+
+
+record_parsers = {
+    'cards': parse_card,
+    'lists': parse_list,
+    'labels': parse_label,
+    'actions': parse_action
+}
+
+
+class _BufferedReader:
+    """Chunked text reader that decodes one JSON value at a time"""
+
+    def __init__(self, file, chunk_size):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        # Drop consumed text so the buffer only ever holds the current value
+        if self.pos:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+        chunk = self.file.read(self.chunk_size)
+        if chunk:
+            self.buffer += chunk
+        else:
+            self.eof = True
+
+    def next_char(self):
+        """Skip whitespace and return the next significant character ('' at EOF)"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if self.eof:
+                return ''
+            self._fill()
+
+    def expect(self, chars):
+        char = self.next_char()
+        if char not in chars:
+            raise ValueError(f"Malformed Trello export: expected one of {chars!r}, got {char!r}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Decode the next complete JSON value, reading more input as needed"""
+        self.next_char()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                self._fill()
+                continue
+            # A number can end exactly at the buffer edge while more digits follow
+            if end == len(self.buffer) and not self.eof:
+                self._fill()
+                continue
+            self.pos = end
+            return value
+
+
+def iter_export(file_path, sections=default_sections, chunk_size=1 << 16):
+    """
+    Stream selected top-level arrays from a Trello board export
+
+    The export is read in chunks and decoded one array element at a time, so
+    memory use is bounded by the largest single card/action rather than the
+    size of the board. Top-level values outside ``sections`` are skipped.
+
+    Parameters:
+    -----------
+    file_path : str
+        Path to the JSON export (e.g. RP2_Json_0624.json)
+    sections : iterable of str
+        Top-level arrays to yield; any of 'cards', 'lists', 'labels', 'actions'.
+        Other top-level keys (e.g. 'name') are yielded as their raw value
+    chunk_size : int
+        Number of characters read from disk at a time
+
+    Yields:
+    -------
+    (str, namedtuple)
+        The section name and a typed record (Card, TrelloList, Label, Action)
+    """
+    sections = set(sections)
+    with open(file_path, 'r', encoding='utf-8') as file:
+        reader = _BufferedReader(file, chunk_size)
+        reader.expect('{')
+        if reader.next_char() == '}':
+            return
+        while True:
+            key = reader.value()
+            reader.expect(':')
+            if reader.next_char() == '[':
+                reader.pos += 1
+                parser = record_parsers.get(key) if key in sections else None
+                if reader.next_char() == ']':
+                    reader.pos += 1
+                else:
+                    while True:
+                        item = reader.value()
+                        if parser is not None:
+                            yield key, parser(item)
+                        if reader.expect(',]') == ']':
+                            break
+            else:
+                # Scalars and objects such as 'prefs' or 'limits' are small; decode and
+                # hand back the ones asked for (e.g. the board 'name')
+                value = reader.value()
+                if key in sections:
+                    yield key, value
+            if reader.expect(',}') == '}':
+                return
+
+
+def read_export(file_path, sections=default_sections):
+    """Collect the streamed records of an export into ``{section: [records]}``"""
+    records = {section: [] for section in sections}
+    for section, record in iter_export(file_path, sections):
+        records[section].append(record)
+    return records
+
+
+if __name__ == "__main__":
+    for file_path in ['RP2_Json_0610.json', 'RP2_Json_0624.json']:
+        counts = {}
+        for section, _ in iter_export(file_path):
+            counts[section] = counts.get(section, 0) + 1
+        print(f"{file_path}: {counts}")
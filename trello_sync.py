@@ -0,0 +1,248 @@
+import asyncio
+import json
+import os
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+api_url = 'https://api.trello.com/1'
+sync_dir = 'trello_sync'
+
+# Trello's maximum page size for board actions (and the export cap)
+page_size = 1000
+
+# Board collections fetched alongside the action log, with their query parameters
+board_resources = {
+    'board': ('', {'fields': 'name,desc,url'}),
+    'cards': ('/cards', {'filter': 'all'}),
+    'lists': ('/lists', {'filter': 'all'}),
+    'labels': ('/labels', {'limit': 1000}),
+    'checklists': ('/checklists', {})
+}
+
+
+class TrelloClient:
+    """
+    Minimal asynchronous client for the Trello REST API
+
+    Requests run on worker threads (urllib) and at most ``max_concurrency``
+    are in flight at once. GETs can be made conditional with an ETag; a 304
+    comes back as ``(304, etag, None)`` instead of a body.
+
+    Parameters:
+    -----------
+    key, token : str, optional
+        API credentials; default to the TRELLO_KEY / TRELLO_TOKEN variables
+    base_url : str
+        API root, e.g. a local mock server for testing
+    """
+
+    def __init__(self, key=None, token=None, base_url=api_url, max_concurrency=4, retries=3):
+        self.key = key if key is not None else os.environ.get('TRELLO_KEY')
+        self.token = token if token is not None else os.environ.get('TRELLO_TOKEN')
+        self.base_url = base_url.rstrip('/')
+        self.retries = retries
+        self.max_concurrency = max_concurrency
+        self._semaphores = {}
+
+    def _url(self, path, params):
+        query = dict(params or {})
+        if self.key and self.token:
+            query.update(key=self.key, token=self.token)
+        return f"{self.base_url}{path}?{urllib.parse.urlencode(query)}"
+
+    def _fetch(self, url, etag):
+        request = urllib.request.Request(url, headers={'Accept': 'application/json'})
+        if etag:
+            request.add_header('If-None-Match', etag)
+        for attempt in range(self.retries + 1):
+            try:
+                with urllib.request.urlopen(request, timeout=60) as response:
+                    return response.status, response.headers.get('ETag'), json.load(response)
+            except urllib.error.HTTPError as error:
+                if error.code == 304:
+                    return 304, error.headers.get('ETag') or etag, None
+                # Back off on rate limits and server errors, then give up
+                if (error.code != 429 and error.code < 500) or attempt == self.retries:
+                    raise
+                time.sleep(float(error.headers.get('Retry-After') or 2 ** attempt))
+
+    async def get(self, path, params=None, etag=None):
+        """GET ``path``; returns (status, etag, parsed JSON or None on 304)"""
+        # One limit per event loop, so a client can be reused across asyncio.run calls
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            self._semaphores = {loop: asyncio.Semaphore(self.max_concurrency)}
+        async with self._semaphores[loop]:
+            return await asyncio.to_thread(self._fetch, self._url(path, params), etag)
+
+
+def _write_json(path, data):
+    # Write to a temporary file first so an interrupted sync never leaves half a file
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump(data, file, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+
+def _read_json(path, default):
+    if not os.path.exists(path):
+        return default
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+class BoardSync:
+    """
+    Local mirror of one Trello board, including its full action history
+
+    The board export is capped at 1000 actions; this pages back through the
+    action log with ``before`` cursors until it reaches the first action.
+    Each page is appended to ``actions.jsonl`` as soon as it arrives and the
+    cursor saved, so an interrupted sync resumes where it stopped. Later
+    syncs only ask for actions ``since`` the newest one already held, and
+    cards/lists/labels/checklists are re-fetched with If-None-Match so an
+    unchanged collection costs a 304.
+
+    Files (under ``<path>/<board_id>``): actions.jsonl, one JSON file per
+    resource, and state.json holding the cursors and ETags.
+    """
+
+    def __init__(self, client, board_id, path=sync_dir):
+        self.client = client
+        self.board_id = board_id
+        self.path = os.path.join(path, board_id)
+        os.makedirs(self.path, exist_ok=True)
+        self.state_path = os.path.join(self.path, 'state.json')
+        self.actions_path = os.path.join(self.path, 'actions.jsonl')
+        self.state = _read_json(self.state_path, {'etags': {}})
+
+    def _save_state(self):
+        _write_json(self.state_path, self.state)
+
+    def _append_actions(self, actions):
+        with open(self.actions_path, 'a', encoding='utf-8') as file:
+            for action in actions:
+                file.write(json.dumps(action, ensure_ascii=False) + '\n')
+
+    async def _action_pages(self, **params):
+        # Newest-first pages of the action log, following ``before`` cursors
+        path = f'/boards/{self.board_id}/actions'
+        before = params.pop('before', None)
+        while True:
+            query = dict(params, limit=page_size)
+            if before:
+                query['before'] = before
+            _, _, page = await self.client.get(path, query)
+            if page:
+                yield page
+            if len(page or ()) < page_size:
+                return
+            before = page[-1]['id']
+
+    async def _sync_new_actions(self):
+        # Everything after the newest action already held
+        newest = self.state.get('newest')
+        if newest is None:
+            return 0
+        count = 0
+        latest = None
+        async for page in self._action_pages(since=newest):
+            latest = latest or page[0]['id']
+            self._append_actions(page)
+            count += len(page)
+        if latest:
+            self.state['newest'] = latest
+            self._save_state()
+        return count
+
+    async def _backfill_actions(self):
+        # Older history, resuming from the saved cursor
+        if self.state.get('complete'):
+            return 0
+        count = 0
+        async for page in self._action_pages(before=self.state.get('oldest')):
+            self._append_actions(page)
+            self.state.setdefault('newest', page[0]['id'])
+            self.state['oldest'] = page[-1]['id']
+            self._save_state()
+            count += len(page)
+        self.state['complete'] = True
+        self._save_state()
+        return count
+
+    async def _sync_actions(self):
+        return await self._sync_new_actions() + await self._backfill_actions()
+
+    async def _sync_resource(self, name):
+        suffix, params = board_resources[name]
+        etags = self.state['etags']
+        resource_path = os.path.join(self.path, f'{name}.json')
+        etag = etags.get(name) if os.path.exists(resource_path) else None
+        status, etag, data = await self.client.get(f'/boards/{self.board_id}{suffix}', params, etag)
+        if status == 304:
+            return False
+        _write_json(resource_path, data)
+        if etag:
+            etags[name] = etag
+        return True
+
+    async def sync(self):
+        """
+        Bring the mirror up to date; the action log and every resource are
+        fetched concurrently
+
+        Returns:
+        --------
+        dict
+            {'actions': number of actions fetched, 'updated': resources that changed}
+        """
+        results = await asyncio.gather(self._sync_actions(),
+                                       *(self._sync_resource(name) for name in board_resources))
+        self._save_state()
+        updated = [name for name, changed in zip(board_resources, results[1:]) if changed]
+        return {'actions': results[0], 'updated': updated}
+
+    def actions(self):
+        """Every action held, newest first and de-duplicated"""
+        actions = {}
+        if os.path.exists(self.actions_path):
+            with open(self.actions_path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    if line.strip():
+                        action = json.loads(line)
+                        actions[action['id']] = action
+        return sorted(actions.values(), key=lambda a: (a.get('date') or '', a['id']), reverse=True)
+
+    def board(self):
+        """The mirror in the shape of a Trello board export (uncapped actions)"""
+        board = dict(_read_json(os.path.join(self.path, 'board.json'), {'id': self.board_id}))
+        for name in board_resources:
+            if name != 'board':
+                board[name] = _read_json(os.path.join(self.path, f'{name}.json'), [])
+        board['actions'] = self.actions()
+        return board
+
+    def write_export(self, file_path):
+        """Save the mirror as an export file readable by TrelloBoard.from_file"""
+        _write_json(file_path, self.board())
+
+
+async def sync_boards(board_ids, client=None, path=sync_dir):
+    """Sync several boards at once, sharing one client (and its concurrency limit)"""
+    client = client or TrelloClient()
+    syncs = [BoardSync(client, board_id, path) for board_id in board_ids]
+    results = await asyncio.gather(*(sync.sync() for sync in syncs))
+    return dict(zip(board_ids, results))
+
+
+if __name__ == "__main__":
+    # e.g. TRELLO_KEY=... TRELLO_TOKEN=... python trello_sync.py qjaPunsX ClS62fmQ
+    if len(sys.argv) < 2:
+        sys.exit("usage: python trello_sync.py BOARD_ID [BOARD_ID ...]")
+    for board_id, result in asyncio.run(sync_boards(sys.argv[1:])).items():
+        sync = BoardSync(None, board_id)
+        sync.write_export(os.path.join(sync.path, 'export.json'))
+        print(f"{board_id}: {result['actions']} new action(s), updated {result['updated'] or 'nothing'}")